@@ -4,6 +4,9 @@ from quart_cors import cors
 from .chat_api import chat_bp
 from .config import Config
 from .extensions import init_mongo
+from .logging_config import configure_logging
+
+configure_logging()
 
 root_bp = Blueprint("root", __name__, url_prefix="/chatbot")
 session_api_key_map = {}
@@ -1,3 +1,4 @@
+import logging
 from uuid import uuid4
 
 from langgraph.graph.message import Messages
@@ -6,6 +7,8 @@ from .extensions import db
 from .langgraph_agent import execute_langgraph_agent
 from .retriever_utils import add_to_chroma_collection
 
+logger = logging.getLogger(__name__)
+
 
 async def get_chat_history(session_id):
     doc = await db.chat_sessions.find_one({"session_id": session_id})
@@ -32,9 +35,12 @@ async def process_user_message(session_id, user_message, api_key, model_name, us
     response = await execute_langgraph_agent(
         api_key, model_name, history, user_jwt, session_id
     )
-    print("Session ID", session_id)
-    print("Messages", history)
-    print("Response", response)
+    logger.debug(
+        "Agent replied for session %s with %d messages in history and %d in response",
+        session_id,
+        len(history),
+        len(response.get("messages", [])),
+    )
     reply: Messages = response.get("messages", [{}])[-1]
     response_message_id = uuid4().int & (1 << 63) - 1
     history.append(
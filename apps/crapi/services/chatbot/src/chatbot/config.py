@@ -14,3 +14,7 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 50000))
     CHROMA_HOST = CHROMA_HOST
     CHROMA_PORT = CHROMA_PORT
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", 50))
+    LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", 100))
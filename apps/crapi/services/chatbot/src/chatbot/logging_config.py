@@ -0,0 +1,117 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from .config import Config
+
+SENSITIVE_KEYS = ("password", "token", "authorization", "secret", "api_key", "jwt")
+REDACTED = "[REDACTED]"
+MAX_FIELD_LENGTH = 1024
+# attributes every LogRecord has, anything else was passed in extra
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+}
+
+
+def truncate(value: str, max_length: int = MAX_FIELD_LENGTH) -> str:
+    if len(value) <= max_length:
+        return value
+    return f"{value[:max_length]}...({len(value) - max_length} more)"
+
+
+def redact(key: str, value):
+    if any(sensitive in key.lower() for sensitive in SENSITIVE_KEYS):
+        return REDACTED
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return truncate(str(value))
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = redact(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger, records below WARNING over the limit are dropped
+    """
+
+    def __init__(self, rate: float, burst: int):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(record.name, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            self.buckets[record.name] = (max(tokens - 1, 0), now)
+        return tokens >= 1
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts the records on a bounded queue without blocking the event loop,
+    records are dropped when the queue is full
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.msg = truncate(record.msg)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configure_logging() -> None:
+    """
+    Sends the records of the chatbot and of uvicorn through a queue
+    to a listener thread writing them to stderr as JSON lines
+    """
+    log_queue = queue.Queue(Config.LOG_QUEUE_SIZE)
+    handler = QueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(Config.LOG_RATE_LIMIT, Config.LOG_RATE_BURST))
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JSONFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(Config.LOG_LEVEL)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+    # the http clients log every request at DEBUG
+    for name in ("httpx", "httpcore", "openai", "chromadb"):
+        logging.getLogger(name).setLevel(max(logging.INFO, root.level))
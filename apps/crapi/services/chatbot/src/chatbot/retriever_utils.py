@@ -1,3 +1,5 @@
+import logging
+
 import chromadb
 from langchain_chroma import Chroma as ChromaClient
 from langchain_core.documents import Document
@@ -6,6 +8,8 @@ from langchain_openai import OpenAIEmbeddings
 
 from .config import Config
 
+logger = logging.getLogger(__name__)
+
 
 def get_chroma_client():
     chroma_client = chromadb.HttpClient(
@@ -39,7 +43,6 @@ def add_to_chroma_collection(
     api_key, session_id, new_messages: list[dict[str, str]]
 ) -> list:
     vectorstore = get_chroma_vectorstore(api_key)
-    print("new_messages", new_messages)
     # new_messages = [{'user': 'hi'}, {'assistant': 'Hello! How can I assist you today?'}]
     documents = []
     for message in new_messages:
@@ -50,7 +53,9 @@ def add_to_chroma_collection(
                     metadata={"session_id": session_id, "role": role},
                 )
             )
-    print("documents", documents)
+    logger.debug(
+        "Adding %d documents of session %s to chroma", len(documents), session_id
+    )
     res: list = vectorstore.add_documents(documents=documents)
     return res
 
@@ -0,0 +1,332 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Micro-benchmarks of the serializers in crapi/*/serializers.py
+ModelSerializers are timed turning in-memory model instances into data,
+RowSerializers turning the rows of the same instances into data
+and the other serializers validating a sample request body.
+Nothing is read from the database: the comments the service request
+serializers would query are served from memory as well, the cost of those
+queries is covered by the load tests and the query plan tests
+"""
+import importlib
+import pkgutil
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from rest_framework import serializers
+
+import crapi
+from crapi.mechanic.models import Mechanic, ServiceComment, ServiceRequest
+from crapi.shop.models import Order, Product
+from crapi.user.models import User, UserDetails, Vehicle, VehicleCompany, VehicleModel
+from utils.row_serializers import RowSerializer
+
+CREATED_ON = datetime(2024, 1, 1, 12, 0, 0)
+COMMENTS_PER_REQUEST = 3
+
+# request bodies for the serializers which only validate input
+SAMPLE_DATA = {
+    "ContactMechanicSerializer": {
+        "mechanic_api": "http://localhost:8000/workshop/api/mechanic/receive_report",
+        "repeat_request_if_failed": False,
+        "number_of_repeats": 1,
+    },
+    "CouponSerializer": {"coupon_code": "TRAC075", "amount": 75},
+    "ProductQuantitySerializer": {"product_id": 1, "quantity": 2},
+    "ReceiveReportSerializer": {
+        "mechanic_code": "TRAC_JHN",
+        "problem_details": "Engine makes a noise when started",
+        "vin": "0BZCX25UTBJ987271",
+    },
+    "ServiceCommentCreateSerializer": {"comment": "Parts ordered"},
+    "ServiceRequestStatusUpdateSerializer": {"status": "completed"},
+    "SignUpSerializer": {
+        "name": "Jhon",
+        "email": "jhon@example.com",
+        "number": "9876543210",
+        "password": "Admin1@#",
+        "mechanic_code": "TRAC_JHN",
+    },
+}
+# ModelSerializers used to validate input rather than to render models
+INPUT_SERIALIZERS = (
+    "ServiceCommentCreateSerializer",
+    "ServiceRequestStatusUpdateSerializer",
+)
+
+
+def make_user(i):
+    return User(
+        id=i,
+        email=f"user{i}@example.com",
+        number=f"98765{i:05d}",
+        password="password",
+        role=User.ROLE_CHOICES.USER,
+        created_on=CREATED_ON,
+    )
+
+
+def make_user_details(i):
+    return UserDetails(
+        id=i, name=f"User {i}", available_credit=100.0, user=make_user(i)
+    )
+
+
+def make_product(i):
+    return Product(
+        id=i, name=f"Product {i}", price=10 + i % 90, image_url="images/seat.svg"
+    )
+
+
+def make_order(i):
+    return Order(
+        id=i,
+        user=make_user(i),
+        product=make_product(i),
+        quantity=1 + i % 5,
+        transaction_id="8f3b8d6e-4ac8-4b7b-9a0b-0d5c7d9b3a51",
+        created_on=CREATED_ON,
+    )
+
+
+def make_vehicle(i):
+    company = VehicleCompany(id=1, name="Hyundai")
+    return Vehicle(
+        id=i,
+        vin=f"VIN{i:014d}",
+        pincode="1234",
+        year=2020,
+        status="ACTIVE",
+        owner=make_user(i),
+        vehicle_model=VehicleModel(
+            id=1, fuel_type=0, model="Creta", vehiclecompany=company
+        ),
+    )
+
+
+def make_mechanic(i):
+    return Mechanic(id=i, mechanic_code=f"TRAC_{i:04d}", user=make_user(i))
+
+
+def make_service_request(i):
+    service_request = ServiceRequest(
+        id=i,
+        mechanic=make_mechanic(i),
+        vehicle=make_vehicle(i),
+        problem_details="My car is making a noise when it is started, please call me",
+        status=ServiceRequest.STATUS_CHOICES.PEN,
+        created_on=CREATED_ON,
+        updated_on=CREATED_ON + timedelta(hours=1),
+    )
+    # annotations of the search queryset
+    service_request.rank = 0.5
+    service_request.headline = "making a <b>noise</b> when it is started"
+    return service_request
+
+
+def make_service_comment(i):
+    return ServiceComment(id=i, comment=f"Comment {i}", created_on=CREATED_ON)
+
+
+MODEL_FACTORIES = {
+    Mechanic: make_mechanic,
+    Order: make_order,
+    Product: make_product,
+    ServiceComment: make_service_comment,
+    ServiceRequest: make_service_request,
+    User: make_user,
+    UserDetails: make_user_details,
+    Vehicle: make_vehicle,
+}
+
+
+class InMemoryComments(list):
+    """
+    stands in for the ServiceComment querysets built by the serializers
+    """
+
+    def filter(self, *args, service_request_id__in=None, **kwargs):
+        if service_request_id__in is None:
+            return self
+        # the same comments for every service request
+        return InMemoryComments(
+            ServiceComment(
+                id=comment.id,
+                comment=comment.comment,
+                created_on=comment.created_on,
+                service_request_id=service_request_id,
+            )
+            for service_request_id in service_request_id__in
+            for comment in self
+        )
+
+    def order_by(self, *args):
+        return self
+
+    def values_list(self, *lookups):
+        return [get_row(comment, lookups) for comment in self]
+
+
+@contextmanager
+def in_memory_comments():
+    comments = InMemoryComments(
+        make_service_comment(i) for i in range(COMMENTS_PER_REQUEST)
+    )
+    with patch.object(ServiceComment, "objects", comments):
+        yield
+
+
+def get_row(instance, lookups):
+    """
+    :return: tuple of what values_list(*lookups) returns for the instance
+    """
+    row = []
+    for lookup in lookups:
+        value = instance
+        for name in lookup.split("__"):
+            value = getattr(value, name)
+        row.append(value)
+    return tuple(row)
+
+
+def get_serializers():
+    """
+    :return: dict mapping the dotted path of every serializer class
+        defined in a crapi/*/serializers.py module to the class
+    """
+    found = {}
+    for module_info in pkgutil.iter_modules(crapi.__path__):
+        if not module_info.ispkg:
+            continue
+        name = f"crapi.{module_info.name}.serializers"
+        try:
+            module = importlib.import_module(name)
+        except ModuleNotFoundError:
+            continue
+        for attribute in vars(module).values():
+            if (
+                isinstance(attribute, type)
+                and issubclass(attribute, (serializers.BaseSerializer, RowSerializer))
+                and attribute.__module__ == name
+            ):
+                found[f"{name}.{attribute.__name__}"] = attribute
+    return dict(sorted(found.items()))
+
+
+def get_case(serializer_class, page_size):
+    """
+    :param serializer_class: serializer to benchmark
+    :param page_size: number of objects in a page
+    :return: (kind, serialize one, serialize a page) where kind is
+        "output", "rows" or "input", None if there is no sample for the serializer
+    """
+    name = serializer_class.__name__
+    if issubclass(serializer_class, RowSerializer):
+        model = serializer_class.serializer_class.Meta.model
+        if model not in MODEL_FACTORIES:
+            return None
+        lookups = serializer_class.compile()[0]
+        factory = MODEL_FACTORIES[model]
+        row = get_row(factory(1), lookups)
+        page = [get_row(factory(i), lookups) for i in range(1, page_size + 1)]
+        return (
+            "rows",
+            lambda: serializer_class([row]).data,
+            lambda: serializer_class(page).data,
+        )
+    model = getattr(getattr(serializer_class, "Meta", None), "model", None)
+    if name not in INPUT_SERIALIZERS and model in MODEL_FACTORIES:
+        factory = MODEL_FACTORIES[model]
+        instance = factory(1)
+        page = [factory(i) for i in range(1, page_size + 1)]
+        return (
+            "output",
+            lambda: serializer_class(instance).data,
+            lambda: serializer_class(page, many=True).data,
+        )
+    if name in SAMPLE_DATA:
+        data = SAMPLE_DATA[name]
+        page = [dict(data) for i in range(page_size)]
+
+        def validate(data, many=False):
+            serializer = serializer_class(data=data, many=many)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+        return (
+            "input",
+            lambda: validate(data),
+            lambda: validate(page, many=True),
+        )
+    return None
+
+
+def best_time(func, repeat, min_time):
+    """
+    :param func: function to time
+    :param repeat: number of measurements
+    :param min_time: seconds every measurement runs func for at least
+    :return: lowest seconds per call over the measurements
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for i in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = elapsed / number
+    for i in range(repeat - 1):
+        started = time.perf_counter()
+        for j in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def run_benchmarks(page_size, repeat=5, min_time=0.05, pattern=None):
+    """
+    :param page_size: number of objects in a page
+    :param repeat: number of measurements, the fastest one is kept
+    :param min_time: seconds every measurement runs for at least
+    :param pattern: only benchmark the serializers whose path contains it
+    :return: dict mapping the serializer paths to their kind and the
+        microseconds spent on one object, on a page and per object of a page
+        or None for serializers without a sample
+    """
+    results = {}
+    with in_memory_comments():
+        for path, serializer_class in get_serializers().items():
+            if pattern and pattern not in path:
+                continue
+            case = get_case(serializer_class, page_size)
+            if case is None:
+                results[path] = None
+                continue
+            kind, one, page = case
+            one_time = best_time(one, repeat, min_time)
+            page_time = best_time(page, repeat, min_time)
+            results[path] = {
+                "kind": kind,
+                "object_us": one_time * 1e6,
+                "page_us": page_time * 1e6,
+                "page_object_us": page_time * 1e6 / page_size,
+            }
+    return results
@@ -0,0 +1,134 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Startup time benchmark
+Every run starts a fresh interpreter with -X importtime, which times the
+steps of a container start one after the other and prints them as JSON.
+The import times of the top level modules are read from its stderr, so the
+report shows which phase and which imports the boot time goes to
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+PHASES = (
+    "django.setup",
+    "url conf",
+    "check",
+    "schema fingerprint",
+    "migrate",
+    "seed check",
+)
+
+
+def parse_import_times(stderr):
+    """
+    :param stderr: output of python -X importtime
+    :return: dict mapping the modules imported at the top level
+        to their cumulative import time in seconds
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # nested imports are indented by two spaces per level
+        if not cumulative_us.strip().isdigit() or name[1:2] == " ":
+            continue
+        times[name.strip()] = int(cumulative_us) / 1e6
+    return times
+
+
+def run_child(migrate):
+    """
+    :param migrate: True to run migrate in the child
+    :return: (phase seconds, import seconds, process seconds) of one start
+    """
+    command = [sys.executable, "-X", "importtime", "-m", __name__]
+    if migrate:
+        command.append("--migrate")
+    started = time.perf_counter()
+    result = subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout), parse_import_times(result.stderr), elapsed
+
+
+def run_benchmark(repeat=3, migrate=False):
+    """
+    :param repeat: number of starts, the fastest value of every phase is kept
+    :param migrate: True to time migrate as well, it applies the
+        pending migrations of the database
+    :return: (phases, imports, process) with the seconds of every phase,
+        of the slowest top level imports and of the whole process
+    """
+    phases = defaultdict(lambda: float("inf"))
+    imports = defaultdict(lambda: float("inf"))
+    process = float("inf")
+    for i in range(repeat):
+        child_phases, child_imports, elapsed = run_child(migrate)
+        for name, seconds in child_phases.items():
+            phases[name] = min(phases[name], seconds)
+        for name, seconds in child_imports.items():
+            imports[name] = min(imports[name], seconds)
+        process = min(process, elapsed)
+    return dict(phases), dict(imports), process
+
+
+def measure(migrate):
+    """
+    runs the steps of a container start, in the child process
+    :return: dict mapping the phases to their seconds
+    """
+    import io
+
+    times = {}
+
+    def phase(name, function, *args, **kwargs):
+        started = time.perf_counter()
+        function(*args, **kwargs)
+        times[name] = time.perf_counter() - started
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "crapi_site.settings")
+    import django
+
+    phase("django.setup", django.setup)
+
+    from django.core.management import call_command
+    from django.urls import get_resolver
+
+    from core.db.schema import get_fingerprint, read_fingerprint
+    from core.management.commands.seed_database import is_seeded
+
+    phase("url conf", lambda: get_resolver().url_patterns)
+    phase("check", call_command, "check", stdout=io.StringIO())
+    phase("schema fingerprint", lambda: read_fingerprint() == get_fingerprint())
+    if migrate:
+        phase("migrate", call_command, "migrate", verbosity=0, interactive=False)
+    phase("seed check", is_seeded)
+    return times
+
+
+if __name__ == "__main__":
+    print(json.dumps(measure("--migrate" in sys.argv)))
@@ -0,0 +1,36 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the serializer benchmarks
+"""
+from django.test import SimpleTestCase
+from core.benchmarks.serializers import get_serializers, run_benchmarks
+
+
+class SerializerBenchmarkTestCase(SimpleTestCase):
+    """
+    contains the test cases related to the serializer benchmarks
+    """
+
+    def test_every_serializer_is_benchmarked(self):
+        """
+        runs every benchmark once
+        should have a sample for every serializer and not query the database
+        :return: None
+        """
+        results = run_benchmarks(page_size=2, repeat=1, min_time=0)
+        self.assertEqual(set(results), set(get_serializers()))
+        self.assertIn("crapi.shop.serializers.OrderSerializer", results)
+        for path, result in results.items():
+            self.assertIsNotNone(result, f"no sample for {path}")
+            self.assertGreater(result["page_us"], 0)
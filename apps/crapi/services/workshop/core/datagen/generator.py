@@ -0,0 +1,463 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Generates workshop data at capacity testing scale
+Rows are written in batches with Postgres COPY or bulk_create, their ids are
+reserved from the sequences up front so the rows of the next table can refer
+to them without reading anything back. Every generated user has an email on
+EMAIL_DOMAIN and every other row hangs off such a user or is named with
+NAME_PREFIX, so delete_generated removes all of it again
+"""
+import io
+import random
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+import bcrypt
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
+
+from crapi.mechanic.models import Mechanic, ServiceComment, ServiceRequest
+from crapi.shop.models import Order, Product
+from crapi.user.models import User, UserDetails, Vehicle, VehicleCompany, VehicleModel
+from utils.mock_methods import get_sample_users
+
+EMAIL_DOMAIN = "datagen.example.com"
+NAME_PREFIX = "DataGen"
+PASSWORD = "Datagen1@#"
+COUPON_PREFIX = "DATAGEN"
+# generated values picked from, Faker is too slow to call for every row
+TEXT_POOL_SIZE = 1000
+
+
+def reserve_ids(model, count):
+    """
+    moves the id sequence of the model past count ids
+    :return: range of the reserved ids
+    """
+    if not count:
+        return range(0)
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'),"
+            " nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)",
+            [table, table, count],
+        )
+        last = cursor.fetchone()[0]
+    return range(last - count + 1, last + 1)
+
+
+def format_copy_value(value):
+    """
+    :return: value in the text format of COPY
+    """
+    if value is None:
+        return "\\N"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_rows(model, fields, rows):
+    """
+    writes the rows with COPY
+    :param model: model of the table
+    :param fields: attribute names of the row values, e.g. user_id
+    :param rows: list of tuples
+    :return: None
+    """
+    meta = model._meta
+    columns = ", ".join(
+        connection.ops.quote_name(meta.get_field(field).column) for field in fields
+    )
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(format_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {connection.ops.quote_name(meta.db_table)} ({columns}) FROM STDIN",
+            buffer,
+        )
+
+
+def bulk_create_rows(model, fields, rows):
+    """
+    writes the rows with bulk_create
+    """
+    model.objects.bulk_create(
+        [model(**dict(zip(fields, row))) for row in rows], batch_size=len(rows)
+    )
+
+
+WRITERS = {"copy": copy_rows, "bulk": bulk_create_rows}
+
+
+class DataGenerator:
+    """
+    Writes a dataset of the given scale
+    Attributes:
+        method: "copy" or "bulk"
+        batch_size: rows written per statement and transaction
+        stats: OrderedDict mapping every table to (rows, seconds)
+    """
+
+    def __init__(self, method="copy", batch_size=10000, days=365, seed=None):
+        self.write_rows = WRITERS[method]
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+        self.now = timezone.now()
+        self.days = days
+        self.stats = OrderedDict()
+        self.texts = [self.fake.sentence(nb_words=20) for i in range(TEXT_POOL_SIZE)]
+        self.comments = [self.fake.sentence(nb_words=8) for i in range(TEXT_POOL_SIZE)]
+        # hashing a password per user would take longer than the rest
+        self.password = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt()).decode()
+
+    def created_on(self):
+        return self.now - timedelta(seconds=self.rng.random() * self.days * 86400)
+
+    def write(self, model, fields, rows):
+        """
+        writes the rows batch by batch and records the rate of the table
+        :param rows: iterable of tuples
+        :return: None
+        """
+        started = time.perf_counter()
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    self.write_rows(model, fields, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                self.write_rows(model, fields, batch)
+            count += len(batch)
+        # the foreign key checks of the next tables are planned from the
+        # statistics, which still describe the table before these rows
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+        rows_before, seconds_before = self.stats.get(model._meta.db_table, (0, 0.0))
+        self.stats[model._meta.db_table] = (
+            rows_before + count,
+            seconds_before + time.perf_counter() - started,
+        )
+
+    def create_users(self, count, role):
+        """
+        creates the users with their details, batch by batch
+        :return: range of the ids of the users
+        """
+        ids = reserve_ids(User, count)
+        details_ids = reserve_ids(UserDetails, count)
+        for start in range(0, count, self.batch_size):
+            samples = get_sample_users(min(self.batch_size, count - start))
+            users = []
+            details = []
+            for i, sample in enumerate(samples, start):
+                local = sample["email"].split("@")[0]
+                users.append(
+                    (
+                        ids[i],
+                        f"{local}.{ids[i]}@{EMAIL_DOMAIN}",
+                        sample["number"],
+                        self.password,
+                        role,
+                        self.created_on(),
+                    )
+                )
+                details.append(
+                    (
+                        details_ids[i],
+                        ids[i],
+                        sample["name"],
+                        "ACTIVE",
+                        float(self.rng.randint(0, 1000)),
+                    )
+                )
+            self.write(
+                User,
+                ("id", "email", "number", "password", "role", "created_on"),
+                users,
+            )
+            self.write(
+                UserDetails,
+                ("id", "user_id", "name", "status", "available_credit"),
+                details,
+            )
+        return ids
+
+    def create_vehicle_models(self):
+        """
+        :return: ids of the vehicle models of the generated vehicles
+        """
+        company = VehicleCompany.objects.create(name=NAME_PREFIX)
+        vehicle_models = VehicleModel.objects.bulk_create(
+            [
+                VehicleModel(
+                    fuel_type=fuel_type,
+                    model=f"{NAME_PREFIX} {fuel_type}",
+                    vehicle_img="",
+                    vehiclecompany=company,
+                )
+                for fuel_type in range(3)
+            ]
+        )
+        return [vehicle_model.id for vehicle_model in vehicle_models]
+
+    def create_products(self, count):
+        ids = reserve_ids(Product, count)
+        self.write(
+            Product,
+            ("id", "name", "price", "image_url"),
+            (
+                (
+                    product_id,
+                    f"{NAME_PREFIX} {self.fake.word()} {product_id}",
+                    self.rng.randint(1, 100),
+                    "images/seat.svg",
+                )
+                for product_id in ids
+            ),
+        )
+        return ids
+
+    def create_mechanics(self, count):
+        user_ids = self.create_users(count, User.ROLE_CHOICES.MECH)
+        ids = reserve_ids(Mechanic, count)
+        self.write(
+            Mechanic,
+            ("id", "mechanic_code", "user_id"),
+            (
+                (mechanic_id, f"DATAGEN_{mechanic_id}", user_id)
+                for mechanic_id, user_id in zip(ids, user_ids)
+            ),
+        )
+        return ids
+
+    def create_vehicles(self, user_ids, per_user):
+        vehicle_model_ids = self.create_vehicle_models()
+        ids = reserve_ids(Vehicle, len(user_ids) * per_user)
+        self.write(
+            Vehicle,
+            ("id", "vin", "pincode", "year", "vehicle_model_id", "owner_id", "status"),
+            (
+                (
+                    vehicle_id,
+                    f"DG{vehicle_id:015d}",
+                    f"{self.rng.randint(0, 9999):04d}",
+                    self.rng.randint(2000, 2024),
+                    self.rng.choice(vehicle_model_ids),
+                    user_ids[i // per_user],
+                    "ACTIVE",
+                )
+                for i, vehicle_id in enumerate(ids)
+            ),
+        )
+        return ids
+
+    def create_service_requests(self, vehicle_ids, mechanic_ids, per_vehicle):
+        ids = reserve_ids(ServiceRequest, len(vehicle_ids) * per_vehicle)
+        statuses = [status for status, label in ServiceRequest.STATUS_CHOICES]
+
+        def rows():
+            for i, service_request_id in enumerate(ids):
+                created_on = self.created_on()
+                yield (
+                    service_request_id,
+                    vehicle_ids[i // per_vehicle],
+                    self.rng.choice(mechanic_ids),
+                    self.rng.choice(self.texts),
+                    self.rng.choice(statuses),
+                    created_on,
+                    created_on + timedelta(hours=self.rng.randint(1, 72)),
+                )
+
+        self.write(
+            ServiceRequest,
+            (
+                "id",
+                "vehicle_id",
+                "mechanic_id",
+                "problem_details",
+                "status",
+                "created_on",
+                "updated_on",
+            ),
+            rows(),
+        )
+        return ids
+
+    def create_comments(self, service_request_ids, per_request):
+        ids = reserve_ids(ServiceComment, len(service_request_ids) * per_request)
+        self.write(
+            ServiceComment,
+            ("id", "service_request_id", "comment", "created_on"),
+            (
+                (
+                    comment_id,
+                    service_request_ids[i // per_request],
+                    self.rng.choice(self.comments),
+                    self.created_on(),
+                )
+                for i, comment_id in enumerate(ids)
+            ),
+        )
+
+    def create_orders(self, user_ids, product_ids, per_user):
+        ids = reserve_ids(Order, len(user_ids) * per_user)
+        statuses = [status for status, label in Order.STATUS_CHOICES]
+        self.write(
+            Order,
+            (
+                "id",
+                "user_id",
+                "product_id",
+                "quantity",
+                "transaction_id",
+                "created_on",
+                "status",
+            ),
+            (
+                (
+                    order_id,
+                    user_ids[i // per_user],
+                    self.rng.choice(product_ids),
+                    self.rng.randint(1, 5),
+                    str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+                    self.created_on(),
+                    self.rng.choice(statuses),
+                )
+                for i, order_id in enumerate(ids)
+            ),
+        )
+
+    def create_coupons(self, count):
+        """
+        inserts the coupons in the mongo collection the shop reads them from
+        """
+        from crapi.shop.coupons import get_collection
+
+        started = time.perf_counter()
+        documents = [
+            {
+                "coupon_code": f"{COUPON_PREFIX}{i}",
+                "amount": str(self.rng.randint(1, 100)),
+            }
+            for i in range(count)
+        ]
+        for start in range(0, count, self.batch_size):
+            get_collection().insert_many(documents[start : start + self.batch_size])
+        self.stats["coupons"] = (count, time.perf_counter() - started)
+
+    def generate(
+        self,
+        users=1000,
+        mechanics=50,
+        products=50,
+        vehicles_per_user=1,
+        service_requests_per_vehicle=3,
+        comments_per_request=2,
+        orders_per_user=5,
+        coupons=0,
+    ):
+        """
+        writes the whole dataset
+        :return: None
+        """
+        product_ids = self.create_products(products)
+        mechanic_ids = self.create_mechanics(mechanics)
+        user_ids = self.create_users(users, User.ROLE_CHOICES.USER)
+        vehicle_ids = self.create_vehicles(user_ids, vehicles_per_user)
+        if mechanic_ids:
+            service_request_ids = self.create_service_requests(
+                vehicle_ids, mechanic_ids, service_requests_per_vehicle
+            )
+            self.create_comments(service_request_ids, comments_per_request)
+        if product_ids:
+            self.create_orders(user_ids, product_ids, orders_per_user)
+        if coupons:
+            self.create_coupons(coupons)
+
+
+@transaction.atomic
+def delete_generated():
+    """
+    removes every row written by the DataGenerator
+    :return: number of deleted users
+    """
+    users = "SELECT id FROM user_login WHERE email LIKE %s"
+    vehicles = f"SELECT id FROM vehicle_details WHERE owner_id IN ({users})"
+    mechanics = f"SELECT id FROM mechanic WHERE user_id IN ({users})"
+    service_requests = (
+        f"SELECT id FROM service_request WHERE vehicle_id IN ({vehicles})"
+        f" OR mechanic_id IN ({mechanics})"
+    )
+    pattern = f"%@{EMAIL_DOMAIN}"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM service_comment"
+            f" WHERE service_request_id IN ({service_requests})",
+            [pattern, pattern],
+        )
+        cursor.execute(
+            f"DELETE FROM service_request WHERE id IN ({service_requests})",
+            [pattern, pattern],
+        )
+        for table, column in (
+            ('"order"', "user_id"),
+            ("applied_coupon", "user_id"),
+            ("mechanic", "user_id"),
+            ("vehicle_details", "owner_id"),
+            ("user_details", "user_id"),
+        ):
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {column} IN ({users})", [pattern]
+            )
+        cursor.execute("DELETE FROM user_login WHERE email LIKE %s", [pattern])
+        deleted = cursor.rowcount
+    Product.objects.filter(name__startswith=f"{NAME_PREFIX} ").delete()
+    VehicleModel.objects.filter(vehiclecompany__name=NAME_PREFIX).delete()
+    VehicleCompany.objects.filter(name=NAME_PREFIX).delete()
+    return deleted
+
+
+def delete_generated_coupons():
+    """
+    :return: number of deleted coupons
+    """
+    from crapi.shop.coupons import get_collection
+
+    result = get_collection().delete_many(
+        {"coupon_code": {"$regex": f"^{COUPON_PREFIX}[0-9]+$"}}
+    )
+    return result.deleted_count
@@ -0,0 +1,82 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the scale data generator
+"""
+from datetime import datetime
+from django.test import TestCase
+from crapi.mechanic.models import ServiceRequest, ServiceComment
+from crapi.shop.models import Order, Product
+from crapi.user.models import User, Vehicle
+from core.datagen.generator import DataGenerator, delete_generated, format_copy_value
+
+
+class DataGeneratorTestCase(TestCase):
+    """
+    contains the test cases related to the scale data generator
+    """
+
+    def generate(self, method):
+        generator = DataGenerator(method=method, batch_size=7, seed=1)
+        generator.generate(
+            users=10,
+            mechanics=3,
+            products=4,
+            vehicles_per_user=2,
+            service_requests_per_vehicle=2,
+            comments_per_request=1,
+            orders_per_user=3,
+        )
+        return generator
+
+    def test_generate(self):
+        """
+        generates a small dataset with COPY and then with bulk_create
+        should write the requested number of rows with consistent references
+        and report the rows written per table
+        :return: None
+        """
+        for method in ("copy", "bulk"):
+            with self.subTest(method=method):
+                generator = self.generate(method)
+                users = User.objects.filter(email__endswith="@datagen.example.com")
+                self.assertEqual(users.count(), 13)
+                vehicles = Vehicle.objects.filter(owner__in=users)
+                self.assertEqual(vehicles.count(), 20)
+                self.assertEqual(
+                    ServiceRequest.objects.filter(vehicle__in=vehicles).count(), 40
+                )
+                self.assertEqual(
+                    ServiceComment.objects.filter(
+                        service_request__vehicle__in=vehicles
+                    ).count(),
+                    40,
+                )
+                self.assertEqual(Order.objects.filter(user__in=users).count(), 30)
+                self.assertEqual(generator.stats["order"][0], 30)
+                self.assertEqual(generator.stats["user_login"][0], 13)
+                delete_generated()
+                self.assertFalse(users.exists())
+                self.assertFalse(Product.objects.filter(name__startswith="DataGen "))
+
+    def test_format_copy_value(self):
+        """
+        formats values which have a meaning in the COPY text format
+        should escape them
+        :return: None
+        """
+        self.assertEqual(format_copy_value(None), "\\N")
+        self.assertEqual(format_copy_value("a\tb\\c\n"), "a\\tb\\\\c\\n")
+        self.assertEqual(
+            format_copy_value(datetime(2024, 1, 2, 3, 4, 5)), "2024-01-02T03:04:05"
+        )
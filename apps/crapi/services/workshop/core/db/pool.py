@@ -0,0 +1,274 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the per process pool of database connections
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from utils import metrics
+
+logger = logging.getLogger()
+
+
+class PoolTimeout(Exception):
+    """
+    raised when no connection is returned to the pool in time
+    """
+
+
+class _PooledConnection:
+    """
+    a raw connection together with its bookkeeping
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of raw DB-API connections
+    Attributes:
+        name: name of the pool in the metrics
+        connect: function opening a new connection
+        check: function returning True if a connection is still usable
+        reset: function putting a returned connection back in a clean state,
+            returns False if the connection can not be reused
+        max_size: upper bound of open connections
+        timeout: seconds to wait for a connection when all of them are in use
+        max_idle: seconds after which an idle connection is closed
+        max_lifetime: seconds after which a connection is replaced
+        check_interval: idle seconds after which a connection is checked
+            before it is handed out
+    """
+
+    def __init__(
+        self,
+        connect,
+        check,
+        reset,
+        name="default",
+        max_size=20,
+        timeout=10.0,
+        max_idle=300.0,
+        max_lifetime=1800.0,
+        check_interval=30.0,
+    ):
+        self.name = name
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.idle = deque()
+        self.in_use = {}
+        self.opening = 0
+        self.condition = threading.Condition()
+        self.stats = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "connections_failed_check": 0,
+            "acquired": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+        }
+
+    def size(self):
+        return len(self.idle) + len(self.in_use) + self.opening
+
+    def acquire(self):
+        """
+        hands out an idle connection or opens a new one if the pool is not full
+        :return: raw connection
+        :raises PoolTimeout: if the pool stays full for timeout seconds
+        """
+        started = time.monotonic()
+        waited = False
+        with self.condition:
+            while True:
+                self._reap()
+                if self.idle or self.size() < self.max_size:
+                    pooled = self.idle.pop() if self.idle else None
+                    # counted as opening until it is lent out
+                    self.opening += 1
+                    break
+                remaining = started + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    metrics.DB_POOL_TIMEOUTS.labels(self.name).inc()
+                    raise PoolTimeout(
+                        f"No database connection available in {self.timeout}s"
+                    )
+                waited = True
+                self.condition.wait(remaining)
+            wait = time.monotonic() - started
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_seconds"] += wait
+            self.stats["acquired"] += 1
+        metrics.DB_POOL_WAIT.labels(self.name).observe(wait)
+        if pooled is not None:
+            if (
+                time.monotonic() - pooled.released_at < self.check_interval
+                or self.check(pooled.connection)
+            ):
+                return self._lend(pooled)
+            with self.condition:
+                self.stats["connections_failed_check"] += 1
+            self._close(pooled)
+        try:
+            pooled = _PooledConnection(self.connect())
+        except Exception:
+            with self.condition:
+                self.opening -= 1
+                self.condition.notify()
+                self._publish()
+            raise
+        with self.condition:
+            self.stats["connections_opened"] += 1
+        return self._lend(pooled)
+
+    def _lend(self, pooled):
+        with self.condition:
+            self.opening -= 1
+            self.in_use[id(pooled.connection)] = pooled
+            self._publish()
+        return pooled.connection
+
+    def release(self, connection):
+        """
+        takes back a connection handed out by acquire
+        :param connection: raw connection
+        """
+        with self.condition:
+            pooled = self.in_use.pop(id(connection), None)
+        if pooled is None:
+            connection.close()
+            return
+        expired = time.monotonic() - pooled.created_at >= self.max_lifetime
+        if expired or not self.reset(connection):
+            self._close(pooled)
+            with self.condition:
+                self.condition.notify()
+                self._publish()
+            return
+        pooled.released_at = time.monotonic()
+        with self.condition:
+            self.idle.append(pooled)
+            self.condition.notify()
+            self._publish()
+
+    def _reap(self):
+        """
+        closes the connections idle for longer than max_idle
+        must be called with the condition held
+        """
+        now = time.monotonic()
+        # the least recently used connections are on the left
+        while self.idle and now - self.idle[0].released_at >= self.max_idle:
+            self._close(self.idle.popleft())
+
+    def _close(self, pooled):
+        with self.condition:
+            self.stats["connections_closed"] += 1
+        try:
+            pooled.connection.close()
+        except Exception as e:
+            logger.debug(f"Failed to close a pooled connection: {e}")
+
+    def close_all(self):
+        """
+        closes the idle connections, connections in use are closed on release
+        """
+        with self.condition:
+            while self.idle:
+                self._close(self.idle.pop())
+            self.in_use.clear()
+            self._publish()
+
+    def _publish(self):
+        """
+        updates the connection gauges, must be called with the condition held
+        """
+        metrics.DB_POOL_CONNECTIONS.labels(self.name, "in_use").set(len(self.in_use))
+        metrics.DB_POOL_CONNECTIONS.labels(self.name, "idle").set(len(self.idle))
+
+    def get_stats(self):
+        """
+        :return: dict with the current and cumulative pool counters
+        """
+        with self.condition:
+            return dict(
+                self.stats,
+                max_size=self.max_size,
+                size=self.size(),
+                in_use=len(self.in_use),
+                idle=len(self.idle),
+            )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(key, **kwargs):
+    """
+    returns the pool for the given key, creating it if needed
+    pools inherited from a parent process are dropped without closing
+    their connections, which still belong to the parent
+    :param key: hashable identifying the connection parameters
+    :param kwargs: arguments of ConnectionPool
+    :return: ConnectionPool object
+    """
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(**kwargs)
+        return pool
+
+
+def close_pools(predicate=lambda key: True):
+    """
+    closes the idle connections of the pools whose key matches
+    :param predicate: function taking a pool key
+    """
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items() if predicate(key)]
+    for pool in pools:
+        pool.close_all()
+
+
+def pool_stats():
+    """
+    :return: dict mapping pool keys to their stats
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {key: pool.get_stats() for key, pool in pools}
@@ -0,0 +1,137 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+PostgreSQL database backend which keeps the connections in a per process pool
+Django hands a connection back to the pool where it would otherwise close it,
+so CONN_MAX_AGE should stay 0 to return it at the end of every request
+
+Configured with the POOL entry of the database settings:
+    MAX_SIZE: upper bound of connections per process, 0 disables the pool
+    TIMEOUT: seconds to wait for a connection when all of them are in use
+    MAX_IDLE: seconds after which an idle connection is closed
+    MAX_LIFETIME: seconds after which a connection is replaced
+    CHECK_INTERVAL: idle seconds after which a connection is checked
+        with SELECT 1 before it is reused
+"""
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import (
+    DatabaseCreation as PostgresDatabaseCreation,
+)
+
+from core.db.pool import PoolTimeout, close_pools, get_pool
+
+
+def connect(conn_params):
+    connection = psycopg2.connect(**conn_params)
+    # same as the postgresql backend, see DatabaseWrapper.get_new_connection
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def check(connection):
+    """
+    :param connection: psycopg2 connection
+    :return: True if the server still answers on the connection
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return reset(connection)
+    except psycopg2.Error:
+        return False
+
+
+def reset(connection):
+    """
+    rolls back whatever the connection was left in
+    :param connection: psycopg2 connection
+    :return: False if the connection is closed or broken
+    """
+    if connection.closed:
+        return False
+    transaction_status = connection.info.transaction_status
+    if transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+    return True
+
+
+class DatabaseCreation(PostgresDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # pooled connections to the test database would block DROP DATABASE
+        close_pools(lambda key: key[1] == test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    pool = None
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get("POOL", {})
+        if not options.get("MAX_SIZE"):
+            return None
+        key = (
+            self.alias,
+            conn_params.get("database"),
+            conn_params.get("host"),
+            conn_params.get("port"),
+            conn_params.get("user"),
+        )
+        return get_pool(
+            key,
+            name=self.alias,
+            connect=lambda: connect(conn_params),
+            check=check,
+            reset=reset,
+            max_size=options["MAX_SIZE"],
+            timeout=options.get("TIMEOUT", 10),
+            max_idle=options.get("MAX_IDLE", 300),
+            max_lifetime=options.get("MAX_LIFETIME", 1800),
+            check_interval=options.get("CHECK_INTERVAL", 30),
+        )
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = self.pool.acquire()
+        except PoolTimeout as e:
+            raise OperationalError(str(e)) from e
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = options["isolation_level"]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.pool is not None:
+            with self.wrap_database_errors:
+                return self.pool.release(self.connection)
+        return super()._close()
@@ -0,0 +1,167 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the database router sending the reads of safe requests to the
+read replicas configured with DB_REPLICA_HOSTS
+Reads only go to a replica while the ReplicaRoutingMiddleware allows it for
+the current request, so management commands, migrations and the requests of
+clients pinned to the primary after their writes always use the primary.
+Replicas lagging more than DB_REPLICA_MAX_LAG seconds are skipped
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db import DatabaseError, connections
+
+from crapi_site import settings
+from utils import metrics
+
+logger = logging.getLogger()
+
+REPLICA_PREFIX = "replica_"
+# 0 on a replica which replayed everything it received, even when idle
+LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+_current_state = ContextVar("replica_state", default=None)
+
+
+class ReplicaState:
+    """
+    Routing state of the request being handled
+    Attributes:
+        use_replica: True while the reads may go to a replica
+        wrote: True once the request wrote to the primary
+    """
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def start_replica_state(state):
+    """
+    :param state: ReplicaState of the request being handled
+    :return: token to pass to stop_replica_state
+    """
+    return _current_state.set(state)
+
+
+def stop_replica_state(token):
+    _current_state.reset(token)
+
+
+def get_replicas():
+    """
+    :return: aliases of the configured read replicas
+    """
+    return [alias for alias in connections.settings if alias.startswith(REPLICA_PREFIX)]
+
+
+def is_postgres(alias):
+    return alias == "default" or alias.startswith(REPLICA_PREFIX)
+
+
+class ReplicaLagMonitor:
+    """
+    Measures the replication lag of the replicas, at most once every
+    DB_REPLICA_LAG_CHECK_INTERVAL seconds per replica and process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lags = {}
+
+    def measure(self, alias):
+        """
+        :param alias: alias of the replica
+        :return: seconds the replica is behind the primary, None if it
+            can not be reached
+        """
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError as e:
+            logger.warning(f"Replica {alias} is not available: {e}")
+            return None
+
+    def get_lag(self, alias):
+        """
+        :param alias: alias of the replica
+        :return: last measured lag in seconds, None if the replica is down
+        """
+        now = time.monotonic()
+        with self.lock:
+            checked_at, lag = self.lags.get(alias, (None, None))
+            if checked_at is not None and (
+                now - checked_at < settings.DB_REPLICA_LAG_CHECK_INTERVAL
+            ):
+                return lag
+            # the other threads keep the previous value while this one measures
+            self.lags[alias] = (now, lag)
+        lag = self.measure(alias)
+        with self.lock:
+            self.lags[alias] = (time.monotonic(), lag)
+        metrics.DB_REPLICA_LAG.labels(alias).set(-1 if lag is None else lag)
+        return lag
+
+    def is_usable(self, alias):
+        lag = self.get_lag(alias)
+        return lag is not None and lag <= settings.DB_REPLICA_MAX_LAG
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+class ReplicaRouter:
+    """
+    Routes the reads of the postgres models to a replica when the current
+    request allows it, everything else goes to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _current_state.get()
+        if state is None or not state.use_replica:
+            return None
+        replicas = [alias for alias in get_replicas() if lag_monitor.is_usable(alias)]
+        if not replicas:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _current_state.get()
+        if state is not None:
+            # the rest of the request reads what it just wrote
+            state.use_replica = False
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_postgres(obj1._state.db) and is_postgres(obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replicas follow the migrations of the primary
+        if db.startswith(REPLICA_PREFIX):
+            return False
+        return None
@@ -0,0 +1,104 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Fingerprint of the migrations a database was migrated to
+The fingerprint hashes the migration files of every installed app without
+importing them, and is stored in the database once migrate succeeded, so a
+container started on an unchanged schema does not have to run migrate
+"""
+import hashlib
+import os
+from importlib import import_module
+
+from django.apps import apps
+from django.db import DatabaseError, connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.utils import timezone
+
+FINGERPRINT_TABLE = "schema_fingerprint"
+CREATE_TABLE_SQL = (
+    f'CREATE TABLE IF NOT EXISTS "{FINGERPRINT_TABLE}" ('
+    " alias varchar(64) PRIMARY KEY,"
+    " fingerprint char(64) NOT NULL,"
+    " updated_on timestamp with time zone NOT NULL)"
+)
+SELECT_SQL = f'SELECT fingerprint FROM "{FINGERPRINT_TABLE}" WHERE alias = %s'
+UPSERT_SQL = (
+    f'INSERT INTO "{FINGERPRINT_TABLE}" (alias, fingerprint, updated_on)'
+    " VALUES (%s, %s, %s) ON CONFLICT (alias) DO UPDATE"
+    " SET fingerprint = EXCLUDED.fingerprint, updated_on = EXCLUDED.updated_on"
+)
+
+
+def get_migration_files(app_config):
+    """
+    :param app_config: AppConfig of an installed app
+    :return: sorted paths of the migration files of the app
+    """
+    module_name, explicit = MigrationLoader.migrations_module(app_config.label)
+    if module_name is None:
+        return []
+    try:
+        module = import_module(module_name)
+    except ModuleNotFoundError:
+        return []
+    files = []
+    for directory in getattr(module, "__path__", []):
+        files += [
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.endswith(".py") and name != "__init__.py"
+        ]
+    return sorted(files)
+
+
+def get_fingerprint():
+    """
+    :return: sha256 of the names and contents of the migration files
+        of the installed apps
+    """
+    digest = hashlib.sha256()
+    for app_config in sorted(apps.get_app_configs(), key=lambda app: app.label):
+        for path in get_migration_files(app_config):
+            digest.update(f"{app_config.label}/{os.path.basename(path)}\0".encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def read_fingerprint(alias="default"):
+    """
+    :param alias: alias of the database
+    :return: fingerprint stored by the last migrate, None if there is none
+    """
+    try:
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute(SELECT_SQL, [alias])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # a new database, the table is created by the first store_fingerprint
+        return None
+    return row[0] if row else None
+
+
+def store_fingerprint(fingerprint, alias="default"):
+    """
+    :param fingerprint: fingerprint of the migrations just applied
+    :param alias: alias of the database
+    :return: None
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute(UPSERT_SQL, [alias, fingerprint, timezone.now()])
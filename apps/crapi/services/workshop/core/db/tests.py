@@ -0,0 +1,217 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the database connection pool
+and the read replica routing
+"""
+import threading
+import time
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, RequestFactory
+from crapi.shop.models import Product
+from crapi_site import settings
+from core.db.pool import ConnectionPool, PoolTimeout, pool_stats
+from core.db.router import (
+    ReplicaLagMonitor,
+    ReplicaRouter,
+    ReplicaState,
+    lag_monitor,
+    start_replica_state,
+    stop_replica_state,
+)
+from core.middleware import ReplicaRoutingMiddleware
+
+
+class FakeConnection:
+    """
+    stands in for a DB-API connection in the connection pool tests
+    """
+
+    def __init__(self):
+        self.closed = False
+        self.usable = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """
+    contains the test cases related to the database connection pool
+    """
+
+    databases = {"default"}
+
+    def get_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(
+            connect,
+            check=lambda connection: connection.usable,
+            reset=lambda connection: not connection.closed,
+            **kwargs,
+        )
+
+    def test_reuses_connections(self):
+        """
+        acquires and releases a connection twice
+        should open a single connection
+        :return: None
+        """
+        pool = self.get_pool()
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.get_stats()["in_use"], 1)
+
+    def test_max_size(self):
+        """
+        acquires more connections than the pool allows
+        should wait for a connection to be released and then time out
+        :return: None
+        """
+        pool = self.get_pool(max_size=2, timeout=0.2)
+        first, second = pool.acquire(), pool.acquire()
+        threading.Timer(0.05, pool.release, [first]).start()
+        self.assertIs(pool.acquire(), first)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats = pool.get_stats()
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual((stats["size"], stats["waits"], stats["timeouts"]), (2, 1, 1))
+        self.assertGreater(stats["wait_seconds"], 0)
+
+    def test_health_check_and_reaping(self):
+        """
+        breaks an idle connection and lets another one idle for too long
+        should replace the broken connection and close the idle one
+        :return: None
+        """
+        pool = self.get_pool(check_interval=0, max_idle=0.1)
+        broken = pool.acquire()
+        pool.release(broken)
+        broken.usable = False
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, broken)
+        self.assertTrue(broken.closed)
+        pool.release(replacement)
+        time.sleep(0.1)
+        pool.acquire()
+        self.assertTrue(replacement.closed)
+        self.assertEqual(pool.get_stats()["connections_failed_check"], 1)
+
+    def test_default_database_is_pooled(self):
+        """
+        closes the django connection between two queries
+        should get the same server backend back from the pool
+        :return: None
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            backend_pid = cursor.fetchone()[0]
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            self.assertEqual(cursor.fetchone()[0], backend_pid)
+        self.assertTrue(pool_stats())
+
+
+class ReplicaRouterTestCase(TestCase):
+    """
+    contains the test cases related to the read replica routing
+    """
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        lag_monitor.lags.clear()
+        cache.clear()
+        patch.object(settings, "DB_REPLICA_HOSTS", ["replica"]).start()
+        patch("core.db.router.get_replicas", return_value=["replica_1"]).start()
+        self.measure = patch.object(lag_monitor, "measure", return_value=0.0).start()
+        self.addCleanup(patch.stopall)
+
+    def route(self, method, status_code=200, **headers):
+        """
+        sends a request through the middleware to a view reading a product
+        :return: (alias the read went to, response)
+        """
+        routed = []
+
+        def view(request):
+            routed.append(self.router.db_for_read(Product))
+            return HttpResponse(status=status_code)
+
+        request = getattr(RequestFactory(), method)(
+            "/workshop/api/shop/products", **headers
+        )
+        response = ReplicaRoutingMiddleware(view)(request)
+        return routed[0], response
+
+    def test_db_for_read(self):
+        """
+        reads inside and outside of a safe request, from a lagging replica
+        and after a write
+        should only read from a replica which is close to the primary
+        before the request wrote anything
+        :return: None
+        """
+        self.assertIsNone(self.router.db_for_read(Product))
+        token = start_replica_state(ReplicaState(True))
+        try:
+            self.assertEqual(self.router.db_for_read(Product), "replica_1")
+            lag_monitor.lags.clear()
+            self.measure.return_value = 10.0
+            self.assertIsNone(self.router.db_for_read(Product))
+            lag_monitor.lags.clear()
+            self.measure.return_value = 0.0
+            self.router.db_for_write(Product)
+            self.assertIsNone(self.router.db_for_read(Product))
+        finally:
+            stop_replica_state(token)
+
+    def test_pin_after_write(self):
+        """
+        reads after a successful write of the same client
+        should read from the primary until the pin expires
+        :return: None
+        """
+        auth = {"HTTP_AUTHORIZATION": "Bearer pin@example.com"}
+        self.assertEqual(self.route("get", **auth)[0], "replica_1")
+        self.assertIsNone(self.route("post", status_code=400, **auth)[0])
+        self.assertEqual(self.route("get", **auth)[0], "replica_1")
+        response = self.route("post", status_code=201, **auth)[1]
+        self.assertIn(ReplicaRoutingMiddleware.PIN_COOKIE, response.cookies)
+        self.assertIsNone(self.route("get", **auth)[0])
+        # other workers only see the cookie
+        cache.clear()
+        self.assertEqual(self.route("get", **auth)[0], "replica_1")
+        pinned = self.route(
+            "get", HTTP_COOKIE=f"{ReplicaRoutingMiddleware.PIN_COOKIE}=1", **auth
+        )
+        self.assertIsNone(pinned[0])
+
+    def test_measure_lag(self):
+        """
+        measures the lag of a database which is not a replica
+        should not see any lag
+        :return: None
+        """
+        self.assertEqual(ReplicaLagMonitor().measure("default"), 0.0)
@@ -0,0 +1,213 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Background health checks of the dependencies of the workshop service
+Every worker probes the database, the identity service, the payment gateway
+and the mongo coupon store every HEALTH_CHECK_INTERVAL seconds from a daemon
+thread, the health check endpoints only read the last results, so the
+number of probes hitting the dependencies does not grow with the number
+of replicas and load balancers asking for the health of the service.
+The service is ready while the dependencies of HEALTH_CHECK_REQUIRED are up,
+only the database by default, the others are reported without taking the
+service out of rotation
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+from django.db import connections
+
+from crapi_site import settings
+from utils import metrics
+
+logger = logging.getLogger()
+
+UP = "up"
+DOWN = "down"
+
+
+def check_database():
+    connection = connections["default"]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    finally:
+        # gives the connection back to the pool of the process
+        connection.close()
+
+
+def check_mongodb():
+    from crapi.shop.coupons import get_client
+
+    get_client().admin.command("ping")
+
+
+def check_url(url, is_up):
+    response = requests.get(url, timeout=settings.HEALTH_CHECK_TIMEOUT, verify=False)
+    if not is_up(response.status_code):
+        raise ValueError(f"{url} returned {response.status_code}")
+
+
+def check_identity():
+    check_url(settings.IDENTITY_HEALTH, lambda status: status == 200)
+
+
+def check_gateway():
+    # the gateway has no health endpoint, any answer of its root will do
+    check_url(settings.API_GATEWAY_URL, lambda status: status < 500)
+
+
+CHECKS = {
+    "database": check_database,
+    "identity": check_identity,
+    "gateway": check_gateway,
+    "mongodb": check_mongodb,
+}
+
+
+class HealthProber:
+    """
+    Runs the health checks in the background and keeps their last results
+    A check which does not answer within HEALTH_CHECK_TIMEOUT is reported
+    down and is not started again before its previous run returned
+    Attributes:
+        checks: dict mapping the name of every dependency to its check
+        results: dict mapping the name of every dependency to its last result
+    """
+
+    def __init__(self, checks):
+        self.checks = checks
+        self.results = {}
+        self.lock = threading.Lock()
+        self.pid = None
+        self.thread = None
+        self.executor = self.create_executor()
+        self.running = {}
+        self.stopped = threading.Event()
+
+    def start(self):
+        """
+        starts the prober thread of the process if it is not running,
+        a forked worker starts its own
+        :return: None
+        """
+        with self.lock:
+            if self.pid == os.getpid() and self.thread.is_alive():
+                return
+            self.pid = os.getpid()
+            self.results = {}
+            self.running = {}
+            self.stopped.clear()
+            # the threads of an executor created before a fork are gone
+            self.executor = self.create_executor()
+            self.thread = threading.Thread(
+                target=self.run, name="health-prober", daemon=True
+            )
+            self.thread.start()
+
+    def create_executor(self):
+        return ThreadPoolExecutor(
+            max_workers=len(self.checks), thread_name_prefix="health-check"
+        )
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error(f"Health checks failed: {e}")
+            self.stopped.wait(settings.HEALTH_CHECK_INTERVAL)
+
+    def probe(self):
+        """
+        runs every check once and records the results
+        :return: None
+        """
+        started = set()
+        for name, check in self.checks.items():
+            future = self.running.get(name)
+            if future is None or future.done():
+                self.running[name] = self.executor.submit(self.timed, check)
+                started.add(name)
+        deadline = time.monotonic() + settings.HEALTH_CHECK_TIMEOUT
+        for name in self.checks:
+            if name not in started:
+                self.record(name, DOWN, None, "previous check still running")
+                continue
+            try:
+                latency = self.running[name].result(
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            except FutureTimeoutError:
+                self.record(name, DOWN, None, "timed out")
+            except Exception as e:
+                self.record(name, DOWN, None, str(e) or type(e).__name__)
+            else:
+                self.record(name, UP, latency, None)
+
+    def timed(self, check):
+        started = time.perf_counter()
+        check()
+        return time.perf_counter() - started
+
+    def record(self, name, status, latency, error):
+        # logged when the status changes, not on every probe
+        previous = self.results.get(name)
+        if status == DOWN and (previous is None or previous["status"] == UP):
+            logger.warning(f"Health check of {name} failed: {error}")
+        elif status == UP and previous is not None and previous["status"] == DOWN:
+            logger.info(f"Health check of {name} recovered")
+        self.results[name] = {
+            "status": status,
+            "latency_ms": None if latency is None else round(latency * 1000, 1),
+            "error": error,
+            "checked_at": time.time(),
+        }
+        metrics.DEPENDENCY_UP.labels(name).set(1 if status == UP else 0)
+
+    def get_results(self):
+        """
+        :return: dict mapping every dependency to its last result, the ones
+            not checked for HEALTH_CHECK_MAX_AGE seconds are reported down
+        """
+        now = time.time()
+        results = {}
+        for name in self.checks:
+            result = self.results.get(name)
+            if result is None:
+                result = {"status": DOWN, "error": "not checked yet"}
+            elif now - result["checked_at"] > settings.HEALTH_CHECK_MAX_AGE:
+                result = dict(result, status=DOWN, error="result is stale")
+            results[name] = result
+        return results
+
+    def is_ready(self, results):
+        """
+        :param results: results returned by get_results
+        :return: True if every dependency of HEALTH_CHECK_REQUIRED is up
+        """
+        return all(
+            results.get(name, {}).get("status") == UP
+            for name in settings.HEALTH_CHECK_REQUIRED
+        )
+
+
+prober = HealthProber(CHECKS)
@@ -0,0 +1,241 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Synthetic data the load tests run against
+The rows of the loadtest users are found again by their email domain, the
+products and the mongo coupons, which belong to no user, are deleted by the
+ids kept in the Dataset, so delete_dataset never touches rows it did not create
+"""
+import random
+import uuid
+from dataclasses import dataclass, field
+
+import jwt
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from crapi.mechanic.models import Mechanic, ServiceRequest
+from crapi.shop import coupons as coupon_store
+from crapi.shop.models import AppliedCoupon, Order, Product
+from crapi.user.models import User, UserDetails, Vehicle, VehicleCompany, VehicleModel
+
+EMAIL_DOMAIN = "loadtest.example.com"
+NAME_PREFIX = "LoadTest"
+COUPON_PREFIX = "LOADTEST"
+BATCH_SIZE = 1000
+
+
+@dataclass
+class Dataset:
+    """
+    what the scenarios need to know about the seeded rows
+    """
+
+    user_tokens: list = field(default_factory=list)
+    mechanic_tokens: list = field(default_factory=list)
+    orders: dict = field(default_factory=dict)
+    vins: list = field(default_factory=list)
+    mechanic_codes: list = field(default_factory=list)
+    service_request_ids: list = field(default_factory=list)
+    products: list = field(default_factory=list)
+    coupon_codes: list = field(default_factory=list)
+
+
+def get_token(email):
+    """
+    :param email: email of the user
+    :return: bearer token for the user, the workshop only reads its subject
+        and leaves the verification to the identity service
+    """
+    return jwt.encode({"sub": email, "role": "user"}, "loadtest", algorithm="HS256")
+
+
+def create_users(fake, count, role, name):
+    users = User.objects.bulk_create(
+        [
+            User(
+                email=f"{name}{i}@{EMAIL_DOMAIN}",
+                number=fake.numerify("##########"),
+                password="loadtest",
+                role=role,
+                created_on=timezone.now(),
+            )
+            for i in range(count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    UserDetails.objects.bulk_create(
+        [
+            UserDetails(
+                user=user,
+                name=fake.name(),
+                status="ACTIVE",
+                available_credit=1_000_000_000,
+            )
+            for user in users
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return users
+
+
+@transaction.atomic
+def seed_dataset(
+    users=100,
+    mechanics=10,
+    products=20,
+    orders_per_user=5,
+    service_requests_per_user=3,
+    coupons=100,
+    seed=None,
+):
+    """
+    creates the synthetic dataset, removing the users of a previous run first
+    :param users: number of users, each one owns a vehicle
+    :param mechanics: number of mechanics
+    :param products: number of products
+    :param orders_per_user: number of orders of every user
+    :param service_requests_per_user: number of service requests
+        for the vehicle of every user
+    :param coupons: number of coupons in the mongo coupon store
+    :param seed: seed of the generated values
+    :return: Dataset
+    """
+    delete_dataset()
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    now = timezone.now()
+    dataset = Dataset()
+
+    company = VehicleCompany.objects.create(name=NAME_PREFIX)
+    vehicle_model = VehicleModel.objects.create(
+        fuel_type=0, model=NAME_PREFIX, vehicle_img="", vehiclecompany=company
+    )
+    product_rows = Product.objects.bulk_create(
+        [
+            Product(
+                name=f"{NAME_PREFIX} {fake.word()} {i}",
+                price=rng.randint(1, 100),
+                image_url="images/seat.svg",
+            )
+            for i in range(products)
+        ]
+    )
+    dataset.products = [product.id for product in product_rows]
+
+    mechanic_users = create_users(fake, mechanics, User.ROLE_CHOICES.MECH, "mechanic")
+    mechanic_rows = Mechanic.objects.bulk_create(
+        [
+            Mechanic(mechanic_code=f"LOADTEST_{i}", user=user)
+            for i, user in enumerate(mechanic_users)
+        ]
+    )
+    dataset.mechanic_tokens = [get_token(user.email) for user in mechanic_users]
+    dataset.mechanic_codes = [mechanic.mechanic_code for mechanic in mechanic_rows]
+
+    user_rows = create_users(fake, users, User.ROLE_CHOICES.USER, "user")
+    dataset.user_tokens = [get_token(user.email) for user in user_rows]
+    vehicles = Vehicle.objects.bulk_create(
+        [
+            Vehicle(
+                vin=f"LT{user.id:015d}",
+                pincode=fake.numerify("####"),
+                year=rng.randint(2000, 2024),
+                vehicle_model=vehicle_model,
+                owner=user,
+                status="ACTIVE",
+            )
+            for user in user_rows
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    dataset.vins = [vehicle.vin for vehicle in vehicles]
+
+    order_rows = Order.objects.bulk_create(
+        [
+            Order(
+                user=user,
+                product_id=rng.choice(dataset.products),
+                quantity=rng.randint(1, 5),
+                created_on=now,
+            )
+            for user in user_rows
+            for i in range(orders_per_user)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    for user, token in zip(user_rows, dataset.user_tokens):
+        dataset.orders[token] = []
+    tokens = {user.id: token for user, token in zip(user_rows, dataset.user_tokens)}
+    for order in order_rows:
+        dataset.orders[tokens[order.user_id]].append(order.id)
+
+    service_requests = ServiceRequest.objects.bulk_create(
+        [
+            ServiceRequest(
+                vehicle=vehicle,
+                mechanic=rng.choice(mechanic_rows),
+                problem_details=fake.sentence(nb_words=20),
+                status=rng.choice(ServiceRequest.STATUS_CHOICES)[0],
+                created_on=now,
+            )
+            for vehicle in vehicles
+            for i in range(service_requests_per_user)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    dataset.service_request_ids = [request.id for request in service_requests]
+
+    # unique per run, not per seed, so no other coupon is deleted with them
+    run = uuid.uuid4().hex[:12].upper()
+    dataset.coupon_codes = [f"{COUPON_PREFIX}_{run}_{i}" for i in range(coupons)]
+    if coupons:
+        coupon_store.get_collection().insert_many(
+            [
+                {"coupon_code": code, "amount": str(rng.randint(1, 100))}
+                for code in dataset.coupon_codes
+            ]
+        )
+    return dataset
+
+
+@transaction.atomic
+def delete_dataset(dataset=None):
+    """
+    removes the rows of the loadtest users, and the products and the
+    coupons of the dataset if it is given. The products and the coupons
+    of a dataset kept with --keep-data are left behind
+    :param dataset: Dataset returned by seed_dataset
+    :return: None
+    """
+    users = User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+    ServiceRequest.objects.filter(vehicle__owner__in=users).delete()
+    ServiceRequest.objects.filter(mechanic__user__in=users).delete()
+    Order.objects.filter(user__in=users).delete()
+    AppliedCoupon.objects.filter(user__in=users).delete()
+    Mechanic.objects.filter(user__in=users).delete()
+    Vehicle.objects.filter(owner__in=users).delete()
+    UserDetails.objects.filter(user__in=users).delete()
+    users.delete()
+    if dataset is not None:
+        Product.objects.filter(id__in=dataset.products).delete()
+        if dataset.coupon_codes:
+            coupon_store.get_collection().delete_many(
+                {"coupon_code": {"$in": dataset.coupon_codes}}
+            )
+    VehicleModel.objects.filter(vehiclecompany__name=NAME_PREFIX).delete()
+    VehicleCompany.objects.filter(name=NAME_PREFIX).delete()
@@ -0,0 +1,255 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Open loop load driver and the latency and throughput statistics
+Requests are started on a fixed schedule whatever the response times are,
+and their latency is measured from the time they were scheduled at,
+so a saturated service shows up as growing latencies instead of fewer requests
+"""
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """
+    :param values: sorted list of numbers
+    :param p: percentile between 0 and 100
+    :return: nearest rank percentile, None for no values
+    """
+    if not values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+class Results:
+    """
+    Latencies and status codes of the requests of a run, per scenario
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, name, latency, status_code, error):
+        with self.lock:
+            self.latencies[name].append(latency)
+            self.statuses[name][status_code] += 1
+            if error:
+                self.errors[name] += 1
+
+    def summary(self):
+        """
+        :return: dict mapping every scenario and "total" to its
+            requests, errors, error_rate, throughput and p50/p95/p99/max in ms
+        """
+        summary = {}
+        every_latency = []
+        for name in sorted(self.latencies):
+            latencies = sorted(self.latencies[name])
+            every_latency.extend(latencies)
+            summary[name] = self.endpoint_summary(latencies, self.errors[name])
+            summary[name]["statuses"] = dict(sorted(self.statuses[name].items()))
+        summary["total"] = self.endpoint_summary(
+            sorted(every_latency), sum(self.errors.values())
+        )
+        return summary
+
+    def endpoint_summary(self, latencies, errors):
+        data = {
+            "requests": len(latencies),
+            "errors": errors,
+            "error_rate": errors / len(latencies) if latencies else 0.0,
+            "throughput": len(latencies) / self.duration if self.duration else 0.0,
+        }
+        for p in PERCENTILES:
+            data[f"p{p}"] = percentile(latencies, p) * 1000 if latencies else None
+        data["max"] = latencies[-1] * 1000 if latencies else None
+        return data
+
+
+class LoadDriver:
+    """
+    Sends the scenarios at a target rate to a workshop service
+    Attributes:
+        base_url: url of the workshop, e.g. http://127.0.0.1:8000
+        scenarios: list of Scenario, picked according to their weights
+        rps: requests started per second
+        concurrency: maximum number of requests in flight
+        timeout: seconds after which a request counts as an error
+    """
+
+    def __init__(
+        self, base_url, scenarios, dataset, rps, concurrency, timeout=30, seed=None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.scenarios = scenarios
+        self.weights = [scenario.weight for scenario in scenarios]
+        self.dataset = dataset
+        self.rps = rps
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.local = threading.local()
+
+    def session(self):
+        # one keep-alive session per worker thread
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def call(self, scenario, request, scheduled, results):
+        error = False
+        status_code = None
+        try:
+            response = self.session().request(
+                request.method,
+                self.base_url + request.path,
+                timeout=self.timeout,
+                **request.kwargs,
+            )
+            response.content
+            status_code = response.status_code
+            error = status_code not in scenario.expected
+        except requests.RequestException as e:
+            status_code = type(e).__name__
+            error = True
+        results.record(
+            scenario.name, time.perf_counter() - scheduled, status_code, error
+        )
+
+    def run(self, duration):
+        """
+        :param duration: seconds to send requests for
+        :return: Results of the requests started during that time
+        """
+        results = Results()
+        interval = 1 / self.rps
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            scheduled = started
+            while scheduled < started + duration:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                scenario = self.rng.choices(self.scenarios, self.weights)[0]
+                request = scenario.build(self.dataset, self.rng)
+                executor.submit(self.call, scenario, request, scheduled, results)
+                scheduled += interval
+        results.duration = time.perf_counter() - started
+        return results
+
+
+def format_summary(summary):
+    """
+    :param summary: Results.summary()
+    :return: the summary as a text table
+    """
+    columns = ("requests", "errors", "throughput", "p50", "p95", "p99", "max")
+    width = max(len(name) for name in summary)
+    lines = [
+        f"{'endpoint':<{width}}  " + "  ".join(f"{column:>10}" for column in columns)
+    ]
+    for name, data in summary.items():
+        values = []
+        for column in columns:
+            value = data[column]
+            if value is None:
+                values.append(f"{'-':>10}")
+            elif isinstance(value, float):
+                values.append(f"{value:>10.1f}")
+            else:
+                values.append(f"{value:>10}")
+        lines.append(f"{name:<{width}}  " + "  ".join(values))
+    lines.append("throughput in requests/s, latencies in ms")
+    return "\n".join(lines)
+
+
+def save_baseline(path, summary, options):
+    """
+    :param path: file to write the baseline to
+    :param summary: Results.summary()
+    :param options: options of the run, stored to compare like with like
+    :return: None
+    """
+    endpoints = {
+        name: {key: value for key, value in data.items() if key != "statuses"}
+        for name, data in summary.items()
+    }
+    with open(path, "w") as f:
+        json.dump({"options": options, "endpoints": endpoints}, f, indent=2)
+        f.write("\n")
+
+
+def load_baseline(path):
+    """
+    :param path: baseline file written by save_baseline
+    :return: dict with the options and the per endpoint results of the baseline
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_baseline(baseline, summary, tolerance, tolerance_ms):
+    """
+    only the endpoints which were part of both runs are compared
+    :param baseline: load_baseline()
+    :param summary: Results.summary() of the current run
+    :param tolerance: allowed relative increase of the latencies
+        and decrease of the throughput
+    :param tolerance_ms: latency increase in ms always allowed,
+        keeps the fast endpoints from failing on noise
+    :return: list of regression messages, empty if there is none
+    """
+    regressions = []
+    for name, expected in baseline["endpoints"].items():
+        actual = summary.get(name)
+        if actual is None or not expected["requests"]:
+            continue
+        for p in PERCENTILES:
+            key = f"p{p}"
+            if expected.get(key) is None:
+                continue
+            limit = expected[key] * (1 + tolerance) + tolerance_ms
+            if actual[key] > limit:
+                regressions.append(
+                    f"{name}: {key} {actual[key]:.1f}ms > {limit:.1f}ms"
+                    f" (baseline {expected[key]:.1f}ms)"
+                )
+        limit = expected["throughput"] * (1 - tolerance)
+        if actual["throughput"] < limit:
+            regressions.append(
+                f"{name}: throughput {actual['throughput']:.1f}/s < {limit:.1f}/s"
+                f" (baseline {expected['throughput']:.1f}/s)"
+            )
+        limit = expected["error_rate"] + 0.01
+        if actual["error_rate"] > limit:
+            regressions.append(
+                f"{name}: error rate {actual['error_rate']:.1%} > {limit:.1%}"
+            )
+    return regressions
@@ -0,0 +1,140 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+The endpoints driven by the load tests and their default share of the traffic
+Every scenario builds one request from the seeded Dataset
+"""
+from collections import namedtuple
+
+Request = namedtuple("Request", ["method", "path", "kwargs"])
+
+
+class Scenario:
+    """
+    Attributes:
+        name: name the results are reported under
+        weight: relative share of the requests
+        expected: status codes which are not counted as errors
+    """
+
+    def __init__(self, name, weight, build, expected=(200,)):
+        self.name = name
+        self.weight = weight
+        self.build = build
+        self.expected = expected
+
+
+def auth(token):
+    return {"headers": {"Authorization": f"Bearer {token}"}}
+
+
+def products(dataset, rng):
+    return Request(
+        "GET", "/workshop/api/shop/products", auth(rng.choice(dataset.user_tokens))
+    )
+
+
+def orders(dataset, rng):
+    return Request(
+        "GET", "/workshop/api/shop/orders/all", auth(rng.choice(dataset.user_tokens))
+    )
+
+
+def order(dataset, rng):
+    token = rng.choice(dataset.user_tokens)
+    order_id = rng.choice(dataset.orders[token])
+    return Request("GET", f"/workshop/api/shop/orders/{order_id}", auth(token))
+
+
+def create_order(dataset, rng):
+    kwargs = auth(rng.choice(dataset.user_tokens))
+    kwargs["json"] = {"product_id": rng.choice(dataset.products), "quantity": 1}
+    return Request("POST", "/workshop/api/shop/orders", kwargs)
+
+
+def apply_coupon(dataset, rng):
+    kwargs = auth(rng.choice(dataset.user_tokens))
+    kwargs["json"] = {"coupon_code": rng.choice(dataset.coupon_codes), "amount": 10}
+    return Request("POST", "/workshop/api/shop/apply_coupon", kwargs)
+
+
+def mechanic_service_requests(dataset, rng):
+    return Request(
+        "GET",
+        "/workshop/api/mechanic/service_requests",
+        auth(rng.choice(dataset.mechanic_tokens)),
+    )
+
+
+def vehicle_service_requests(dataset, rng):
+    vin = rng.choice(dataset.vins)
+    return Request("GET", f"/workshop/api/merchant/service_requests/{vin}", {})
+
+
+def receive_report(dataset, rng):
+    params = {
+        "mechanic_code": rng.choice(dataset.mechanic_codes),
+        "problem_details": "Engine makes a noise when started",
+        "vin": rng.choice(dataset.vins),
+    }
+    return Request("GET", "/workshop/api/mechanic/receive_report", {"params": params})
+
+
+def mechanic_report(dataset, rng):
+    kwargs = auth(rng.choice(dataset.user_tokens))
+    kwargs["params"] = {"report_id": rng.choice(dataset.service_request_ids)}
+    return Request("GET", "/workshop/api/mechanic/mechanic_report", kwargs)
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("products", 25, products),
+        Scenario("orders", 15, orders),
+        Scenario("order", 10, order),
+        Scenario("create_order", 5, create_order),
+        # a seeded coupon is applied once per user, the coupons the
+        # user picks again are answered with a 400
+        Scenario("apply_coupon", 10, apply_coupon, expected=(200, 400)),
+        Scenario("mechanic_service_requests", 10, mechanic_service_requests),
+        Scenario("vehicle_service_requests", 10, vehicle_service_requests),
+        Scenario("receive_report", 10, receive_report),
+        Scenario("mechanic_report", 5, mechanic_report),
+    )
+}
+
+
+def parse_mix(mix):
+    """
+    :param mix: comma separated name=weight pairs, e.g. "products=3,orders=1"
+        only the named scenarios are run
+    :return: list of Scenario
+    :raises ValueError: for an unknown scenario or an invalid weight
+    """
+    if not mix:
+        return list(SCENARIOS.values())
+    scenarios = []
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(
+                f"Unknown scenario {name}, choose from {', '.join(SCENARIOS)}"
+            )
+        scenario = SCENARIOS[name]
+        weight = float(weight) if weight else scenario.weight
+        if weight < 0:
+            raise ValueError(f"Invalid weight for {name}: {weight}")
+        scenarios.append(Scenario(name, weight, scenario.build, scenario.expected))
+    return scenarios
@@ -0,0 +1,110 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Local stand-ins for the services the workshop calls on every request,
+so the load tests do not need the rest of crAPI
+    POST /identity/api/auth/verify accepts every bearer token
+    GET /identity/health_check
+    POST /v1/payment approves every payment
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status_code, data):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        if self.path == "/identity/health_check":
+            return self.send_json(200, {"status": "UP"})
+        return self.send_json(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        data = self.read_json()
+        time.sleep(self.server.latency)
+        if self.path == "/identity/api/auth/verify":
+            if not data or not data.get("token"):
+                return self.send_json(401, {"message": "Invalid Token"})
+            return self.send_json(200, {"message": "Token is valid"})
+        if self.path == "/v1/payment":
+            if not self.headers.get("Authorization"):
+                return self.send_json(401, {"message": "Unauthorized"})
+            data = data or {}
+            return self.send_json(
+                200,
+                {
+                    "id": str(uuid.uuid4()),
+                    "status": "succeeded",
+                    "amount": data.get("amount"),
+                },
+            )
+        return self.send_json(404, {"message": "Not Found"})
+
+
+class StubServer:
+    """
+    Serves the identity and payment stubs from a background thread
+    Attributes:
+        latency: seconds every POST is delayed by, to model the real services
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self):
+        return f"http://{self.address}"
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="loadtest-stubs", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
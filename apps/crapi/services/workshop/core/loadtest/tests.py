@@ -0,0 +1,132 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the load test harness
+"""
+import random
+from unittest.mock import patch
+from django.test import TestCase
+from crapi.mechanic.models import ServiceRequest
+from crapi.shop.models import Order, Product
+from crapi.user.models import User
+from core.loadtest.dataset import delete_dataset, seed_dataset
+from core.loadtest.runner import Results, compare_baseline, percentile
+from core.loadtest.scenarios import SCENARIOS, parse_mix
+from core.loadtest.stubs import StubServer
+
+
+class LoadTestTestCase(TestCase):
+    """
+    contains the test cases related to the load test harness
+    """
+
+    def test_stubs(self):
+        """
+        calls the identity and payment stubs
+        should accept a token and a payment with credentials
+        :return: None
+        """
+        import requests
+
+        stubs = StubServer().start()
+        try:
+            res = requests.post(
+                f"{stubs.url}/identity/api/auth/verify", json={"token": "x"}
+            )
+            self.assertEqual(res.status_code, 200)
+            res = requests.post(f"{stubs.url}/identity/api/auth/verify", json={})
+            self.assertEqual(res.status_code, 401)
+            res = requests.post(
+                f"{stubs.url}/v1/payment",
+                json={"amount": 20.0},
+                headers={"Authorization": "Basic x"},
+            )
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json()["amount"], 20.0)
+        finally:
+            stubs.stop()
+
+    def test_dataset(self):
+        """
+        seeds the dataset and builds a request of every scenario
+        should refer to seeded rows and leave nothing behind once deleted
+        :return: None
+        """
+        product = Product.objects.create(
+            name="LoadTest Seat", price="10.00", image_url="images/seat.svg"
+        )
+        with patch("crapi.shop.coupons.get_collection") as get_collection:
+            dataset = seed_dataset(
+                users=5, mechanics=2, products=3, orders_per_user=2, coupons=4, seed=1
+            )
+            coupons = get_collection.return_value.insert_many.call_args[0][0]
+            self.assertEqual(
+                [coupon["coupon_code"] for coupon in coupons], dataset.coupon_codes
+            )
+            self.assertEqual(len(set(dataset.coupon_codes)), 4)
+            self.assertEqual(len(dataset.user_tokens), 5)
+            self.assertEqual(
+                Order.objects.filter(id__in=sum(dataset.orders.values(), [])).count(),
+                10,
+            )
+            self.assertEqual(
+                ServiceRequest.objects.filter(
+                    id__in=dataset.service_request_ids
+                ).count(),
+                15,
+            )
+            rng = random.Random(1)
+            for scenario in SCENARIOS.values():
+                request = scenario.build(dataset, rng)
+                self.assertTrue(request.path.startswith("/workshop/api/"))
+            delete_dataset(dataset)
+            get_collection.return_value.delete_many.assert_called_once_with(
+                {"coupon_code": {"$in": dataset.coupon_codes}}
+            )
+        self.assertFalse(
+            User.objects.filter(email__endswith="loadtest.example.com").exists()
+        )
+        self.assertFalse(Product.objects.filter(id__in=dataset.products).exists())
+        self.assertTrue(Product.objects.filter(id=product.id).exists())
+
+    def test_parse_mix(self):
+        """
+        parses a mix with an unknown scenario
+        should raise a ValueError
+        :return: None
+        """
+        scenarios = parse_mix("products=3,orders")
+        self.assertEqual([s.name for s in scenarios], ["products", "orders"])
+        self.assertEqual(scenarios[1].weight, SCENARIOS["orders"].weight)
+        with self.assertRaises(ValueError):
+            parse_mix("products=1,unknown=1")
+
+    def test_compare_baseline(self):
+        """
+        compares a slower run with the baseline
+        should report the percentiles over the tolerance
+        :return: None
+        """
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
+        baseline = Results()
+        slower = Results()
+        baseline.duration = slower.duration = 1
+        for i in range(100):
+            baseline.record("products", 0.010, 200, False)
+            slower.record("products", 0.010 if i < 90 else 0.100, 200, False)
+        baseline = {"options": {}, "endpoints": baseline.summary()}
+        self.assertEqual(compare_baseline(baseline, baseline["endpoints"], 0.2, 5), [])
+        regressions = compare_baseline(baseline, slower.summary(), 0.2, 5)
+        self.assertEqual(len(regressions), 4)
+        self.assertTrue(regressions[0].startswith("products: p95"))
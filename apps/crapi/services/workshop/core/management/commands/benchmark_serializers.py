@@ -0,0 +1,162 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Serializer micro-benchmarks
+
+    python manage.py benchmark_serializers
+    python manage.py benchmark_serializers --history serializer-benchmarks.jsonl
+
+With --history every run is appended to the file and compared
+with the previous one, --max-regression makes the command fail
+when a serializer got slower than that
+"""
+import json
+import platform
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from core.benchmarks.serializers import run_benchmarks
+
+
+def get_revision():
+    """
+    :return: git commit of the code being benchmarked, None outside a checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_last_run(path):
+    """
+    :param path: history file
+    :return: last run recorded in the file, None if there is none
+    """
+    last = None
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    last = json.loads(line)
+    except FileNotFoundError:
+        pass
+    return last
+
+
+class Command(BaseCommand):
+    help = "Benchmark the serialization cost of the workshop serializers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=api_settings.PAGE_SIZE,
+            help="number of objects in a page",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--min-time",
+            type=float,
+            default=0.05,
+            help="seconds every measurement runs for at least",
+        )
+        parser.add_argument("--filter", help="only the serializers matching this")
+        parser.add_argument("--history", help="JSON lines file of the previous runs")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="fail if a page got slower than the previous run by this fraction",
+        )
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(
+            options["page_size"],
+            repeat=options["repeat"],
+            min_time=options["min_time"],
+            pattern=options["filter"],
+        )
+        previous = read_last_run(options["history"]) if options["history"] else None
+        previous_results = previous["results"] if previous else {}
+        self.stdout.write(self.format_results(results, previous_results, options))
+
+        if options["history"]:
+            run = {
+                "time": timezone.now().isoformat(),
+                "revision": get_revision(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "page_size": options["page_size"],
+                "results": results,
+            }
+            with open(options["history"], "a") as f:
+                f.write(json.dumps(run) + "\n")
+
+        missing = [path for path, result in results.items() if result is None]
+        if missing:
+            raise CommandError(
+                "No sample for " + ", ".join(missing) + ", add one to "
+                "core.benchmarks.serializers"
+            )
+        if options["max_regression"] is not None and previous:
+            regressions = [
+                path
+                for path, result in results.items()
+                if self.get_change(path, result, previous_results)
+                > options["max_regression"]
+            ]
+            if regressions:
+                raise CommandError(
+                    "Slower than the last run: " + ", ".join(regressions)
+                )
+
+    def get_change(self, path, result, previous_results):
+        """
+        :return: relative change of the page time from the previous run
+        """
+        previous = previous_results.get(path)
+        if not result or not previous:
+            return 0.0
+        return result["page_us"] / previous["page_us"] - 1
+
+    def format_results(self, results, previous_results, options):
+        width = max([len(path) for path in results] + [10])
+        lines = [
+            f"{'serializer':<{width}}  {'kind':>6}  {'object us':>10}"
+            f"  {'page us':>10}  {'us/object':>10}  {'change':>8}"
+        ]
+        for path, result in results.items():
+            if result is None:
+                lines.append(f"{path:<{width}}  no sample")
+                continue
+            change = ""
+            if path in previous_results:
+                change = f"{self.get_change(path, result, previous_results):+.1%}"
+            lines.append(
+                f"{path:<{width}}  {result['kind']:>6}  {result['object_us']:>10.1f}"
+                f"  {result['page_us']:>10.1f}  {result['page_object_us']:>10.1f}"
+                f"  {change:>8}"
+            )
+        lines.append(f"page of {options['page_size']} objects, change of the page time")
+        return "\n".join(lines)
@@ -0,0 +1,57 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Startup time benchmark
+
+    python manage.py benchmark_startup
+    python manage.py benchmark_startup --migrate --imports 30
+
+--migrate times a migrate as well, which applies the pending migrations,
+so only use it on a database that may be migrated
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks.startup import PHASES, run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Benchmark where the startup time of the workshop service goes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--migrate", action="store_true", help="time migrate")
+        parser.add_argument(
+            "--imports", type=int, default=15, help="number of imports listed"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            phases, imports, process = run_benchmark(
+                repeat=options["repeat"], migrate=options["migrate"]
+            )
+        except RuntimeError as e:
+            raise CommandError(f"The startup failed: {e}")
+        lines = [f"{'phase':<40}  {'seconds':>8}"]
+        for name in PHASES:
+            if name in phases:
+                lines.append(f"{name:<40}  {phases[name]:>8.3f}")
+        lines.append(f"{'process':<40}  {process:>8.3f}")
+        lines.append("")
+        lines.append(f"{'top level import':<40}  {'seconds':>8}")
+        slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in slowest[: options["imports"]]:
+            lines.append(f"{name:<40}  {seconds:>8.3f}")
+        lines.append(f"fastest of {options['repeat']} starts")
+        self.stdout.write("\n".join(lines))
@@ -0,0 +1,115 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Generates a capacity testing dataset
+
+    python manage.py generate_data --users 200000 --orders-per-user 5
+    python manage.py generate_data --delete
+
+The ids are reserved from the sequences before the rows are written,
+so run it against a database nothing else writes to at the same time
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from core.datagen.generator import (
+    WRITERS,
+    DataGenerator,
+    delete_generated,
+    delete_generated_coupons,
+)
+
+
+class Command(BaseCommand):
+    help = "Generate users, vehicles, mechanics, service requests and orders in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--mechanics", type=int, default=50)
+        parser.add_argument("--products", type=int, default=50)
+        parser.add_argument("--vehicles-per-user", type=int, default=1)
+        parser.add_argument("--service-requests-per-vehicle", type=int, default=3)
+        parser.add_argument("--comments-per-request", type=int, default=2)
+        parser.add_argument("--orders-per-user", type=int, default=5)
+        parser.add_argument(
+            "--coupons", type=int, default=0, help="coupons written to mongo"
+        )
+        parser.add_argument(
+            "--method",
+            choices=sorted(WRITERS),
+            default="copy",
+            help="COPY or bulk_create",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--days", type=int, default=365, help="age of the oldest rows"
+        )
+        parser.add_argument("--seed", type=int)
+        parser.add_argument(
+            "--delete", action="store_true", help="remove the generated data"
+        )
+
+    def handle(self, *args, **options):
+        if options["delete"]:
+            return self.delete(options)
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive")
+        generator = DataGenerator(
+            method=options["method"],
+            batch_size=options["batch_size"],
+            days=options["days"],
+            seed=options["seed"],
+        )
+        started = time.perf_counter()
+        try:
+            generator.generate(
+                users=options["users"],
+                mechanics=options["mechanics"],
+                products=options["products"],
+                vehicles_per_user=options["vehicles_per_user"],
+                service_requests_per_vehicle=options["service_requests_per_vehicle"],
+                comments_per_request=options["comments_per_request"],
+                orders_per_user=options["orders_per_user"],
+                coupons=options["coupons"],
+            )
+        except PyMongoError as e:
+            raise CommandError(f"Could not write the coupons: {e}")
+        finally:
+            self.stdout.write(
+                self.format_stats(generator.stats, time.perf_counter() - started)
+            )
+
+    def delete(self, options):
+        users = delete_generated()
+        self.stdout.write(f"Deleted {users} generated users and their data")
+        if options["coupons"]:
+            try:
+                coupons = delete_generated_coupons()
+            except PyMongoError as e:
+                raise CommandError(f"Could not delete the coupons: {e}")
+            self.stdout.write(f"Deleted {coupons} generated coupons")
+
+    def format_stats(self, stats, elapsed):
+        lines = [f"{'table':<16}  {'rows':>10}  {'seconds':>8}  {'rows/s':>10}"]
+        total = 0
+        for table, (rows, seconds) in stats.items():
+            total += rows
+            rate = rows / seconds if seconds else 0
+            lines.append(f"{table:<16}  {rows:>10}  {seconds:>8.1f}  {rate:>10.0f}")
+        rate = total / elapsed if elapsed else 0
+        lines.append(f"{'total':<16}  {total:>10}  {elapsed:>8.1f}  {rate:>10.0f}")
+        return "\n".join(lines)
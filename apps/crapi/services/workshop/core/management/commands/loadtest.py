@@ -0,0 +1,241 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Load test of the workshop service without the rest of crAPI
+
+    python manage.py loadtest --rps 50 --duration 60
+    python manage.py loadtest --save-baseline loadtest-baseline.json
+    python manage.py loadtest --baseline loadtest-baseline.json
+
+Without --url the workshop is served from this process, which is enough
+to compare two versions of the code but shares the CPU with the load driver.
+For representative numbers start the stubs with --stubs-only, run gunicorn with
+IDENTITY_SERVICE and API_GATEWAY_URL pointing at them and pass its --url
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings as django_settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler,
+    get_internal_wsgi_application,
+)
+from django.db import connections
+
+from core.loadtest import dataset as loadtest_dataset
+from core.loadtest.runner import (
+    LoadDriver,
+    compare_baseline,
+    format_summary,
+    load_baseline,
+    save_baseline,
+)
+from core.loadtest.scenarios import parse_mix
+from core.loadtest.stubs import StubServer
+from crapi_site import settings
+
+
+def use_stubs(stubs):
+    """
+    points the workshop served by this process at the stubs
+    :param stubs: running StubServer
+    :return: None
+    """
+    values = {
+        "IDENTITY_VERIFY": f"{stubs.url}/identity/api/auth/verify",
+        "IDENTITY_HEALTH": f"{stubs.url}/identity/health_check",
+        "API_GATEWAY_URL": stubs.url,
+    }
+    for name, value in values.items():
+        setattr(settings, name, value)
+        setattr(django_settings, name, value)
+
+
+def serve_workshop():
+    """
+    :return: ThreadedWSGIServer serving the workshop on a free local port
+    """
+    server = ThreadedWSGIServer(("127.0.0.1", 0), WSGIRequestHandler)
+    server.set_app(get_internal_wsgi_application())
+    threading.Thread(
+        target=server.serve_forever, name="loadtest-workshop", daemon=True
+    ).start()
+    # the access log of every request would be measured too
+    logging.getLogger("django.server").setLevel(logging.ERROR)
+    return server
+
+
+class Command(BaseCommand):
+    help = "Load test the workshop service against local identity and payment stubs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="workshop to test, served here if omitted")
+        parser.add_argument("--rps", type=float, default=50)
+        parser.add_argument("--duration", type=float, default=30, help="seconds")
+        parser.add_argument("--warmup", type=float, default=5, help="seconds")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--timeout", type=float, default=30, help="seconds")
+        parser.add_argument(
+            "--mix",
+            help="comma separated scenario=weight pairs, e.g. products=3,orders=1",
+        )
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--mechanics", type=int, default=10)
+        parser.add_argument("--products", type=int, default=20)
+        parser.add_argument("--orders-per-user", type=int, default=5)
+        parser.add_argument("--service-requests-per-user", type=int, default=3)
+        parser.add_argument("--coupons", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--stub-port", type=int, default=0)
+        parser.add_argument(
+            "--stub-latency", type=float, default=0, help="milliseconds"
+        )
+        parser.add_argument(
+            "--stubs-only",
+            action="store_true",
+            help="only serve the identity and payment stubs until interrupted",
+        )
+        parser.add_argument("--baseline", help="fail on a regression from this file")
+        parser.add_argument("--save-baseline", help="write the results to this file")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="allowed relative regression from the baseline",
+        )
+        parser.add_argument(
+            "--tolerance-ms",
+            type=float,
+            default=5,
+            help="latency increase always allowed",
+        )
+        parser.add_argument(
+            "--keep-data", action="store_true", help="keep the seeded dataset"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scenarios = parse_mix(options["mix"])
+        except ValueError as e:
+            raise CommandError(e)
+        if options["rps"] <= 0:
+            raise CommandError("--rps must be positive")
+
+        stubs = StubServer(
+            port=options["stub_port"], latency=options["stub_latency"] / 1000
+        ).start()
+        try:
+            if options["stubs_only"]:
+                return self.serve_stubs(stubs)
+            return self.run(stubs, scenarios, options)
+        finally:
+            stubs.stop()
+
+    def serve_stubs(self, stubs):
+        self.stdout.write(
+            f"Serving stubs, start the workshop with\n"
+            f"  IDENTITY_SERVICE={stubs.address} API_GATEWAY_URL={stubs.url}"
+        )
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+    def run(self, stubs, scenarios, options):
+        self.stdout.write("Seeding the dataset")
+        dataset = loadtest_dataset.seed_dataset(
+            users=options["users"],
+            mechanics=options["mechanics"],
+            products=options["products"],
+            orders_per_user=options["orders_per_user"],
+            service_requests_per_user=options["service_requests_per_user"],
+            coupons=options["coupons"],
+            seed=options["seed"],
+        )
+        server = None
+        url = options["url"]
+        if url is None:
+            use_stubs(stubs)
+            server = serve_workshop()
+            url = "http://{}:{}".format(*server.server_address[:2])
+        try:
+            driver = LoadDriver(
+                url,
+                scenarios,
+                dataset,
+                rps=options["rps"],
+                concurrency=options["concurrency"],
+                timeout=options["timeout"],
+                seed=options["seed"],
+            )
+            if options["warmup"]:
+                self.stdout.write(f"Warming up {url} for {options['warmup']}s")
+                driver.run(options["warmup"])
+            self.stdout.write(
+                f"Sending {options['rps']} requests/s to {url}"
+                f" for {options['duration']}s"
+            )
+            summary = driver.run(options["duration"]).summary()
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            if not options["keep_data"]:
+                loadtest_dataset.delete_dataset(dataset)
+            connections.close_all()
+        self.stdout.write(format_summary(summary))
+
+        run_options = {
+            name: options[name]
+            for name in (
+                "rps",
+                "duration",
+                "concurrency",
+                "mix",
+                "users",
+                "mechanics",
+                "products",
+                "orders_per_user",
+                "service_requests_per_user",
+                "coupons",
+                "stub_latency",
+            )
+        }
+        if options["save_baseline"]:
+            save_baseline(options["save_baseline"], summary, run_options)
+            self.stdout.write(f"Saved the baseline to {options['save_baseline']}")
+        if options["baseline"]:
+            baseline = load_baseline(options["baseline"])
+            if baseline["options"] != run_options:
+                self.stderr.write(
+                    self.style.WARNING(
+                        f"The baseline was recorded with {baseline['options']}"
+                    )
+                )
+            regressions = compare_baseline(
+                baseline,
+                summary,
+                options["tolerance"],
+                options["tolerance_ms"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Regressions from the baseline:\n  " + "\n  ".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regression from the baseline"))
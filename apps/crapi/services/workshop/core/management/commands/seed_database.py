@@ -34,23 +34,85 @@ import requests
 logger = logging.getLogger()
 
 
+PRODUCT_DETAILS = [
+    {"name": "Seat", "price": 10, "image_url": "images/seat.svg"},
+    {"name": "Wheel", "price": 10, "image_url": "images/wheel.svg"},
+]
+MECHANIC_DETAILS = [
+    {
+        "name": "Jhon",
+        "email": "jhon@example.com",
+        "number": "",
+        "password": "Admin1@#",
+        "mechanic_code": "TRAC_JHN",
+    },
+    {
+        "name": "James",
+        "email": "james@example.com",
+        "number": "",
+        "password": "Admin1@#",
+        "mechanic_code": "TRAC_JME",
+    },
+]
+# service requests create_reports tops the table up to
+REPORT_COUNT = 5
+
+
+def is_seeded():
+    """
+    Checks everything the create_* functions below would create in one query
+    :return: True if there is nothing left to seed
+    """
+    from crapi.mechanic.models import Mechanic, ServiceRequest
+    from crapi.shop.models import Order, Product
+
+    product_names = [product_details["name"] for product_details in PRODUCT_DETAILS]
+    mechanic_codes = [
+        mechanic_details["mechanic_code"] for mechanic_details in MECHANIC_DETAILS
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT
+                (SELECT count(*) FROM "{Product._meta.db_table}"
+                    WHERE name = ANY(%s)) >= %s
+                AND (SELECT count(*) FROM "{Mechanic._meta.db_table}"
+                    WHERE mechanic_code = ANY(%s)) >= %s
+                AND (SELECT count(*) FROM "{ServiceRequest._meta.db_table}") >= %s
+                AND EXISTS (SELECT 1 FROM "{Order._meta.db_table}")
+            """,
+            [
+                product_names,
+                len(product_names),
+                mechanic_codes,
+                len(mechanic_codes),
+                REPORT_COUNT,
+            ],
+        )
+        return cursor.fetchone()[0]
+
+
 def create_products():
     from crapi.shop.models import Product
 
-    product_details_all = [
-        {"name": "Seat", "price": 10, "image_url": "images/seat.svg"},
-        {"name": "Wheel", "price": 10, "image_url": "images/wheel.svg"},
-    ]
+    product_details_all = PRODUCT_DETAILS
+    names = [product_details["name"] for product_details in product_details_all]
+    existing = set(
+        Product.objects.filter(name__in=names).values_list("name", flat=True)
+    )
+    products = []
     for product_details in product_details_all:
-        if Product.objects.filter(name=product_details["name"]).exists():
+        if product_details["name"] in existing:
             logger.info("Product already exists. Skipping: " + product_details["name"])
             continue
-        product = Product.objects.create(
-            name=product_details["name"],
-            price=float(product_details["price"]),
-            image_url=product_details["image_url"],
+        products.append(
+            Product(
+                name=product_details["name"],
+                price=float(product_details["price"]),
+                image_url=product_details["image_url"],
+            )
         )
-        product.save()
+    for product in Product.objects.bulk_create(products):
         logger.info("Created Product: " + str(product.__dict__))
 
 
@@ -58,22 +120,7 @@ def create_mechanics():
     from crapi.user.models import User, UserDetails
     from crapi.mechanic.models import Mechanic
 
-    mechanic_details_all = [
-        {
-            "name": "Jhon",
-            "email": "jhon@example.com",
-            "number": "",
-            "password": "Admin1@#",
-            "mechanic_code": "TRAC_JHN",
-        },
-        {
-            "name": "James",
-            "email": "james@example.com",
-            "number": "",
-            "password": "Admin1@#",
-            "mechanic_code": "TRAC_JME",
-        },
-    ]
+    mechanic_details_all = MECHANIC_DETAILS
     for mechanic_details in mechanic_details_all:
         uset = User.objects.filter(email=mechanic_details["email"])
         if not uset.exists():
@@ -96,12 +143,13 @@ def create_mechanics():
                 role=User.ROLE_CHOICES.MECH,
                 created_on=timezone.now(),
             )
-            user.save()
             logger.info("Created User: " + str(user.__dict__))
         else:
             user = uset.first()
 
-        if Mechanic.objects.filter(mechanic_code=mechanic_details["mechanic_code"]):
+        if Mechanic.objects.filter(
+            mechanic_code=mechanic_details["mechanic_code"]
+        ).exists():
             logger.info(
                 "Mechanic already exists. Skipping: "
                 + mechanic_details["mechanic_code"]
@@ -111,10 +159,9 @@ def create_mechanics():
                 + mechanic_details["email"]
             )
             continue
-        mechanic = Mechanic.objects.create(
+        Mechanic.objects.create(
             mechanic_code=mechanic_details["mechanic_code"], user=user
         )
-        mechanic.save()
         try:
             cursor = connection.cursor()
             cursor.execute("select nextval('user_details_id_seq')")
@@ -123,14 +170,13 @@ def create_mechanics():
         except Exception as e:
             logger.error("Failed to fetch user_details_id_seq" + str(e))
             user_details_id = 1
-        userdetails = UserDetails.objects.create(
+        UserDetails.objects.create(
             id=user_details_id,
             available_credit=0,
             name=mechanic_details["name"],
             status="ACTIVE",
             user=user,
         )
-        userdetails.save()
 
 
 def create_reports():
@@ -142,12 +188,24 @@ def create_reports():
     from django.utils import timezone
 
     count = ServiceRequest.objects.all().count()
-    if count >= 5:
+    if count >= REPORT_COUNT:
         return
     logger.info("Creating Reports")
-    mechanics = Mechanic.objects.all()
-    vehicles = Vehicle.objects.all()
-    for i in range(5):
+    # evaluated once, random.choice would run a query per pick otherwise
+    mechanics = list(Mechanic.objects.all())
+    vehicles = list(
+        Vehicle.objects.select_related("vehicle_model__vehiclecompany", "owner")
+    )
+    if not mechanics or not vehicles:
+        logger.error("Cannot create reports without mechanics and vehicles")
+        return
+    user_details = {
+        details.user_id: details
+        for details in UserDetails.objects.filter(
+            user__in=[vehicle.owner_id for vehicle in vehicles]
+        ).order_by("-id")
+    }
+    for i in range(REPORT_COUNT):
         try:
             mechanic = random.choice(mechanics)
             vehicle = random.choice(vehicles)
@@ -155,7 +213,7 @@ def create_reports():
             vehicle_model = vehicle.vehicle_model
             vehicle_company = vehicle_model.vehiclecompany
             user = vehicle.owner
-            user_detail = UserDetails.objects.filter(user=user).first()
+            user_detail = user_details[user.id]
             service_request = ServiceRequest.objects.create(
                 vehicle=vehicle,
                 mechanic=mechanic,
@@ -177,7 +235,6 @@ def create_reports():
                 status=status,
                 created_on=timezone.now(),
             )
-            service_request.save()
             logger.info(
                 "Created Service Request for User %s: %s",
                 user.email,
@@ -198,8 +255,8 @@ def create_orders():
         return
     users = User.objects.all().order_by("id")
     users_seed = users[:5]
+    product = Product.objects.filter(name="Seat").first()
     for user in users_seed:
-        product = Product.objects.filter(name="Seat").first()
         order = Order.objects.create(
             user=user,
             product=product,
@@ -207,7 +264,6 @@ def create_orders():
             created_on=timezone.now(),
             transaction_id=uuid.uuid4(),
         )
-        order.save()
         logger.info("Created Order for User %s: %s", user.email, order.__dict__)
 
 
@@ -235,6 +291,9 @@ class Command(BaseCommand):
         Pre-populate mechanic model and product model
         :return: None
         """
+        if is_seeded():
+            logger.info("Model Data already populated")
+            return
         logger.info("Pre Populating Model Data")
         try:
             if not ping_identity_server():
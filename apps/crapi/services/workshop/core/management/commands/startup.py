@@ -0,0 +1,61 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Prepares the database before the server starts
+
+    python manage.py startup
+
+Runs migrate, check, health_check and seed_database in one process instead
+of starting Django four times. migrate is skipped when the fingerprint of
+the migration files matches the one stored by the last successful migrate,
+seed_database returns after one query when everything is seeded already
+"""
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.db.schema import get_fingerprint, read_fingerprint, store_fingerprint
+
+
+class Command(BaseCommand):
+    help = "Migrate, check and seed the database before the server starts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force-migrate",
+            action="store_true",
+            help="run migrate even if the schema fingerprint matches",
+        )
+
+    def handle(self, *args, **options):
+        self.step("Check Django models", self.migrate, options["force_migrate"])
+        self.step("Check Django project", call_command, "check")
+        self.step("Check database health", call_command, "health_check")
+        self.step("Seeding the database", call_command, "seed_database")
+
+    def step(self, name, function, *args):
+        self.stdout.write(name)
+        started = time.perf_counter()
+        function(*args)
+        self.stdout.write(f"{name} took {time.perf_counter() - started:.2f}s")
+
+    def migrate(self, force):
+        fingerprint = get_fingerprint()
+        if not force and read_fingerprint() == fingerprint:
+            self.stdout.write("Schema fingerprint matches, skipping migrate")
+            return
+        call_command("migrate", interactive=False)
+        store_fingerprint(fingerprint)
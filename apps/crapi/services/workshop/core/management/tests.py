@@ -0,0 +1,111 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the startup command
+"""
+import io
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from crapi.mechanic.models import Mechanic, ServiceRequest
+from crapi.shop.models import Order, Product
+from crapi.user.models import User
+from utils.mock_methods import create_vehicle
+from core.db.schema import get_fingerprint, read_fingerprint, store_fingerprint
+from core.management.commands.seed_database import (
+    MECHANIC_DETAILS,
+    REPORT_COUNT,
+    create_products,
+    is_seeded,
+)
+
+
+class StartupTestCase(TestCase):
+    """
+    contains the test cases related to the startup command
+    """
+
+    def test_schema_fingerprint(self):
+        """
+        stores the fingerprint of the migrations
+        should read it back and change with the migration files
+        :return: None
+        """
+        fingerprint = get_fingerprint()
+        self.assertEqual(len(fingerprint), 64)
+        self.assertEqual(get_fingerprint(), fingerprint)
+        store_fingerprint("0" * 64)
+        self.assertEqual(read_fingerprint(), "0" * 64)
+        store_fingerprint(fingerprint)
+        self.assertEqual(read_fingerprint(), fingerprint)
+        with patch(
+            "core.db.schema.get_migration_files",
+            side_effect=lambda app_config: [],
+        ):
+            self.assertNotEqual(get_fingerprint(), fingerprint)
+
+    @patch("core.management.commands.startup.call_command")
+    def test_startup_skips_migrate(self, mock_call_command):
+        """
+        runs the startup command with an outdated and then a current fingerprint
+        should migrate only the first time
+        :return: None
+        """
+        store_fingerprint("0" * 64)
+        call_command("startup", stdout=io.StringIO())
+        commands = [call.args[0] for call in mock_call_command.call_args_list]
+        self.assertEqual(
+            commands, ["migrate", "check", "health_check", "seed_database"]
+        )
+        self.assertEqual(read_fingerprint(), get_fingerprint())
+        mock_call_command.reset_mock()
+        call_command("startup", stdout=io.StringIO())
+        commands = [call.args[0] for call in mock_call_command.call_args_list]
+        self.assertEqual(commands, ["check", "health_check", "seed_database"])
+
+    def test_is_seeded(self):
+        """
+        creates the seed data step by step
+        should only report the database as seeded once everything exists
+        :return: None
+        """
+        create_products()
+        self.assertFalse(is_seeded())
+        now = timezone.now()
+        user = User.objects.create(
+            id=1, email="seed@example.com", number="", password="", created_on=now
+        )
+        mechanics = [
+            Mechanic.objects.create(
+                mechanic_code=mechanic_details["mechanic_code"], user=user
+            )
+            for mechanic_details in MECHANIC_DETAILS
+        ]
+        vehicle = create_vehicle(user, "0BZCX25UTBJ987271", pincode="1234", year=2020)
+        ServiceRequest.objects.bulk_create(
+            ServiceRequest(
+                mechanic=mechanics[0],
+                vehicle=vehicle,
+                problem_details="Engine problem",
+                created_on=now,
+            )
+            for i in range(REPORT_COUNT)
+        )
+        self.assertFalse(is_seeded())
+        Order.objects.create(user=user, product=Product.objects.first(), created_on=now)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(is_seeded())
+        self.assertEqual(len(queries), 1)
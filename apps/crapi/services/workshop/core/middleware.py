@@ -0,0 +1,277 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the middlewares of the workshop service
+"""
+import hashlib
+import logging
+import time
+from contextlib import ExitStack
+
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from core.db.router import ReplicaState, start_replica_state, stop_replica_state
+from crapi_site import settings
+from utils import admission, compression, messages, metrics
+from utils.timing import RequestTimings, start_request_timings, stop_request_timings
+
+logger = logging.getLogger()
+
+
+def get_view_name(request):
+    """
+    :param request: http request
+    :return: dotted path or url name of the view which handled the request
+    """
+    resolver_match = getattr(request, "resolver_match", None)
+    if resolver_match is None:
+        return "unmatched"
+    return resolver_match.view_name
+
+
+class RequestTimingMiddleware:
+    """
+    Records the number of queries, the SQL, outbound http and render time
+    of every request, sends them back in the Server-Timing header,
+    feeds the per view histograms and logs the slow requests
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings(settings.SLOW_REQUEST_TOP_QUERIES)
+        token = start_request_timings(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            stop_request_timings(token)
+        total = time.perf_counter() - started
+        response["Server-Timing"] = timings.server_timing(total)
+
+        view = get_view_name(request)
+        metrics.REQUESTS.labels(view, request.method, response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(
+            view, request.method, response.status_code
+        ).observe(total)
+        metrics.REQUEST_DB_TIME.labels(view).observe(timings.sql_time)
+        metrics.REQUEST_QUERIES.labels(view).observe(timings.queries)
+        metrics.REQUEST_HTTP_TIME.labels(view).observe(timings.http_time)
+        metrics.REQUEST_RENDER_TIME.labels(view).observe(timings.render_time)
+
+        if total >= settings.SLOW_REQUEST_THRESHOLD:
+            top_queries = "".join(
+                f"\n  {duration * 1000:.1f}ms {sql}"
+                for duration, sql in sorted(timings.top_queries, reverse=True)
+            )
+            logger.warning(
+                f"Slow request {request.method} {request.path} ({view}) "
+                f"{response.status_code}: {timings.server_timing(total)}"
+                f"{top_queries}"
+            )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets the reads of GET, HEAD and OPTIONS requests go to the read replicas,
+    unless the client wrote something in the last DB_REPLICA_PIN_SECONDS.
+    A client is pinned to the primary by its token in the cache of the
+    process and by a cookie, which also reaches the other workers
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+    PIN_COOKIE = "workshop_db_pin"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_pin_key(self, request):
+        authorization = request.META.get("HTTP_AUTHORIZATION")
+        if not authorization:
+            return None
+        digest = hashlib.sha256(authorization.encode()).hexdigest()
+        return f"replica-pin:{digest}"
+
+    def is_pinned(self, request, pin_key):
+        if request.COOKIES.get(self.PIN_COOKIE):
+            return True
+        return pin_key is not None and cache.get(pin_key) is not None
+
+    def __call__(self, request):
+        if not settings.DB_REPLICA_HOSTS:
+            return self.get_response(request)
+        pin_key = self.get_pin_key(request)
+        state = ReplicaState(
+            request.method in self.SAFE_METHODS and not self.is_pinned(request, pin_key)
+        )
+        token = start_replica_state(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_replica_state(token)
+        # a request may write through another service, so any successful
+        # unsafe request pins the client as well
+        if state.wrote or (
+            request.method not in self.SAFE_METHODS and response.status_code < 400
+        ):
+            seconds = settings.DB_REPLICA_PIN_SECONDS
+            if pin_key is not None:
+                cache.set(pin_key, True, seconds)
+            response.set_cookie(
+                self.PIN_COOKIE, "1", max_age=seconds, httponly=True, samesite="Lax"
+            )
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses the response bodies of at least COMPRESSION_MIN_SIZE bytes
+    with brotli or gzip, whichever the client accepts and is available.
+    The compressed variants of the responses of COMPRESSION_CACHE_VIEWS are
+    kept, their bodies repeat from one request to the next.
+    The bytes sent are counted per view and encoding
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cache = compression.CompressedCache(settings.COMPRESSION_CACHE_SIZE)
+
+    def is_compressible(self, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        return content_type.startswith("text/") or content_type in (
+            settings.COMPRESSION_CONTENT_TYPES
+        )
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming:
+            return response
+        view = get_view_name(request)
+        size = len(response.content)
+        metrics.RESPONSE_UNCOMPRESSED_BYTES.labels(view).inc(size)
+        encoding = None
+        if self.is_compressible(response):
+            # responses vary on it even when this one is sent as it is
+            patch_vary_headers(response, ("Accept-Encoding",))
+            if size >= settings.COMPRESSION_MIN_SIZE:
+                encoding = compression.choose_encoding(
+                    request.META.get("HTTP_ACCEPT_ENCODING", "")
+                )
+        if encoding is not None:
+            encoding = self.compress(response, encoding, view)
+        metrics.RESPONSE_BYTES.labels(view, encoding or compression.IDENTITY).inc(
+            len(response.content)
+        )
+        return response
+
+    def compress(self, response, encoding, view):
+        """
+        :return: encoding of the body, None if it was left uncompressed
+        """
+        if view in settings.COMPRESSION_CACHE_VIEWS:
+            compressed, cached = self.cache.compress(response.content, encoding)
+            metrics.COMPRESSION_CACHE.labels("hit" if cached else "miss").inc()
+        else:
+            compressed = compression.compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return None
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            # the compressed body is not byte for byte the one of the ETag
+            response["ETag"] = "W/" + etag
+        return encoding
+
+
+class AdmissionControlMiddleware:
+    """
+    Limits the rate and the concurrency of the views of ADMISSION_LIMITS,
+    see utils.admission, so a burst of report renders, mechanic contacts or
+    sign ups cannot take every thread of the worker from the cheap views.
+    The requests which are not admitted get a 429 when their client is over
+    its rate, a 503 when the view is overloaded, both with a Retry-After
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = {
+            view: admission.ViewAdmission(**limits)
+            for view, limits in settings.ADMISSION_LIMITS.items()
+        }
+
+    def get_client(self, request):
+        # the token is only verified by the view, a client sending a new
+        # token every time still hits the rate and concurrency of the view
+        authorization = request.META.get("HTTP_AUTHORIZATION")
+        if authorization:
+            return hashlib.sha256(authorization.encode()).hexdigest()
+        # the proxies append the address they got the request from, the
+        # entries left of the ones of the trusted proxies are sent by the client
+        hops = settings.ADMISSION_TRUSTED_PROXIES
+        forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+        if hops and len(forwarded_for) >= hops and forwarded_for[-hops].strip():
+            return forwarded_for[-hops].strip()
+        return request.META.get("REMOTE_ADDR")
+
+    def __call__(self, request):
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            # set by process_view once the request got a slot
+            view_admission = getattr(request, "_admission", None)
+            if view_admission is not None:
+                if response is not None and response.streaming:
+                    # a streamed body keeps the slot until the server closes it
+                    response._resource_closers.append(view_admission.release)
+                else:
+                    view_admission.release()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.ADMISSION_CONTROL:
+            return None
+        view = get_view_name(request)
+        view_admission = self.views.get(view)
+        if view_admission is None:
+            return None
+        try:
+            queued = view_admission.admit(self.get_client(request))
+        except admission.Rejected as e:
+            metrics.ADMISSION.labels(view, e.reason).inc()
+            logger.debug(f"Rejected {request.method} {request.path}: {e.reason}")
+            message = (
+                messages.TOO_MANY_REQUESTS
+                if e.status == 429
+                else messages.SERVICE_OVERLOADED
+            )
+            response = JsonResponse({"message": message}, status=e.status)
+            response["Retry-After"] = str(e.retry_after)
+            return response
+        request._admission = view_admission
+        metrics.ADMISSION.labels(view, "queued" if queued else "admitted").inc()
+        return None
@@ -0,0 +1,539 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the middlewares and the endpoints of the
+core app: the request timing, response compression, admission control,
+health checks and metrics
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+from utils.mock_methods import create_user, mock_jwt_auth_required
+
+patch("utils.jwt.jwt_auth_required", mock_jwt_auth_required).start()
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, Client, RequestFactory
+from crapi.mechanic.models import Mechanic
+from crapi.user.models import User
+from crapi_site import settings
+from prometheus_client import REGISTRY
+from core.health import HealthProber
+from core.middleware import AdmissionControlMiddleware, CompressionMiddleware
+from utils import admission, compression, messages, view_cache
+
+
+class RequestTimingTestCase(TestCase):
+    """
+    contains the test cases related to the request timing middleware
+    Attributes:
+        client: Client object used for testing
+        auth_headers: Auth headers for dummy user
+    """
+
+    def setUp(self):
+        self.client = Client()
+        create_user("timing@example.com", "9000000001")
+        self.auth_headers = {"HTTP_AUTHORIZATION": "Bearer timing@example.com"}
+        # the query counts are only right when the mechanics are not cached
+        view_cache.get_cache().clear()
+
+    def get_query_sum(self, view):
+        return (
+            REGISTRY.get_sample_value("workshop_request_queries_sum", {"view": view})
+            or 0
+        )
+
+    def test_server_timing(self):
+        """
+        calls an endpoint which runs queries
+        should get the query count and durations in the Server-Timing header
+        and feed the histograms of the view
+        :return: None
+        """
+        view = "crapi.mechanic.views.MechanicView"
+        queries_before = self.get_query_sum(view)
+        res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(res.status_code, 200)
+        server_timing = dict(
+            metric.strip().split(";", 1) for metric in res["Server-Timing"].split(",")
+        )
+        self.assertEqual(set(server_timing), {"db", "http", "render", "total"})
+        self.assertIn('desc="2 queries"', server_timing["db"])
+        self.assertEqual(self.get_query_sum(view) - queries_before, 2)
+
+    def test_slow_request_log(self):
+        """
+        treats every request as slow
+        should log the request with its slowest queries
+        :return: None
+        """
+        with patch.object(settings, "SLOW_REQUEST_THRESHOLD", 0), self.assertLogs(
+            level="WARNING"
+        ) as logs:
+            self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertIn("Slow request GET /workshop/api/mechanic/", logs.output[0])
+        self.assertIn('FROM "user_login"', logs.output[0])
+
+
+class HealthCheckTestCase(SimpleTestCase):
+    """
+    contains the test cases related to the background health checks
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.prober = HealthProber(
+            {
+                "database": lambda: None,
+                "identity": lambda: None,
+                "gateway": self.fail_check,
+            }
+        )
+
+    def fail_check(self):
+        raise ValueError("connection refused")
+
+    @patch.object(settings, "HEALTH_CHECK_TIMEOUT", 0.05)
+    def test_probe(self):
+        """
+        probes an up, a failing and a hanging dependency twice
+        should report the up one up and the two others down, without
+        starting the hanging check again while it still runs
+        :return: None
+        """
+        release = threading.Event()
+        self.prober.checks["mongodb"] = release.wait
+        self.prober.probe()
+        results = self.prober.get_results()
+        self.assertEqual(results["database"]["status"], "up")
+        self.assertIsNotNone(results["database"]["latency_ms"])
+        self.assertEqual(results["gateway"]["status"], "down")
+        self.assertEqual(results["gateway"]["error"], "connection refused")
+        self.assertEqual(results["mongodb"]["error"], "timed out")
+        self.prober.probe()
+        results = self.prober.get_results()
+        self.assertEqual(results["mongodb"]["error"], "previous check still running")
+        release.set()
+        self.prober.executor.shutdown(wait=True)
+
+    @patch.object(settings, "HEALTH_CHECK_MAX_AGE", 30)
+    def test_stale_results(self):
+        """
+        reads results older than HEALTH_CHECK_MAX_AGE
+        should report the dependency down
+        :return: None
+        """
+        self.prober.probe()
+        self.prober.results["database"]["checked_at"] -= 60
+        results = self.prober.get_results()
+        self.assertEqual(results["database"]["status"], "down")
+        self.assertEqual(results["database"]["error"], "result is stale")
+        self.assertEqual(results["identity"]["status"], "up")
+
+    @patch.object(settings, "HEALTH_CHECK_REQUIRED", ["database", "identity"])
+    def test_views(self):
+        """
+        calls the liveness and readiness endpoints with a required
+        dependency up and then down
+        should serve the readiness from the last results without querying
+        the database and stay alive either way
+        :return: None
+        """
+        self.prober.probe()
+        with patch("core.views.prober", self.prober), patch.object(
+            self.prober, "start"
+        ):
+            res = self.client.get("/workshop/health_check/ready")
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json()["status"], "ready")
+            self.assertEqual(res.json()["checks"]["gateway"]["status"], "down")
+            self.prober.checks["identity"] = self.fail_check
+            self.prober.probe()
+            res = self.client.get("/workshop/health_check/")
+            self.assertEqual(res.status_code, 503)
+            self.assertEqual(res.json()["checks"]["identity"]["status"], "down")
+            res = self.client.get("/workshop/health_check/live")
+            self.assertEqual(res.status_code, 200)
+
+
+class CompressionTestCase(TestCase):
+    """
+    contains the test cases related to the response compression
+    Attributes:
+        client: Client object used for testing
+        auth_headers: Auth headers for dummy user
+    """
+
+    def setUp(self):
+        self.client = Client()
+        for i in range(3):
+            user = create_user(
+                f"compression{i}@example.com", f"900000001{i}", User.ROLE_CHOICES.MECH
+            )
+            Mechanic.objects.create(mechanic_code=f"TRAC_GZ{i}", user=user)
+        self.auth_headers = {"HTTP_AUTHORIZATION": "Bearer compression0@example.com"}
+        self.middleware = CompressionMiddleware(self.get_response)
+        self.response = None
+
+    def get_response(self, request):
+        return self.response
+
+    def get_sample(self, name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_choose_encoding(self):
+        """
+        parses Accept-Encoding headers with and without brotli installed
+        should pick brotli over gzip and skip the refused encodings
+        :return: None
+        """
+        with patch.object(compression, "brotli", object()):
+            self.assertEqual(compression.choose_encoding("gzip, br"), "br")
+            self.assertEqual(compression.choose_encoding("gzip, br;q=0"), "gzip")
+            self.assertEqual(compression.choose_encoding("*"), "br")
+            self.assertEqual(compression.choose_encoding("br;q=0, *"), "gzip")
+        with patch.object(compression, "brotli", None):
+            self.assertEqual(compression.choose_encoding("gzip;q=0.5, br"), "gzip")
+            self.assertIsNone(compression.choose_encoding("br"))
+            self.assertIsNone(compression.choose_encoding("gzip;q=0, *"))
+        self.assertIsNone(compression.choose_encoding(""))
+        self.assertIsNone(compression.choose_encoding("gzip;q=0, deflate"))
+        self.assertEqual(compression.choose_encoding("gzip, *;q=0"), "gzip")
+
+    @patch.object(settings, "COMPRESSION_MIN_SIZE", 100)
+    def test_compress_response(self):
+        """
+        sends a large and a small JSON body and a large PNG body
+        should only compress the large JSON body and count the bytes sent
+        :return: None
+        """
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        body = json.dumps([{"id": i, "name": "Seat"} for i in range(100)]).encode()
+        labels = {"view": "unmatched", "encoding": "gzip"}
+        sent_before = self.get_sample("workshop_response_bytes_total", labels)
+        self.response = HttpResponse(body, content_type="application/json")
+        response = self.middleware(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertEqual(
+            self.get_sample("workshop_response_bytes_total", labels) - sent_before,
+            len(response.content),
+        )
+
+        self.response = HttpResponse(b'{"id": 1}', content_type="application/json")
+        response = self.middleware(request)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+        self.response = HttpResponse(body, content_type="image/png")
+        response = self.middleware(request)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, body)
+
+    @patch.object(settings, "COMPRESSION_MIN_SIZE", 0)
+    def test_cached_variants(self):
+        """
+        lists the mechanics twice with gzip
+        should compress the body once and serve the cached variant the second time
+        :return: None
+        """
+        hits_before = self.get_sample(
+            "workshop_compression_cache_total", {"result": "hit"}
+        )
+        with patch(
+            "utils.compression.compress", wraps=compression.compress
+        ) as mock_compress:
+            responses = [
+                self.client.get(
+                    "/workshop/api/mechanic/",
+                    HTTP_ACCEPT_ENCODING="gzip",
+                    **self.auth_headers,
+                )
+                for i in range(2)
+            ]
+        self.assertEqual(mock_compress.call_count, 1)
+        self.assertEqual(
+            self.get_sample("workshop_compression_cache_total", {"result": "hit"})
+            - hits_before,
+            1,
+        )
+        for res in responses:
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res["Content-Encoding"], "gzip")
+            data = json.loads(gzip.decompress(res.content))
+            self.assertEqual(len(data["mechanics"]), 3)
+
+    def test_cache_eviction(self):
+        """
+        fills the compressed variants cache over its size
+        should evict the least recently used variants
+        :return: None
+        """
+        cache = compression.CompressedCache(max_size=10)
+        cache.set("a", b"12345")
+        cache.set("b", b"12345")
+        self.assertEqual(cache.get("a"), b"12345")
+        cache.set("c", b"123")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.size, 8)
+        cache.set("d", b"12345678901")
+        self.assertIsNone(cache.get("d"))
+
+
+class AdmissionControlTestCase(TestCase):
+    """
+    contains the test cases related to the admission control
+    Attributes:
+        client: Client object used for testing
+        auth_headers: Auth headers for dummy user
+    """
+
+    def setUp(self):
+        self.client = Client()
+        user = create_user(
+            "admission@example.com", "9000000030", User.ROLE_CHOICES.MECH
+        )
+        Mechanic.objects.create(mechanic_code="TRAC_AC0", user=user)
+        self.auth_headers = {"HTTP_AUTHORIZATION": "Bearer admission@example.com"}
+
+    def test_token_bucket(self):
+        """
+        takes tokens faster than they are refilled
+        should allow the burst and then tell how long to wait
+        :return: None
+        """
+        bucket = admission.TokenBucket(rate=2, burst=2)
+        now = bucket.updated
+        self.assertEqual(bucket.take(now), 0)
+        self.assertEqual(bucket.take(now), 0)
+        self.assertAlmostEqual(bucket.take(now), 0.5)
+        self.assertEqual(bucket.take(now + 0.5), 0)
+
+        limiter = admission.RateLimiter(rate=1, burst=1, max_clients=2)
+        self.assertEqual(limiter.take("a", now), 0)
+        self.assertGreater(limiter.take("a", now), 0)
+        self.assertEqual(limiter.take("b", now), 0)
+        limiter.take("c", now)
+        self.assertEqual(list(limiter.buckets), ["b", "c"])
+
+    def test_concurrency_limiter(self):
+        """
+        takes more slots than the limit from several threads
+        should queue up to the queue size and reject the others
+        :return: None
+        """
+        limiter = admission.ConcurrencyLimiter(limit=1, queue_size=1, timeout=5)
+        self.assertFalse(limiter.acquire())
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+        waiter.start()
+        while not limiter.waiting:
+            time.sleep(0.01)
+        with self.assertRaises(admission.Rejected) as rejected:
+            limiter.acquire()
+        self.assertEqual(rejected.exception.status, 503)
+        self.assertEqual(rejected.exception.reason, "queue_full")
+        self.assertEqual(rejected.exception.retry_after, 5)
+        limiter.release()
+        waiter.join()
+        self.assertEqual(results, [True])
+        self.assertEqual(limiter.active, 1)
+
+        limiter.timeout = 0.05
+        with self.assertRaises(admission.Rejected) as rejected:
+            limiter.acquire()
+        self.assertEqual(rejected.exception.reason, "queue_timeout")
+        self.assertEqual(limiter.waiting, 0)
+
+    @patch.object(
+        settings,
+        "ADMISSION_LIMITS",
+        {
+            "crapi.mechanic.views.MechanicView": {
+                "concurrency": 1,
+                "user_rate": 0.01,
+                "user_burst": 1,
+            }
+        },
+    )
+    def test_user_rate(self):
+        """
+        lists the mechanics twice with the same token and once with another
+        should reject the second request with a 429 and a Retry-After
+        :return: None
+        """
+        res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(res["Retry-After"], "100")
+        self.assertEqual(res.json()["message"], messages.TOO_MANY_REQUESTS)
+        res = self.client.get(
+            "/workshop/api/mechanic/", HTTP_AUTHORIZATION="Bearer other@example.com"
+        )
+        self.assertEqual(res.status_code, 401)
+        with patch.object(settings, "ADMISSION_CONTROL", False):
+            res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(res.status_code, 200)
+
+    @patch.object(
+        settings,
+        "ADMISSION_LIMITS",
+        {"crapi.mechanic.views.MechanicView": {"rate": 0.5, "burst": 1}},
+    )
+    def test_view_rate(self):
+        """
+        lists the mechanics twice with different tokens
+        should reject the second request with a 503 and a Retry-After
+        :return: None
+        """
+        labels = {"view": "crapi.mechanic.views.MechanicView", "result": "rate"}
+        rejected_before = REGISTRY.get_sample_value("workshop_admission_total", labels)
+        res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get(
+            "/workshop/api/mechanic/", HTTP_AUTHORIZATION="Bearer other@example.com"
+        )
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "2")
+        self.assertEqual(res.json()["message"], messages.SERVICE_OVERLOADED)
+        self.assertEqual(
+            REGISTRY.get_sample_value("workshop_admission_total", labels)
+            - (rejected_before or 0),
+            1,
+        )
+
+    def test_client(self):
+        """
+        gets the client of requests with and without a token, forwarded
+        by one proxy with a client supplied X-Forwarded-For
+        should use the token, else the address the trusted proxy saw
+        :return: None
+        """
+        middleware = AdmissionControlMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+        request = factory.get(
+            "/", HTTP_X_FORWARDED_FOR="1.1.1.1, 10.0.0.7", REMOTE_ADDR="10.0.0.2"
+        )
+        self.assertEqual(middleware.get_client(request), "10.0.0.7")
+        request = factory.get("/", REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(middleware.get_client(request), "10.0.0.2")
+        request = factory.get("/", HTTP_X_FORWARDED_FOR="1.1.1.1, 10.0.0.7")
+        with patch.object(settings, "ADMISSION_TRUSTED_PROXIES", 0):
+            self.assertEqual(middleware.get_client(request), "127.0.0.1")
+        with patch.object(settings, "ADMISSION_TRUSTED_PROXIES", 3):
+            self.assertEqual(middleware.get_client(request), "127.0.0.1")
+        request = factory.get("/", HTTP_AUTHORIZATION="Bearer a")
+        self.assertEqual(
+            middleware.get_client(request), hashlib.sha256(b"Bearer a").hexdigest()
+        )
+
+    @patch.object(
+        settings,
+        "ADMISSION_LIMITS",
+        {"crapi.merchant.views.ContactMechanicView": {"concurrency": 1}},
+    )
+    @patch("crapi.merchant.views.requests.get")
+    def test_streaming_response(self, mock_get):
+        """
+        passes a mechanic api response through and contacts the mechanic
+        again before and after the body was sent
+        should hold the slot of the view until the streamed body is closed
+        :return: None
+        """
+        mock_get.return_value = MagicMock(
+            status_code=200,
+            headers={"Content-Type": "text/plain"},
+            iter_content=lambda chunk_size: iter([b"report"]),
+        )
+        body = {
+            "mechanic_api": "http://mechanic.test/api",
+            "repeat_request_if_failed": False,
+            "number_of_repeats": 1,
+            "passthrough": True,
+        }
+        res = self.client.post(
+            "/workshop/api/merchant/contact_mechanic",
+            body,
+            content_type="application/json",
+            **self.auth_headers,
+        )
+        self.assertTrue(res.streaming)
+        rejected = self.client.post(
+            "/workshop/api/merchant/contact_mechanic",
+            body,
+            content_type="application/json",
+            **self.auth_headers,
+        )
+        self.assertEqual(rejected.status_code, 503)
+        self.assertEqual(b"".join(res.streaming_content), b"report")
+        res = self.client.post(
+            "/workshop/api/merchant/contact_mechanic",
+            body,
+            content_type="application/json",
+            **self.auth_headers,
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), b"report")
+
+
+class MetricsTestCase(TestCase):
+    """
+    contains the test cases related to the metrics endpoint
+    Attributes:
+        client: Client object used for testing
+    """
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_metrics(self):
+        """
+        calls an endpoint and then the metrics endpoint
+        should get the request, db pool and reports directory metrics
+        :return: None
+        """
+        self.client.get("/workshop/api/mechanic/")
+        res = self.client.get("/workshop/metrics")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        body = res.content.decode()
+        self.assertIn(
+            'workshop_requests_total{method="GET",status="401",'
+            'view="crapi.mechanic.views.MechanicView"}',
+            body,
+        )
+        self.assertIn('workshop_db_pool_connections{database="default"', body)
+        self.assertIn("workshop_reports_directory_bytes", body)
+
+    def test_multiprocess_metrics(self):
+        """
+        points the metrics to an empty multiprocess directory
+        should only get the metrics collected at scrape time
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as directory, patch.dict(
+            os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}
+        ):
+            res = self.client.get("/workshop/metrics")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("workshop_reports_directory_files", res.content.decode())
+        self.assertNotIn("workshop_requests_total", res.content.decode())
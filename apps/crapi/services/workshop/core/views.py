@@ -0,0 +1,63 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+contains the operational views of the workshop service
+"""
+from django.http import HttpResponse, JsonResponse
+from rest_framework import status
+
+from core.health import prober
+from utils.metrics import render_metrics
+
+
+def metrics_view(request):
+    """
+    exposes the prometheus metrics of all the workers of the service
+    :param request: http request for the view
+        method allowed: GET
+    :returns HttpResponse object with the metrics in the text format
+    """
+    content_type, body = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+def liveness_view(request):
+    """
+    tells whether the process serves requests, without checking any
+    dependency so a slow dependency never gets the service restarted
+    :param request: http request for the view
+        method allowed: GET
+    :returns JsonResponse object with 200 status
+    """
+    prober.start()
+    return JsonResponse({"status": "alive"})
+
+
+def readiness_view(request):
+    """
+    serves the last results of the background health checks
+    :param request: http request for the view
+        method allowed: GET
+    :returns JsonResponse object with the status of every dependency
+        and 200 status if the required ones are up, 503 otherwise
+    """
+    prober.start()
+    results = prober.get_results()
+    if prober.is_ready(results):
+        return JsonResponse({"status": "ready", "checks": results})
+    return JsonResponse(
+        {"status": "not ready", "checks": results},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
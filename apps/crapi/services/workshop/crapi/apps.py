@@ -35,16 +35,23 @@ def create_products():
         {"name": "Seat", "price": 10, "image_url": "images/seat.svg"},
         {"name": "Wheel", "price": 10, "image_url": "images/wheel.svg"},
     ]
+    names = [product_details["name"] for product_details in product_details_all]
+    existing = set(
+        Product.objects.filter(name__in=names).values_list("name", flat=True)
+    )
+    products = []
     for product_details in product_details_all:
-        if Product.objects.filter(name=product_details["name"]).exists():
+        if product_details["name"] in existing:
             logger.info("Product already exists. Skipping: " + product_details["name"])
             continue
-        product = Product.objects.create(
-            name=product_details["name"],
-            price=float(product_details["price"]),
-            image_url=product_details["image_url"],
+        products.append(
+            Product(
+                name=product_details["name"],
+                price=float(product_details["price"]),
+                image_url=product_details["image_url"],
+            )
         )
-        product.save()
+    for product in Product.objects.bulk_create(products):
         logger.info("Created Product: " + str(product.__dict__))
 
 
@@ -90,12 +97,13 @@ def create_mechanics():
                 role=User.ROLE_CHOICES.MECH,
                 created_on=timezone.now(),
             )
-            user.save()
             logger.info("Created User: " + str(user.__dict__))
         else:
             user = uset.first()
 
-        if Mechanic.objects.filter(mechanic_code=mechanic_details["mechanic_code"]):
+        if Mechanic.objects.filter(
+            mechanic_code=mechanic_details["mechanic_code"]
+        ).exists():
             logger.info(
                 "Mechanic already exists. Skipping: "
                 + mechanic_details["mechanic_code"]
@@ -105,10 +113,9 @@ def create_mechanics():
                 + mechanic_details["email"]
             )
             continue
-        mechanic = Mechanic.objects.create(
+        Mechanic.objects.create(
             mechanic_code=mechanic_details["mechanic_code"], user=user
         )
-        mechanic.save()
         try:
             cursor = connection.cursor()
             cursor.execute("select nextval('user_details_id_seq')")
@@ -117,14 +124,13 @@ def create_mechanics():
         except Exception as e:
             logger.error("Failed to fetch user_details_id_seq" + str(e))
             user_details_id = 1
-        userdetails = UserDetails.objects.create(
+        UserDetails.objects.create(
             id=user_details_id,
             available_credit=0,
             name=mechanic_details["name"],
             status="ACTIVE",
             user=user,
         )
-        userdetails.save()
 
 
 def create_reports():
@@ -139,8 +145,20 @@ def create_reports():
     if count >= 5:
         return
     logger.info("Creating Reports")
-    mechanics = Mechanic.objects.all()
-    vehicles = Vehicle.objects.all()
+    # evaluated once, random.choice would run a query per pick otherwise
+    mechanics = list(Mechanic.objects.all())
+    vehicles = list(
+        Vehicle.objects.select_related("vehicle_model__vehiclecompany", "owner")
+    )
+    if not mechanics or not vehicles:
+        logger.error("Cannot create reports without mechanics and vehicles")
+        return
+    user_details = {
+        details.user_id: details
+        for details in UserDetails.objects.filter(
+            user__in=[vehicle.owner_id for vehicle in vehicles]
+        ).order_by("-id")
+    }
     for i in range(5):
         try:
             mechanic = random.choice(mechanics)
@@ -149,7 +167,7 @@ def create_reports():
             vehicle_model = vehicle.vehicle_model
             vehicle_company = vehicle_model.vehiclecompany
             user = vehicle.owner
-            user_detail = UserDetails.objects.filter(user=user).first()
+            user_detail = user_details[user.id]
             service_request = ServiceRequest.objects.create(
                 vehicle=vehicle,
                 mechanic=mechanic,
@@ -171,7 +189,6 @@ def create_reports():
                 status=status,
                 created_on=timezone.now(),
             )
-            service_request.save()
             logger.info(
                 "Created Service Request for User %s: %s",
                 user.email,
@@ -191,8 +208,8 @@ def create_orders():
     if Order.objects.all().count() >= 1:
         return
     users = User.objects.filter(role=User.ROLE_CHOICES.PREDEFINED).order_by("id")
+    product = Product.objects.filter(name="Seat").first()
     for user in users:
-        product = Product.objects.filter(name="Seat").first()
         order = Order.objects.create(
             user=user,
             product=product,
@@ -200,7 +217,6 @@ def create_orders():
             created_on=timezone.now(),
             transaction_id=uuid.uuid4(),
         )
-        order.save()
         logger.info("Created Order for User %s: %s", user.email, order.__dict__)
 
 
@@ -213,9 +229,12 @@ class CRAPIConfig(AppConfig):
 
     def ready(self):
         """
-        Pre-populate mechanic model and product model
+        Connects the view cache invalidation and
+        pre-populates mechanic model and product model
         :return: None
         """
+        import crapi.signals
+
         # Check if sys.argv contains 'runserver' or 'runserver_plus'
         is_runserver = any("runserver" in x for x in sys.argv)
         if not is_runserver:
@@ -16,6 +16,8 @@
 Models related to Mechanic
 Mechanic and Service Request Models
 """
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from crapi.user.models import User, Vehicle
@@ -24,6 +26,9 @@ from extended_choices import Choices
 from django_db_cascade.fields import ForeignKey, OneToOneField
 from django_db_cascade.deletions import DB_CASCADE
 
+# text search configuration used by the search_vector triggers and queries
+SEARCH_CONFIG = "english"
+
 
 class Mechanic(models.Model):
     """
@@ -64,9 +69,20 @@ class ServiceRequest(models.Model):
     status = models.CharField(
         max_length=10, choices=STATUS_CHOICES, default=STATUS_CHOICES.PEN
     )
+    # maintained by a database trigger from problem_details
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         db_table = "service_request"
+        indexes = [
+            GinIndex(fields=["search_vector"], name="service_request_search_idx"),
+            models.Index(
+                fields=["mechanic", "-created_on"], name="sr_mechanic_created_idx"
+            ),
+            models.Index(
+                fields=["vehicle", "-created_on"], name="sr_vehicle_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"<ServiceRequest: {self.id}>"
@@ -82,9 +98,17 @@ class ServiceComment(models.Model):
     service_request = ForeignKey(ServiceRequest, DB_CASCADE)
     comment = models.CharField(max_length=500, blank=True)
     created_on = models.DateTimeField()
+    # maintained by a database trigger from comment
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         db_table = "service_comment"
+        indexes = [
+            GinIndex(fields=["search_vector"], name="service_comment_search_idx"),
+            models.Index(
+                fields=["service_request", "-created_on"], name="sc_request_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"<ServiceComment: {self.id} {self.comment} {self.created_on} {self.service_request}>"
@@ -19,6 +19,7 @@ from rest_framework import serializers
 
 from crapi.mechanic.models import Mechanic, ServiceRequest, ServiceComment
 from crapi.user.serializers import UserSerializer, VehicleSerializer
+from utils.row_serializers import RowSerializer
 
 
 class MechanicSerializer(serializers.ModelSerializer):
@@ -72,6 +73,41 @@ class MechanicServiceRequestSerializer(serializers.ModelSerializer):
         )
 
 
+class ServiceRequestSearchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for ServiceRequest search results
+    expects the queryset to be annotated with rank and headline
+    and the matched comments to be passed in the context
+    """
+
+    def get_comments(self, obj):
+        return self.context.get("comments", {}).get(obj.id, [])
+
+    mechanic_code = serializers.CharField(source="mechanic.mechanic_code")
+    vin = serializers.CharField(source="vehicle.vin")
+    rank = serializers.FloatField()
+    headline = serializers.CharField()
+    comments = serializers.SerializerMethodField()
+    created_on = serializers.DateTimeField(format="%d %B, %Y, %H:%M:%S")
+
+    class Meta:
+        """
+        Meta class for ServiceRequestSearchSerializer
+        """
+
+        model = ServiceRequest
+        fields = (
+            "id",
+            "mechanic_code",
+            "vin",
+            "status",
+            "created_on",
+            "rank",
+            "headline",
+            "comments",
+        )
+
+
 class ReceiveReportSerializer(serializers.Serializer):
     """
     Serializer for Receive Report API
@@ -135,3 +171,33 @@ class ServiceRequestStatusUpdateSerializer(serializers.ModelSerializer):
 
         model = ServiceRequest
         fields = ["status"]
+
+
+class MechanicRowSerializer(RowSerializer):
+    """
+    Read only MechanicSerializer for the mechanic list
+    """
+
+    serializer_class = MechanicSerializer
+
+
+class ServiceCommentRowSerializer(RowSerializer):
+    """
+    Read only ServiceCommentViewSerializer for the comments of service requests
+    """
+
+    serializer_class = ServiceCommentViewSerializer
+
+
+class MechanicServiceRequestRowSerializer(RowSerializer):
+    """
+    Read only MechanicServiceRequestSerializer for the service request list
+    """
+
+    serializer_class = MechanicServiceRequestSerializer
+
+    def get_comments(self, service_request_ids):
+        comments = ServiceComment.objects.order_by("-created_on")
+        return ServiceCommentRowSerializer.group(
+            comments, "service_request_id", service_request_ids
+        )
@@ -13,6 +13,7 @@
 """
 contains all the test cases related to mechanic
 """
+from datetime import timedelta
 from django.utils import timezone
 from unittest.mock import patch
 from utils.mock_methods import (
@@ -314,3 +315,71 @@ class MechanicServiceWorkFlowTestCase(TestCase):
         self.assertEqual(comments.status_code, 200)
         print(comments.json())
         self.assertEqual(len(comments.json()), comments_len + 1)
+
+    def test_service_requests_page(self):
+        """
+        lists the service requests of the mechanic one at a time
+        should get only the service request of each page
+        :return: None
+        """
+        older = ServiceRequest.objects.create(
+            vehicle=self.vehicle,
+            mechanic=self.mechanic,
+            problem_details="My Car is still not working",
+            status="PENDING",
+            created_on=timezone.now() - timedelta(days=1),
+        )
+        ServiceComment.objects.create(
+            service_request=older, comment="Older comment", created_on=timezone.now()
+        )
+        pages = []
+        for offset in (0, 1):
+            res = self.client.get(
+                "/workshop/api/mechanic/service_requests?limit=1&offset=%s" % offset,
+                **self.mechanic_auth_headers
+            )
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(len(res.json()["service_requests"]), 1)
+            pages.append(res.json()["service_requests"][0])
+        self.assertEqual(pages[0]["id"], self.service_request.id)
+        self.assertEqual(pages[1]["id"], older.id)
+        self.assertEqual(pages[1]["comments"][0]["comment"], "Older comment")
+
+    def test_search_service_requests(self):
+        """
+        searches the service requests by problem details and by comment text
+        should get the matching service request with highlighted text
+        :return: None
+        """
+        res = self.client.get(
+            "/workshop/api/mechanic/service_requests/search?q=working",
+            **self.mechanic_auth_headers
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["count"], 1)
+        result = res.json()["service_requests"][0]
+        self.assertEqual(result["id"], self.service_request.id)
+        self.assertIn("<mark>working</mark>", result["headline"])
+
+        self.client.post(
+            "/workshop/api/mechanic/service_request/%s/comment"
+            % self.service_request.id,
+            {"comment": "Replaced the brake pads"},
+            content_type="application/json",
+            **self.mechanic_auth_headers
+        )
+        res = self.client.get(
+            "/workshop/api/mechanic/service_requests/search?q=brakes",
+            **self.mechanic_auth_headers
+        )
+        self.assertEqual(res.status_code, 200)
+        result = res.json()["service_requests"][0]
+        self.assertEqual(result["id"], self.service_request.id)
+        self.assertIn("<mark>brake</mark>", result["comments"][0]["headline"])
+
+        res = self.client.get(
+            "/workshop/api/mechanic/service_requests/search",
+            **self.mechanic_auth_headers
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json()["message"], messages.SEARCH_QUERY_MISSING)
@@ -36,6 +36,10 @@ urlpatterns = [
         r"service_request/(?P<service_request_id>[0-9]+)$",
         mechanic_views.ServiceRequestView.as_view(),
     ),
+    re_path(
+        r"service_requests/search$",
+        mechanic_views.ServiceRequestSearchView.as_view(),
+    ),
     re_path(r"service_requests$", mechanic_views.MechanicServiceRequestsView.as_view()),
     re_path(
         r"service_request$",
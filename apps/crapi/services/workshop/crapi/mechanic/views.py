@@ -19,8 +19,8 @@ import os
 import bcrypt
 import re
 from urllib.parse import unquote
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
 from django.template.loader import get_template
-from xhtml2pdf import pisa
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse
@@ -28,24 +28,35 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db import models
+from django.db.models import F, FloatField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.http import FileResponse
 from crapi_site import settings
 from utils.jwt import jwt_auth_required
 from utils import messages
+from utils import metrics
+from utils import view_cache
+from utils.row_serializers import Fieldset, InvalidFieldset
+from utils.singleflight import SingleFlight, SingleFlightTimeout
 from crapi.user.models import User, Vehicle, UserDetails
 from utils.logging import log_error
-from .models import Mechanic, ServiceRequest, ServiceComment
+from .models import Mechanic, ServiceRequest, ServiceComment, SEARCH_CONFIG
 from .serializers import (
-    MechanicSerializer,
+    MechanicRowSerializer,
     MechanicServiceRequestSerializer,
+    MechanicServiceRequestRowSerializer,
     ReceiveReportSerializer,
     SignUpSerializer,
     ServiceRequestStatusUpdateSerializer,
     ServiceCommentCreateSerializer,
     ServiceCommentViewSerializer,
+    ServiceRequestSearchSerializer,
 )
 from rest_framework.pagination import LimitOffsetPagination
 
+report_renders = SingleFlight("service_report")
+
+
 class SignUpView(APIView):
     """
     Used to add a new mechanic
@@ -139,25 +150,44 @@ class MechanicView(APIView, LimitOffsetPagination):
             mechanics list and 200 status if no error
             message and corresponding status if error
         """
-        mechanics = Mechanic.objects.all().order_by("id")
-        paginated = self.paginate_queryset(mechanics, request)
-        if paginated is None:
+        fieldset = Fieldset.from_request(request)
+        try:
+            mechanics = MechanicRowSerializer.values(
+                Mechanic.objects.all().order_by("id"), fieldset
+            )
+        except InvalidFieldset as e:
             return Response(
-                {"message": messages.NO_OBJECT_FOUND},
+                {"message": messages.INVALID_FIELDS.format(e)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        serializer = MechanicSerializer(paginated, many=True)
-        response_data = dict(
-            mechanics=serializer.data,
-            previous_offset=(
-                self.offset - self.limit if self.offset - self.limit >= 0 else None
-            ),
-            next_offset=(
-                self.offset + self.limit
-                if self.offset + self.limit < self.count
-                else None
-            ),
+
+        def get_mechanics():
+            paginated = self.paginate_queryset(mechanics, request)
+            if paginated is None:
+                return None
+            serializer = MechanicRowSerializer(paginated, fieldset)
+            return dict(
+                mechanics=serializer.data,
+                previous_offset=(
+                    self.offset - self.limit if self.offset - self.limit >= 0 else None
+                ),
+                next_offset=(
+                    self.offset + self.limit
+                    if self.offset + self.limit < self.count
+                    else None
+                ),
+            )
+
+        response_data = view_cache.get_or_compute(
+            view_cache.build_key("mechanics", request.query_params),
+            ["mechanic"],
+            get_mechanics,
         )
+        if response_data is None:
+            return Response(
+                {"message": messages.NO_OBJECT_FOUND},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -238,9 +268,26 @@ class GetReportView(APIView):
                 {"message": messages.REPORT_DOES_NOT_EXIST},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        serializer = MechanicServiceRequestSerializer(service_request)
-        response_data = dict(serializer.data)
-        service_report_pdf(response_data, report_id)
+
+        def render_report():
+            serializer = MechanicServiceRequestSerializer(service_request)
+            response_data = dict(serializer.data)
+            service_report_pdf(response_data, report_id)
+            return response_data
+
+        # a shared report link is rendered once for the requests arriving together,
+        # which also keeps them from writing the same file at the same time
+        try:
+            response_data = report_renders.do(
+                ("report", report_id),
+                render_report,
+                timeout=settings.SERVICE_REPORT_WAIT_TIMEOUT,
+            )
+        except SingleFlightTimeout:
+            return Response(
+                {"message": messages.REPORT_NOT_READY},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -265,9 +312,97 @@ class MechanicServiceRequestsView(APIView, LimitOffsetPagination):
             list of service request object and 200 status if no error
             message and corresponding status if error
         """
+        fieldset = Fieldset.from_request(request)
+        try:
+            service_requests = MechanicServiceRequestRowSerializer.values(
+                ServiceRequest.objects.filter(mechanic__user=user).order_by(
+                    "-created_on"
+                ),
+                fieldset,
+            )
+        except InvalidFieldset as e:
+            return Response(
+                {"message": messages.INVALID_FIELDS.format(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        paginated = self.paginate_queryset(service_requests, request)
+        if paginated is None:
+            return Response(
+                {"message": messages.NO_OBJECT_FOUND},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = MechanicServiceRequestRowSerializer(paginated, fieldset)
+        response_data = dict(
+            service_requests=serializer.data,
+            next_offset=(
+                self.offset + self.limit
+                if self.offset + self.limit < self.count
+                else None
+            ),
+            previous_offset=(
+                self.offset - self.limit if self.offset - self.limit >= 0 else None
+            ),
+            count=self.get_count(paginated),
+        )
+        return Response(response_data, status=status.HTTP_200_OK)
 
-        service_requests = ServiceRequest.objects.filter(mechanic__user=user).order_by(
-            "-created_on"
+
+class ServiceRequestSearchView(APIView, LimitOffsetPagination):
+    """
+    View to search service requests by problem details and comments
+    """
+
+    def __init__(self):
+        super(ServiceRequestSearchView, self).__init__()
+        self.default_limit = settings.DEFAULT_LIMIT
+
+    @jwt_auth_required
+    def get(self, request, user=None):
+        """
+        full text search over the service requests visible to the user
+        :param request: http request for the view
+            method allowed: GET
+            http request should be authorised by the jwt token of the user
+            mandatory params: ['q']
+        :param user: User object of the requesting user
+        :returns Response object with
+            ranked list of matching service requests and 200 status if no error
+            message and corresponding status if error
+        """
+        search_text = request.GET.get("q", "").strip()
+        if not search_text:
+            return Response(
+                {"message": messages.SEARCH_QUERY_MISSING},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        query = SearchQuery(search_text, config=SEARCH_CONFIG, search_type="websearch")
+        matching_comments = ServiceComment.objects.filter(search_vector=query)
+        comment_rank = (
+            matching_comments.filter(service_request=OuterRef("pk"))
+            .values("service_request")
+            .annotate(rank=Max(SearchRank(F("search_vector"), query)))
+            .values("rank")
+        )
+        service_requests = ServiceRequest.objects.filter(
+            Q(search_vector=query)
+            | Q(id__in=matching_comments.values("service_request_id"))
+        )
+        if user.role != User.ROLE_CHOICES.ADMIN:
+            service_requests = service_requests.filter(mechanic__user=user)
+        service_requests = (
+            service_requests.select_related("mechanic", "vehicle")
+            .annotate(
+                rank=Coalesce(SearchRank(F("search_vector"), query), 0.0)
+                + Coalesce(Subquery(comment_rank, output_field=FloatField()), 0.0),
+                headline=SearchHeadline(
+                    "problem_details",
+                    query,
+                    config=SEARCH_CONFIG,
+                    start_sel="<mark>",
+                    stop_sel="</mark>",
+                ),
+            )
+            .order_by("-rank", "-created_on")
         )
         paginated = self.paginate_queryset(service_requests, request)
         if paginated is None:
@@ -275,7 +410,28 @@ class MechanicServiceRequestsView(APIView, LimitOffsetPagination):
                 {"message": messages.NO_OBJECT_FOUND},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        serializer = MechanicServiceRequestSerializer(service_requests, many=True)
+        # highlight the matching comments of the current page only
+        comments = {}
+        for comment in (
+            matching_comments.filter(
+                service_request_id__in=[obj.id for obj in paginated]
+            )
+            .annotate(
+                headline=SearchHeadline(
+                    "comment",
+                    query,
+                    config=SEARCH_CONFIG,
+                    start_sel="<mark>",
+                    stop_sel="</mark>",
+                )
+            )
+            .order_by("-created_on")
+            .values("id", "service_request_id", "headline")
+        ):
+            comments.setdefault(comment.pop("service_request_id"), []).append(comment)
+        serializer = ServiceRequestSearchSerializer(
+            paginated, many=True, context={"comments": comments}
+        )
         response_data = dict(
             service_requests=serializer.data,
             next_offset=(
@@ -286,7 +442,7 @@ class MechanicServiceRequestsView(APIView, LimitOffsetPagination):
             previous_offset=(
                 self.offset - self.limit if self.offset - self.limit >= 0 else None
             ),
-            count=self.get_count(paginated),
+            count=self.count,
         )
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -369,9 +525,33 @@ class ServiceRequestView(APIView):
         """
         get a service request
         """
-        service_request = ServiceRequest.objects.get(id=service_request_id)
-        serializer = MechanicServiceRequestSerializer(service_request)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fieldset = Fieldset.from_request(request)
+        try:
+            service_requests = MechanicServiceRequestRowSerializer.values(
+                ServiceRequest.objects.filter(id=service_request_id), fieldset
+            )
+        except InvalidFieldset as e:
+            return Response(
+                {"message": messages.INVALID_FIELDS.format(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        def get_service_request():
+            rows = MechanicServiceRequestRowSerializer(service_requests, fieldset).data
+            if not rows:
+                raise ServiceRequest.DoesNotExist(
+                    "ServiceRequest matching query does not exist."
+                )
+            return rows[0]
+
+        response_data = view_cache.get_or_compute(
+            view_cache.build_key(
+                "service_request", request.query_params, scope=service_request_id
+            ),
+            [f"service_request:{service_request_id}", "mechanic"],
+            get_service_request,
+        )
+        return Response(response_data, status=status.HTTP_200_OK)
 
 
 class DownloadReportView(APIView):
@@ -415,6 +595,8 @@ def validate_filename(input: str) -> bool:
     return bool(url_encoded_pattern.fullmatch(input))
 
 
+@metrics.PDF_RENDERS_IN_PROGRESS.track_inprogress()
+@metrics.PDF_RENDER_TIME.time()
 def service_report_pdf(response_data, report_id):
     """
     Generates service report's PDF file from a template and saves it to the disk.
@@ -423,6 +605,9 @@ def service_report_pdf(response_data, report_id):
     os.makedirs(reports_dir, exist_ok=True)
     report_filepath = os.path.join(reports_dir, f"report_{report_id}")
 
+    # imported on the first report, it takes longer to import than the rest of the app
+    from xhtml2pdf import pisa
+
     template = get_template('service_report.html')
     html_string = template.render({'service': response_data})
     with open(report_filepath, "w+b") as pdf_file:
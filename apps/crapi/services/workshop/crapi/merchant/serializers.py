@@ -17,7 +17,12 @@ contains serializers for Merchant APIs
 """
 from rest_framework import serializers
 from crapi.mechanic.models import Mechanic, ServiceRequest, ServiceComment
-from crapi.mechanic.serializers import VehicleSerializer, ServiceCommentViewSerializer
+from crapi.mechanic.serializers import (
+    VehicleSerializer,
+    ServiceCommentViewSerializer,
+    ServiceCommentRowSerializer,
+)
+from utils.row_serializers import RowSerializer
 
 
 class ContactMechanicSerializer(serializers.Serializer):
@@ -28,6 +33,8 @@ class ContactMechanicSerializer(serializers.Serializer):
     mechanic_api = serializers.CharField()
     repeat_request_if_failed = serializers.BooleanField(required=False)
     number_of_repeats = serializers.IntegerField(required=False)
+    passthrough = serializers.BooleanField(required=False)
+    use_cache = serializers.BooleanField(required=False)
 
 
 class MechanicPublicSerializer(serializers.ModelSerializer):
@@ -76,3 +83,17 @@ class UserServiceRequestSerializer(serializers.ModelSerializer):
             "updated_on",
             "comments",
         )
+
+
+class UserServiceRequestRowSerializer(RowSerializer):
+    """
+    Read only UserServiceRequestSerializer for the service request list
+    """
+
+    serializer_class = UserServiceRequestSerializer
+
+    def get_comments(self, service_request_ids):
+        comments = ServiceComment.objects.order_by("id")
+        return ServiceCommentRowSerializer.group(
+            comments, "service_request_id", service_request_ids
+        )
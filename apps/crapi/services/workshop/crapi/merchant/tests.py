@@ -13,7 +13,7 @@
 """
 contains all the test cases related to merchant
 """
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from utils.mock_methods import (
     get_sample_mechanic_data,
     mock_jwt_auth_required,
@@ -23,11 +23,44 @@ from crapi.mechanic.models import ServiceRequest, Mechanic
 
 patch("utils.jwt.jwt_auth_required", mock_jwt_auth_required).start()
 
+import threading
+import time
 import bcrypt
+import requests
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.utils import timezone
 from utils import messages
+from crapi_site import settings
 from crapi.user.models import User, Vehicle, VehicleModel, VehicleCompany
+from utils.singleflight import SingleFlight
+from utils.proxy import ResponseTooLarge
+from utils.retry import DeadlineExceeded
+
+
+def mock_response(
+    status_code, body=b"", content_type="application/json", cache_control=None
+):
+    """
+    builds a mock of a streamed requests.Response
+    :param status_code: status code of the response
+    :param body: body of the response as bytes
+    :param content_type: Content-Type header of the response
+    :param cache_control: Cache-Control header of the response
+    :return: MagicMock object
+    """
+    headers = {"Content-Type": content_type, "Content-Length": str(len(body))}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return MagicMock(
+        status_code=status_code,
+        url="http://mechanic.test/api",
+        encoding=None,
+        headers=headers,
+        iter_content=lambda chunk_size: (
+            body[i : i + chunk_size] for i in range(0, len(body), chunk_size)
+        ),
+    )
 
 
 class MerchantTestCase(TestCase):
@@ -335,3 +368,347 @@ class UserServiceRequestsViewTestCase(TestCase):
         self.assertEqual(len(res.json()["service_requests"]), service_request_count + 1)
         self.assertEqual(res.json()["service_requests"][0]["status"], "PENDING")
         self.assertEqual(res.json()["service_requests"][1]["status"], "COMPLETED")
+
+    def test_user_service_requests_page(self):
+        """
+        lists the service requests of the vehicle one at a time
+        should get only the service request of each page
+        :return: None
+        """
+        newer = ServiceRequest.objects.create(
+            mechanic=self.mechanic,
+            vehicle=self.vehicle,
+            problem_details="My Car is not working again",
+            status="PENDING",
+            created_on=timezone.now(),
+        )
+        for offset, service_request in enumerate((newer, self.service_request)):
+            res = self.client.get(
+                "/workshop/api/merchant/service_requests/%s?limit=1&offset=%s"
+                % (self.vehicle.vin, offset),
+                **self.user_auth_headers
+            )
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(len(res.json()["service_requests"]), 1)
+            self.assertEqual(res.json()["service_requests"][0]["id"], service_request.id)
+
+
+@patch("crapi.merchant.views.requests.get")
+class ContactMechanicRetryTestCase(TestCase):
+    """
+    contains the test cases related to the contact mechanic retry policy
+    Attributes:
+        client: Client object used for testing
+        user_auth_headers: Auth headers for dummy user
+        contact_mechanic_request_body: sample contact mechanic request body
+    """
+
+    def setUp(self):
+        """
+        creates a dummy user and a sample contact mechanic request body
+        :return: None
+        """
+        self.client = Client()
+        user_data = get_sample_user_data()
+        User.objects.create(
+            email=user_data["email"],
+            number=user_data["number"],
+            password=user_data["password"],
+            role=User.ROLE_CHOICES.USER,
+            created_on=timezone.now(),
+        )
+        self.user_auth_headers = {"HTTP_AUTHORIZATION": "Bearer " + user_data["email"]}
+        self.contact_mechanic_request_body = {
+            "mechanic_api": "http://%s.mechanic.test/api" % self._testMethodName,
+            "repeat_request_if_failed": True,
+            "number_of_repeats": 5,
+        }
+
+    def contact_mechanic(self):
+        return self.client.post(
+            "/workshop/api/merchant/contact_mechanic",
+            self.contact_mechanic_request_body,
+            **self.user_auth_headers,
+            content_type="application/json"
+        )
+
+    def test_retry_until_success(self, mock_get):
+        """
+        fails with a connection error and a 500 before succeeding
+        should get the successful response on the third attempt
+        :return: None
+        """
+        failed = mock_response(500)
+        mock_get.side_effect = [
+            requests.exceptions.ConnectionError(),
+            failed,
+            mock_response(200, b'{"status": "ok"}'),
+        ]
+        res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["response_from_mechanic_api"], {"status": "ok"})
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertTrue(all(call.kwargs["timeout"] for call in mock_get.mock_calls))
+        self.assertTrue(failed.close.called)
+
+    def test_circuit_breaker_opens(self, mock_get):
+        """
+        fails to connect until the circuit of the host opens
+        should fail fast without calling the mechanic api again
+        :return: None
+        """
+        mock_get.side_effect = requests.exceptions.ConnectionError()
+        self.contact_mechanic_request_body["repeat_request_if_failed"] = False
+        for i in range(settings.MECHANIC_API_CIRCUIT_FAILURES):
+            res = self.contact_mechanic()
+            self.assertEqual(res.json()["message"], messages.COULD_NOT_CONNECT)
+        res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()["message"], messages.MECHANIC_API_UNAVAILABLE)
+        self.assertEqual(mock_get.call_count, settings.MECHANIC_API_CIRCUIT_FAILURES)
+
+    def test_retries_do_not_open_circuit(self, mock_get):
+        """
+        fails on more attempts of a single call than the circuit failures
+        should get the last response of the call and leave the circuit closed
+        :return: None
+        """
+        mock_get.return_value = mock_response(500)
+        self.contact_mechanic_request_body["number_of_repeats"] = (
+            settings.MECHANIC_API_CIRCUIT_FAILURES + 1
+        )
+        with patch.object(settings, "MECHANIC_API_BACKOFF_MAX", 0.01):
+            res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 500)
+        self.assertEqual(
+            mock_get.call_count, settings.MECHANIC_API_CIRCUIT_FAILURES + 2
+        )
+        mock_get.side_effect = requests.exceptions.ConnectionError()
+        res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json()["message"], messages.COULD_NOT_CONNECT)
+
+    def test_deadline_exceeded(self, mock_get):
+        """
+        times out on every attempt with a very short deadline
+        should stop retrying before number_of_repeats is reached
+        :return: None
+        """
+        mock_get.side_effect = requests.exceptions.Timeout()
+        self.contact_mechanic_request_body["number_of_repeats"] = 100
+        with patch.object(settings, "MECHANIC_API_DEADLINE", 0.5), patch.object(
+            settings, "MECHANIC_API_CIRCUIT_FAILURES", 1000
+        ):
+            res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 504)
+        self.assertEqual(res.json()["message"], messages.MECHANIC_API_TIMEOUT)
+        self.assertLess(mock_get.call_count, 100)
+
+    def test_passthrough_streams_response(self, mock_get):
+        """
+        asks for the mechanic api response to be passed through
+        should stream the upstream body, status and content type as they are
+        :return: None
+        """
+        body = b"<html>" + b"a" * 100000 + b"</html>"
+        upstream = mock_response(200, body, content_type="text/html")
+        mock_get.return_value = upstream
+        self.contact_mechanic_request_body["passthrough"] = True
+        res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "text/html")
+        self.assertEqual(b"".join(res.streaming_content), body)
+        self.assertTrue(mock_get.call_args.kwargs["stream"])
+        self.assertTrue(upstream.close.called)
+
+    def test_response_too_large(self, mock_get):
+        """
+        returns a body bigger than the allowed response size
+        should get a bad gateway response without buffering the whole body
+        :return: None
+        """
+        upstream = mock_response(200, b"a" * 2048)
+        upstream.headers = {"Content-Type": "application/json"}
+        mock_get.return_value = upstream
+        with patch.object(settings, "MECHANIC_API_MAX_RESPONSE_SIZE", 1024):
+            res = self.contact_mechanic()
+            self.assertEqual(res.status_code, 502)
+            self.assertEqual(
+                res.json()["message"], messages.MECHANIC_API_RESPONSE_TOO_LARGE
+            )
+            mock_get.return_value = mock_response(200, b"a" * 2048)
+            res = self.contact_mechanic()
+            self.assertEqual(res.status_code, 502)
+        self.assertTrue(upstream.close.called)
+
+    def test_slow_body(self, mock_get):
+        """
+        sends the body slower than the deadline allows, buffered and passed through
+        should get a gateway timeout, the passed through stream is aborted
+        :return: None
+        """
+
+        def trickle(chunk_size):
+            for i in range(100):
+                time.sleep(0.01)
+                yield b"a"
+
+        upstream = mock_response(200)
+        upstream.headers = {"Content-Type": "application/json"}
+        upstream.iter_content = trickle
+        mock_get.return_value = upstream
+        with patch.object(settings, "MECHANIC_API_DEADLINE", 0.1):
+            res = self.contact_mechanic()
+            self.assertEqual(res.status_code, 504)
+            self.assertEqual(res.json()["message"], messages.MECHANIC_API_TIMEOUT)
+            self.assertTrue(upstream.close.called)
+            self.contact_mechanic_request_body["passthrough"] = True
+            res = self.contact_mechanic()
+            with self.assertRaises(DeadlineExceeded):
+                b"".join(res.streaming_content)
+
+    def test_passthrough_too_large(self, mock_get):
+        """
+        passes through a body without Content-Length bigger than the allowed size
+        should abort the stream instead of ending a truncated body normally
+        :return: None
+        """
+        upstream = mock_response(200, b"a" * 2048)
+        upstream.headers = {"Content-Type": "application/json"}
+        mock_get.return_value = upstream
+        self.contact_mechanic_request_body["passthrough"] = True
+        with patch.object(settings, "MECHANIC_API_MAX_RESPONSE_SIZE", 1024):
+            res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 200)
+        with self.assertRaises(ResponseTooLarge):
+            b"".join(res.streaming_content)
+        self.assertTrue(upstream.close.called)
+
+
+@patch("crapi.merchant.views.requests.get")
+class ContactMechanicCacheTestCase(TestCase):
+    """
+    contains the test cases related to the contact mechanic response cache
+    Attributes:
+        client: Client object used for testing
+        contact_mechanic_request_body: sample contact mechanic request body
+    """
+
+    def setUp(self):
+        """
+        creates two dummy users and a sample contact mechanic request body
+        :return: None
+        """
+        self.client = Client()
+        cache.clear()
+        self.emails = ["cache1@example.com", "cache2@example.com"]
+        for i, email in enumerate(self.emails):
+            User.objects.create(
+                email=email,
+                number="900000000%d" % i,
+                password="password",
+                role=User.ROLE_CHOICES.USER,
+                created_on=timezone.now(),
+            )
+        self.contact_mechanic_request_body = {
+            "mechanic_api": "http://%s.mechanic.test/api?b=2&a=1"
+            % self._testMethodName,
+            "use_cache": True,
+        }
+
+    def contact_mechanic(self, email=None, **kwargs):
+        return self.client.post(
+            "/workshop/api/merchant/contact_mechanic",
+            dict(self.contact_mechanic_request_body, **kwargs),
+            HTTP_AUTHORIZATION="Bearer " + (email or self.emails[0]),
+            content_type="application/json",
+        )
+
+    def test_cached_response(self, mock_get):
+        """
+        calls the same mechanic api twice, the second time with an equivalent url
+        should call the mechanic api only once
+        :return: None
+        """
+        mock_get.side_effect = lambda *args, **kwargs: mock_response(
+            200, b'{"status": "ok"}'
+        )
+        res = self.contact_mechanic()
+        self.assertEqual(res.status_code, 200)
+        url = "HTTP://%s.Mechanic.test:80/api?a=1&b=2" % self._testMethodName
+        res = self.contact_mechanic(mechanic_api=url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["response_from_mechanic_api"], {"status": "ok"})
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_cache_is_per_caller(self, mock_get):
+        """
+        calls the same mechanic api as two different users
+        and once without asking for the cache
+        should call the mechanic api every time
+        :return: None
+        """
+        mock_get.side_effect = lambda *args, **kwargs: mock_response(
+            200, b'{"status": "ok"}'
+        )
+        self.contact_mechanic()
+        self.contact_mechanic(email=self.emails[1])
+        self.contact_mechanic(use_cache=False)
+        self.assertEqual(mock_get.call_count, 3)
+
+    def test_cache_control(self, mock_get):
+        """
+        gets responses which may not be cached
+        should call the mechanic api every time
+        :return: None
+        """
+        for cache_control in ("no-store", "private, no-cache", "max-age=0"):
+            mock_get.side_effect = lambda *args, **kwargs: mock_response(
+                200, b'{"status": "ok"}', cache_control=cache_control
+            )
+            mock_get.reset_mock()
+            self.contact_mechanic()
+            self.contact_mechanic()
+            self.assertEqual(mock_get.call_count, 2, cache_control)
+        mock_get.side_effect = lambda *args, **kwargs: mock_response(500)
+        mock_get.reset_mock()
+        self.contact_mechanic()
+        self.contact_mechanic()
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_single_flight(self, mock_get):
+        """
+        runs the same call from several threads while the first one is in flight
+        should run it once and give every caller its result
+        :return: None
+        """
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_call():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(flight.do("key", slow_call))
+        )
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do("key", slow_call)))
+            for i in range(4)
+        ]
+        for follower in followers:
+            follower.start()
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        self.assertEqual(results, ["result"] * 5)
+        self.assertLessEqual(len(calls), 2)
+        self.assertEqual(flight.calls, {})
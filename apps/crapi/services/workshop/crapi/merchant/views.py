@@ -16,7 +16,10 @@
 contains all the views related to Merchant
 """
 import logging
+import time
+from urllib.parse import urlparse
 import requests
+from django.core.cache import cache
 from requests.exceptions import MissingSchema, InvalidURL
 from rest_framework import status
 from rest_framework.response import Response
@@ -29,12 +32,31 @@ from utils.jwt import jwt_auth_required
 from utils import messages
 from rest_framework.pagination import LimitOffsetPagination
 from utils.logging import log_error
+from utils.row_serializers import Fieldset, InvalidFieldset
+from utils.proxy import (
+    ResponseTooLarge,
+    cache_key,
+    cache_ttl,
+    decode_body,
+    read_limited,
+    streaming_response,
+)
+from utils.singleflight import SingleFlight
+from utils.timing import outbound
+from utils.retry import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    RetryPolicy,
+    call_with_retry,
+    get_circuit_breaker,
+)
 from crapi_site import settings
 from crapi.mechanic.models import ServiceRequest, ServiceComment
-from .serializers import ContactMechanicSerializer, UserServiceRequestSerializer
+from .serializers import ContactMechanicSerializer, UserServiceRequestRowSerializer
 
 
 logger = logging.getLogger()
+mechanic_api_calls = SingleFlight("mechanic_api")
 
 
 class ContactMechanicView(APIView):
@@ -50,6 +72,8 @@ class ContactMechanicView(APIView):
             method allowed: POST
             http request should be authorised by the jwt token of the user
             mandatory fields: ['mechanic_api']
+            optional fields: ['repeat_request_if_failed', 'number_of_repeats',
+                'passthrough', 'use_cache']
         :param user: User object of the requesting user
         :returns Response object with
             response_from_mechanic_api and 200 status if no error
@@ -79,46 +103,116 @@ class ContactMechanicView(APIView):
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
 
-        repeat_count = 0
-        while True:
-            request_url = request_data["mechanic_api"]
-            logger.info(f"Repeat count: {repeat_count}, mechanic_api: {request_url}")
-            try:
-                mechanic_response = requests.get(
-                    request_url,
-                    params=request_data,
-                    headers={"Authorization": request.META.get("HTTP_AUTHORIZATION")},
-                    verify=False,
+        request_url = request_data["mechanic_api"]
+        policy = RetryPolicy(
+            max_attempts=number_of_repeats + 1 if repeat_request_if_failed else 1,
+            base_delay=settings.MECHANIC_API_BACKOFF_BASE,
+            max_delay=settings.MECHANIC_API_BACKOFF_MAX,
+            deadline=settings.MECHANIC_API_DEADLINE,
+            attempt_timeout=settings.MECHANIC_API_TIMEOUT,
+            hedge_after=settings.MECHANIC_API_HEDGE_AFTER,
+        )
+        breaker = get_circuit_breaker(
+            urlparse(request_url).netloc,
+            settings.MECHANIC_API_CIRCUIT_FAILURES,
+            settings.MECHANIC_API_CIRCUIT_RESET,
+        )
+
+        def send(timeout):
+            return requests.get(
+                request_url,
+                params=request_data,
+                headers={"Authorization": request.META.get("HTTP_AUTHORIZATION")},
+                verify=False,
+                timeout=timeout,
+                stream=True,
+            )
+
+        def fetch():
+            return call_with_retry(
+                send,
+                policy,
+                breaker=breaker,
+                retry_on_response=lambda response: (
+                    response.status_code != status.HTTP_200_OK
+                ),
+            )
+
+        def fetch_body():
+            # the deadline also bounds the read of the body, not only the attempts
+            deadline = time.monotonic() + policy.deadline
+            with outbound("mechanic_api"):
+                mechanic_response = fetch()
+                body = read_limited(
+                    mechanic_response,
+                    settings.MECHANIC_API_MAX_RESPONSE_SIZE,
+                    settings.MECHANIC_API_CHUNK_SIZE,
+                    deadline,
                 )
-                if mechanic_response.status_code == status.HTTP_200_OK:
-                    logger.info(f"Got a valid response at repeat count: {repeat_count}")
-                    break
-                if not repeat_request_if_failed:
-                    break
-                if repeat_count == number_of_repeats:
-                    break
-                repeat_count += 1
-            except (MissingSchema, InvalidURL) as e:
-                log_error(request.path, request.data, status.HTTP_400_BAD_REQUEST, e)
-                return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-            except requests.exceptions.ConnectionError as e:
-                if not repeat_request_if_failed:
-                    return Response(
-                        {"message": messages.COULD_NOT_CONNECT},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-                if repeat_count == number_of_repeats:
-                    return Response(
-                        {"message": messages.COULD_NOT_CONNECT},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-                repeat_count += 1
-                continue
-        mechanic_response_status = mechanic_response.status_code
+            return mechanic_response, decode_body(mechanic_response, body)
+
+        def fetch_and_cache(key):
+            mechanic_response, body = fetch_body()
+            result = (mechanic_response.status_code, body)
+            ttl = cache_ttl(mechanic_response, settings.MECHANIC_API_CACHE_TTL)
+            if mechanic_response.status_code == status.HTTP_200_OK and ttl:
+                cache.set(key, result, ttl)
+            return result
+
+        def fetch_result():
+            mechanic_response, body = fetch_body()
+            return mechanic_response.status_code, body
+
+        logger.info(f"mechanic_api: {request_url}, attempts: {policy.max_attempts}")
         try:
-            mechanic_response = mechanic_response.json()
-        except ValueError:
-            mechanic_response = mechanic_response.text
+            if request_data.get("passthrough", False):
+                deadline = time.monotonic() + policy.deadline
+                with outbound("mechanic_api"):
+                    mechanic_response = fetch()
+                return streaming_response(
+                    mechanic_response,
+                    settings.MECHANIC_API_MAX_RESPONSE_SIZE,
+                    settings.MECHANIC_API_CHUNK_SIZE,
+                    deadline,
+                )
+            params = {
+                name: value
+                for name, value in request_data.items()
+                if name != "mechanic_api"
+            }
+            key = cache_key(request_url, params, user.id)
+            # identical calls in flight share a single upstream request
+            if request_data.get("use_cache", False):
+                result = cache.get(key)
+                if result is None:
+                    result = mechanic_api_calls.do(key, lambda: fetch_and_cache(key))
+            else:
+                result = mechanic_api_calls.do(key, fetch_result)
+            mechanic_response_status, mechanic_response = result
+        except (MissingSchema, InvalidURL) as e:
+            log_error(request.path, request.data, status.HTTP_400_BAD_REQUEST, e)
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except CircuitOpenError:
+            return Response(
+                {"message": messages.MECHANIC_API_UNAVAILABLE},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        except DeadlineExceeded:
+            return Response(
+                {"message": messages.MECHANIC_API_TIMEOUT},
+                status=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            return Response(
+                {"message": messages.COULD_NOT_CONNECT},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except ResponseTooLarge as e:
+            log_error(request.path, request.data, status.HTTP_502_BAD_GATEWAY, e)
+            return Response(
+                {"message": messages.MECHANIC_API_RESPONSE_TOO_LARGE},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
         return Response(
             {
                 "response_from_mechanic_api": mechanic_response,
@@ -174,17 +268,24 @@ class UserServiceRequestsView(APIView, LimitOffsetPagination):
             list of service request object and 200 status if no error
             message and corresponding status if error
         """
-
-        service_requests = ServiceRequest.objects.filter(vehicle__vin=vin).order_by(
-            "-created_on"
-        )
+        fieldset = Fieldset.from_request(request)
+        try:
+            service_requests = UserServiceRequestRowSerializer.values(
+                ServiceRequest.objects.filter(vehicle__vin=vin).order_by("-created_on"),
+                fieldset,
+            )
+        except InvalidFieldset as e:
+            return Response(
+                {"message": messages.INVALID_FIELDS.format(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         paginated = self.paginate_queryset(service_requests, request)
         if paginated is None:
             return Response(
                 {"message": messages.NO_OBJECT_FOUND},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        serializer = UserServiceRequestSerializer(service_requests, many=True)
+        serializer = UserServiceRequestRowSerializer(paginated, fieldset)
         response_data = dict(
             service_requests=serializer.data,
             next_offset=(
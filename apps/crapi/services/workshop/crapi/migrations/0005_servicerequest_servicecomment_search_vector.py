@@ -0,0 +1,94 @@
+# Generated by Django 4.1.13 on 2026-10-19 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# (table, source column, index name)
+SEARCH_TABLES = [
+    ("service_request", "problem_details", "service_request_search_idx"),
+    ("service_comment", "comment", "service_comment_search_idx"),
+]
+
+
+def add_search_vectors(apps, schema_editor):
+    """
+    Adds the tsvector columns, GIN indexes and the triggers keeping them
+    up to date. The mongodb alias also runs these migrations, so everything
+    here is skipped on databases other than Postgres.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column, index in SEARCH_TABLES:
+        schema_editor.execute(
+            f'ALTER TABLE "{table}" ADD COLUMN "search_vector" tsvector NULL'
+        )
+        schema_editor.execute(
+            f'UPDATE "{table}" SET "search_vector" = '
+            f"to_tsvector('pg_catalog.english', coalesce(\"{column}\", ''))"
+        )
+        schema_editor.execute(
+            f'CREATE INDEX "{index}" ON "{table}" USING gin ("search_vector")'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER "{table}_search_vector_update" '
+            f'BEFORE INSERT OR UPDATE OF "{column}" ON "{table}" '
+            f"FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger("
+            f"search_vector, 'pg_catalog.english', {column})"
+        )
+
+
+def remove_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column, index in SEARCH_TABLES:
+        schema_editor.execute(
+            f'DROP TRIGGER IF EXISTS "{table}_search_vector_update" ON "{table}"'
+        )
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index}"')
+        schema_editor.execute(
+            f'ALTER TABLE "{table}" DROP COLUMN IF EXISTS "search_vector"'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crapi", "0004_alter_servicerequest_status_servicecomment"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name="servicerequest",
+                    name="search_vector",
+                    field=django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                migrations.AddField(
+                    model_name="servicecomment",
+                    name="search_vector",
+                    field=django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="servicerequest",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="service_request_search_idx"
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="servicecomment",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="service_comment_search_idx"
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_search_vectors, remove_search_vectors),
+            ],
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.1.13 on 2026-10-19 10:41
+
+from django.db import migrations, models
+
+HOT_PATH_INDEXES = [
+    (
+        "servicerequest",
+        models.Index(
+            fields=["mechanic", "-created_on"], name="sr_mechanic_created_idx"
+        ),
+    ),
+    (
+        "servicerequest",
+        models.Index(fields=["vehicle", "-created_on"], name="sr_vehicle_created_idx"),
+    ),
+    (
+        "servicecomment",
+        models.Index(
+            fields=["service_request", "-created_on"], name="sc_request_created_idx"
+        ),
+    ),
+    ("order", models.Index(fields=["user", "-id"], name="order_user_id_idx")),
+    (
+        "appliedcoupon",
+        models.Index(
+            fields=["user", "coupon_code"], name="applied_coupon_user_code_idx"
+        ),
+    ),
+]
+
+
+def add_indexes(apps, schema_editor):
+    """
+    Builds the indexes concurrently so that live tables are not locked
+    against writes. Skipped on the mongodb alias.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model_name, index in HOT_PATH_INDEXES:
+        model = apps.get_model("crapi", model_name)
+        schema_editor.add_index(model, index, concurrently=True)
+
+
+def remove_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model_name, index in HOT_PATH_INDEXES:
+        model = apps.get_model("crapi", model_name)
+        schema_editor.remove_index(model, index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("crapi", "0005_servicerequest_servicecomment_search_vector"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in HOT_PATH_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(add_indexes, remove_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.13 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crapi", "0006_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("fingerprint", models.CharField(max_length=64)),
+                ("status_code", models.SmallIntegerField(null=True)),
+                ("response", models.BinaryField(null=True)),
+                ("expires_on", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "db_table": "idempotency_key",
+            },
+        ),
+    ]
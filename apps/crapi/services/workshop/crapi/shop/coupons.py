@@ -0,0 +1,93 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Coupon repository reading the coupons collection with pymongo
+The coupons are written by the community service, going through djongo here
+would translate every lookup to SQL and back. The client and its connection
+pool are shared by the threads of a process, djongo is still used by the
+migrations and the tests to create the collection and the coupons
+"""
+import logging
+import os
+import threading
+
+from django.db import connections
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import PyMongoError
+
+from crapi.shop.models import Coupon
+from crapi_site import settings
+
+logger = logging.getLogger()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_indexed = set()
+
+
+def get_client():
+    """
+    :return: MongoClient of the process, a forked worker gets its own
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            options = connections["mongodb"].settings_dict["CLIENT"]
+            _client = MongoClient(
+                host=options["host"],
+                port=options["port"],
+                username=options.get("username"),
+                password=options.get("password"),
+                authSource=options.get("authSource", "admin"),
+                maxPoolSize=settings.MONGO_POOL_MAX_SIZE,
+                serverSelectionTimeoutMS=settings.MONGO_TIMEOUT * 1000,
+                connectTimeoutMS=settings.MONGO_TIMEOUT * 1000,
+                socketTimeoutMS=settings.MONGO_TIMEOUT * 1000,
+                connect=False,
+            )
+            _client_pid = os.getpid()
+            _indexed.clear()
+        return _client
+
+
+def get_collection():
+    """
+    :return: coupons collection, with its coupon_code index
+    """
+    # the test runner renames the database, so it is read on every call
+    name = connections["mongodb"].settings_dict["NAME"]
+    collection = get_client()[name][Coupon._meta.db_table]
+    if name not in _indexed:
+        try:
+            collection.create_index([("coupon_code", ASCENDING)])
+        except PyMongoError as e:
+            logger.warning(f"Could not index the coupon codes: {e}")
+        _indexed.add(name)
+    return collection
+
+
+def get_coupon(coupon_code):
+    """
+    :param coupon_code: code of the coupon
+    :return: Coupon object
+    :raises Coupon.DoesNotExist: if there is no coupon with this code
+    """
+    document = get_collection().find_one(
+        {"coupon_code": coupon_code}, {"_id": 0, "coupon_code": 1, "amount": 1}
+    )
+    if document is None:
+        raise Coupon.DoesNotExist("Coupon matching query does not exist.")
+    return Coupon(coupon_code=document["coupon_code"], amount=document.get("amount"))
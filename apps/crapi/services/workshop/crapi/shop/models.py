@@ -69,6 +69,9 @@ class Order(models.Model):
 
     class Meta:
         db_table = "order"
+        indexes = [
+            models.Index(fields=["user", "-id"], name="order_user_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.product.name} "
@@ -103,6 +106,34 @@ class AppliedCoupon(models.Model):
 
     class Meta:
         db_table = "applied_coupon"
+        indexes = [
+            models.Index(
+                fields=["user", "coupon_code"], name="applied_coupon_user_code_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.coupon_code} "
+
+
+class IdempotencyKey(models.Model):
+    """
+    IdempotencyKey Model
+    represents a write request sent with an Idempotency-Key header
+    and the response it got, see utils.idempotency
+    """
+
+    # sha256 of the user, the endpoint and the header
+    key = models.CharField(max_length=64, primary_key=True)
+    # sha256 of the method, path and body of the request
+    fingerprint = models.CharField(max_length=64)
+    # null while the first request is running
+    status_code = models.SmallIntegerField(null=True)
+    response = models.BinaryField(null=True)
+    expires_on = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "idempotency_key"
+
+    def __str__(self):
+        return f"{self.key} - {self.status_code}"
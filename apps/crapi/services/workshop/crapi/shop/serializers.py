@@ -19,6 +19,7 @@ from rest_framework import serializers
 
 from crapi.shop.models import Order, Product, Coupon
 from crapi.user.serializers import UserSerializer
+from utils.row_serializers import RowSerializer
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -60,6 +61,22 @@ class OrderSerializer(serializers.ModelSerializer):
         )
 
 
+class ProductRowSerializer(RowSerializer):
+    """
+    Read only ProductSerializer for the product list
+    """
+
+    serializer_class = ProductSerializer
+
+
+class OrderRowSerializer(RowSerializer):
+    """
+    Read only OrderSerializer for the order list
+    """
+
+    serializer_class = OrderSerializer
+
+
 class CouponSerializer(serializers.Serializer):
     """
     Serializer for Coupon model
@@ -21,11 +21,15 @@ patch("utils.jwt.jwt_auth_required", mock_jwt_auth_required).start()
 import logging
 import bcrypt
 import json
-from django.test import TestCase, Client
+from datetime import timedelta
+from django.test import TestCase, Client, RequestFactory
 from django.utils import timezone
 from utils import messages
 from crapi.user.models import User, UserDetails
-from crapi.shop.models import Coupon
+from crapi.shop import coupons
+from crapi.shop.models import Coupon, IdempotencyKey, Order, Product
+from utils.idempotency import get_fingerprint, get_key
+from crapi_site import settings
 
 logger = logging.getLogger("ProductTest")
 
@@ -156,6 +160,17 @@ class ProductTestCase(TestCase):
         self.assertEqual(res.status_code, 400)
         self.assertEqual(res.json()["message"], messages.COUPON_NOT_FOUND)
 
+    def test_get_coupon(self):
+        """
+        looks up the coupons created through djongo with the repository
+        should find them through the coupon_code index
+        :return: None
+        """
+        self.assertEqual(coupons.get_coupon("TRAC075").coupon_code, "TRAC075")
+        with self.assertRaises(Coupon.DoesNotExist):
+            coupons.get_coupon("TRAC105")
+        self.assertIn("coupon_code_1", coupons.get_collection().index_information())
+
     def test_sql_injection(self):
         """
         applies a SQLI query to the  apply_coupon api
@@ -207,3 +222,220 @@ class ProductTestCase(TestCase):
         self.create_order()
         res = self.client.get("/workshop/api/shop/orders/" + str(self.order_id))
         self.assertEqual(res.status_code, 200)
+
+
+class CouponTestCase(TestCase):
+    """
+    contains the test cases of apply_coupon with the coupon collection
+    patched, so that they run without mongodb
+    Attributes:
+        client: Client object used for testing
+        user: dummy user object
+        auth_headers: Auth headers for dummy user
+        collection: MagicMock standing in for the coupons collection
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            email="coupon@example.com",
+            number="9000000051",
+            password="password",
+            role=User.ROLE_CHOICES.USER,
+            created_on=timezone.now(),
+        )
+        UserDetails.objects.create(
+            available_credit=100, name="Coupon", status="ACTIVE", user=self.user
+        )
+        self.auth_headers = {"HTTP_AUTHORIZATION": "Bearer coupon@example.com"}
+        get_collection = patch("crapi.shop.coupons.get_collection").start()
+        self.addCleanup(patch.stopall)
+        self.collection = get_collection.return_value
+        self.collection.find_one.side_effect = lambda query, projection: (
+            {"coupon_code": "TRAC075", "amount": "75"}
+            if query["coupon_code"] == "TRAC075"
+            else None
+        )
+
+    def apply_coupon(self, coupon_code, **headers):
+        return self.client.post(
+            "/workshop/api/shop/apply_coupon",
+            json.dumps({"coupon_code": coupon_code, "amount": 75}),
+            content_type="application/json",
+            **headers,
+            **self.auth_headers
+        )
+
+    def test_get_coupon(self):
+        """
+        looks up a coupon by its code
+        should read only the code and the amount of the document
+        :return: None
+        """
+        coupon = coupons.get_coupon("TRAC075")
+        self.assertEqual((coupon.coupon_code, coupon.amount), ("TRAC075", "75"))
+        self.collection.find_one.assert_called_once_with(
+            {"coupon_code": "TRAC075"}, {"_id": 0, "coupon_code": 1, "amount": 1}
+        )
+        with self.assertRaises(Coupon.DoesNotExist):
+            coupons.get_coupon("UNKNOWN")
+
+    def test_apply_coupon(self):
+        """
+        applies a coupon twice, then a coupon which does not exist
+        should increase the credit once and reject the other requests
+        :return: None
+        """
+        res = self.apply_coupon("TRAC075")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["message"], messages.COUPON_APPLIED)
+        self.assertEqual(UserDetails.objects.get(user=self.user).available_credit, 175)
+
+        res = self.apply_coupon("TRAC075")
+        self.assertEqual(res.status_code, 400)
+        self.assertIn(messages.COUPON_ALREADY_APPLIED, res.json()["message"])
+        # the applied coupon is found in postgres without a lookup
+        self.assertEqual(self.collection.find_one.call_count, 1)
+
+        res = self.apply_coupon("UNKNOWN")
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json()["message"], messages.COUPON_NOT_FOUND)
+        self.assertEqual(UserDetails.objects.get(user=self.user).available_credit, 175)
+
+    def test_idempotent_replay(self):
+        """
+        applies a coupon twice with the same Idempotency-Key
+        should look the coupon up once and replay the first response
+        :return: None
+        """
+        first = self.apply_coupon("TRAC075", HTTP_IDEMPOTENCY_KEY="coupon-1")
+        retry = self.apply_coupon("TRAC075", HTTP_IDEMPOTENCY_KEY="coupon-1")
+        self.assertEqual([first.status_code, retry.status_code], [200, 200])
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(self.collection.find_one.call_count, 1)
+        self.assertEqual(UserDetails.objects.get(user=self.user).available_credit, 175)
+
+        res = self.apply_coupon("UNKNOWN", HTTP_IDEMPOTENCY_KEY="coupon-1")
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(res.json()["message"], messages.IDEMPOTENCY_KEY_REUSED)
+
+
+class IdempotencyTestCase(TestCase):
+    """
+    contains the test cases related to the Idempotency-Key header
+    Attributes:
+        client: Client object used for testing
+        user: dummy user object
+        auth_headers: Auth headers for dummy user
+        product: Product ordered by the tests
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            email="idempotency@example.com",
+            number="9000000050",
+            password="password",
+            role=User.ROLE_CHOICES.USER,
+            created_on=timezone.now(),
+        )
+        UserDetails.objects.create(
+            available_credit=100, name="Idempotency", status="ACTIVE", user=self.user
+        )
+        self.product = Product.objects.create(name="Seat", price=10, image_url="")
+        self.auth_headers = {"HTTP_AUTHORIZATION": "Bearer idempotency@example.com"}
+
+    def create_order(self, key, quantity=1):
+        return self.client.post(
+            "/workshop/api/shop/orders",
+            json.dumps({"product_id": self.product.id, "quantity": quantity}),
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+            **self.auth_headers
+        )
+
+    def test_replay(self):
+        """
+        creates and returns an order twice with the same keys
+        should run each request once and replay its response to the retry
+        :return: None
+        """
+        first = self.create_order("order-1")
+        retry = self.create_order("order-1")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(UserDetails.objects.get(user=self.user).available_credit, 90)
+
+        url = "/workshop/api/shop/orders/return_order?order_id=%s" % first.json()["id"]
+        responses = [
+            self.client.post(url, HTTP_IDEMPOTENCY_KEY="return-1", **self.auth_headers)
+            for i in range(2)
+        ]
+        self.assertEqual([res.status_code for res in responses], [200, 200])
+        self.assertEqual(responses[1].json(), responses[0].json())
+        res = self.client.post(url, **self.auth_headers)
+        self.assertEqual(res.json()["message"], messages.ORDER_RETURNED_PENDING)
+
+        self.assertEqual(self.create_order("order-2").status_code, 200)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 2)
+
+    def test_key_reuse(self):
+        """
+        sends another request with the key of a previous one
+        should reject it without running the view
+        :return: None
+        """
+        self.create_order("order-1")
+        res = self.create_order("order-1", quantity=2)
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(res.json()["message"], messages.IDEMPOTENCY_KEY_REUSED)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        res = self.create_order("x" * 256)
+        self.assertEqual(res.status_code, 400)
+
+    @patch.object(settings, "IDEMPOTENCY_WAIT_TIMEOUT", 0.1)
+    def test_in_progress(self):
+        """
+        retries a request whose first attempt is still running
+        should wait for its response and give up with a 409
+        :return: None
+        """
+        request = RequestFactory().post(
+            "/workshop/api/shop/orders",
+            json.dumps({"product_id": self.product.id, "quantity": 1}),
+            content_type="application/json",
+        )
+        IdempotencyKey.objects.create(
+            key=get_key("order", self.user, "order-1"),
+            fingerprint=get_fingerprint(request),
+            expires_on=timezone.now() + timedelta(minutes=1),
+        )
+        res = self.create_order("order-1")
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.json()["message"], messages.IDEMPOTENCY_KEY_IN_PROGRESS)
+        self.assertFalse(Order.objects.exists())
+
+        IdempotencyKey.objects.update(expires_on=timezone.now())
+        res = self.create_order("order-1")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failure_releases_key(self):
+        """
+        fails the first attempt of a request
+        should release its key so that the retry runs the view
+        :return: None
+        """
+        with patch(
+            "crapi.shop.views.Order.objects.create", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.create_order("order-1")
+        self.assertFalse(IdempotencyKey.objects.exists())
+        res = self.create_order("order-1")
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.has_header("Idempotent-Replayed"))
@@ -29,19 +29,29 @@ from rest_framework.views import APIView
 from utils.helper import basic_auth
 from crapi.shop.serializers import (
     OrderSerializer,
+    OrderRowSerializer,
     ProductSerializer,
+    ProductRowSerializer,
     CouponSerializer,
     ProductQuantitySerializer,
 )
 from crapi.user.serializers import UserSerializer
+from utils.idempotency import idempotent
 from utils.jwt import jwt_auth_required
 from utils import messages
-from crapi.shop.models import Order, Product, AppliedCoupon, Coupon
+from utils import view_cache
+from crapi.shop import coupons
+from crapi.shop.models import Order, Product, AppliedCoupon
 from crapi.user.models import UserDetails
 from utils.logging import log_error
+from utils.row_serializers import Fieldset, InvalidFieldset
+from utils.singleflight import SingleFlight
+from utils.timing import outbound
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.pagination import LimitOffsetPagination
 
+order_reads = SingleFlight("order")
+
 
 class ProductView(APIView, LimitOffsetPagination):
     """
@@ -61,21 +71,45 @@ class ProductView(APIView, LimitOffsetPagination):
             message and corresponding status if error
         """
         user_details = UserDetails.objects.get(user=user)
-        products = Product.objects.all().order_by("-id")
-        paginated = self.paginate_queryset(products, request, view=self)
-        serializer = ProductSerializer(paginated, many=True)
+        fieldset = Fieldset.from_request(request)
+        try:
+            products = ProductRowSerializer.values(
+                Product.objects.all().order_by("-id"), fieldset
+            )
+        except InvalidFieldset as e:
+            return Response(
+                {"message": messages.INVALID_FIELDS.format(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        def get_products():
+            paginated = self.paginate_queryset(products, request, view=self)
+            serializer = ProductRowSerializer(paginated, fieldset)
+            return dict(
+                products=serializer.data,
+                next_offset=(
+                    self.offset + self.limit
+                    if self.offset + self.limit < self.count
+                    else None
+                ),
+                previous_offset=(
+                    self.offset - self.limit if self.offset - self.limit >= 0 else None
+                ),
+                count=self.get_count(paginated),
+            )
+
+        # the catalog is the same for every user, only the credit is not
+        products = view_cache.get_or_compute(
+            view_cache.build_key("products", request.query_params),
+            ["product"],
+            get_products,
+        )
         response_data = dict(
-            products=serializer.data,
+            products=products["products"],
             credit=user_details.available_credit,
-            next_offset=(
-                self.offset + self.limit
-                if self.offset + self.limit < self.count
-                else None
-            ),
-            previous_offset=(
-                self.offset - self.limit if self.offset - self.limit >= 0 else None
-            ),
-            count=self.get_count(paginated),
+            next_offset=products["next_offset"],
+            previous_offset=products["previous_offset"],
+            count=products["count"],
         )
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -119,52 +153,59 @@ class OrderControlView(APIView):
             order object and 200 status if no error
             message and corresponding status if error
         """
-        order = Order.objects.get(id=order_id)
-        order_serializer = OrderSerializer(order)
-        user = order.user
-        # email user.email, number user.number
-        payment = {}
-        try:
-            user_dict = UserSerializer(user).data
-            user_details = UserDetails.objects.get(user=user)
-            user_dict["name"] = user_details.name
-            gateway_endpoint = settings.API_GATEWAY_URL + "/v1/payment"
-            gateway_credential = basic_auth(
-                settings.API_GATEWAY_USERNAME, settings.API_GATEWAY_PASSWORD
-            )
-            logging.debug(gateway_endpoint)
-            data = {}
-            data["user"] = user_dict
-            data["order"] = order_serializer.data
-            data["amount"] = float(order.product.price) * int(order.quantity)
+
+        def get_order():
+            order = Order.objects.get(id=order_id)
+            order_serializer = OrderSerializer(order)
+            user = order.user
+            # email user.email, number user.number
+            payment = {}
             try:
-                payment_response = requests.post(
-                    gateway_endpoint,
-                    headers={
-                        "Authorization": gateway_credential,
-                        "Content-Type": "application/json",
-                    },
-                    json=data,
-                    verify=False,
-                    timeout=5,
+                user_dict = UserSerializer(user).data
+                user_details = UserDetails.objects.get(user=user)
+                user_dict["name"] = user_details.name
+                gateway_endpoint = settings.API_GATEWAY_URL + "/v1/payment"
+                gateway_credential = basic_auth(
+                    settings.API_GATEWAY_USERNAME, settings.API_GATEWAY_PASSWORD
                 )
-                if payment_response.status_code == 200:
-                    payment = payment_response.json()
-                else:
-                    logging.error(
-                        "Payment response error, {}: {}".format(
-                            payment_response.status_code, payment_response.content
+                logging.debug(gateway_endpoint)
+                data = {}
+                data["user"] = user_dict
+                data["order"] = order_serializer.data
+                data["amount"] = float(order.product.price) * int(order.quantity)
+                try:
+                    with outbound("payment_gateway"):
+                        payment_response = requests.post(
+                            gateway_endpoint,
+                            headers={
+                                "Authorization": gateway_credential,
+                                "Content-Type": "application/json",
+                            },
+                            json=data,
+                            verify=False,
+                            timeout=5,
+                        )
+                    if payment_response.status_code == 200:
+                        payment = payment_response.json()
+                    else:
+                        logging.error(
+                            "Payment response error, {}: {}".format(
+                                payment_response.status_code, payment_response.content
+                            )
                         )
-                    )
-                logging.debug("payment response: {}".format(payment))
+                    logging.debug("payment response: {}".format(payment))
+                except Exception as e:
+                    logging.error(e, exc_info=True)
             except Exception as e:
                 logging.error(e, exc_info=True)
-        except Exception as e:
-            logging.error(e, exc_info=True)
-        response_data = dict(order=order_serializer.data, payment=payment)
+            return dict(order=order_serializer.data, payment=payment)
+
+        # concurrent reads of the same order share one call to the payment gateway
+        response_data = order_reads.do(("order", order_id), get_order)
         return Response(response_data, status=status.HTTP_200_OK)
 
     @jwt_auth_required
+    @idempotent("order")
     def post(self, request, order_id=None, user=None):
         """
         order view for adding a new order
@@ -276,9 +317,18 @@ class OrderDetailsView(APIView, LimitOffsetPagination):
             list of order object and 200 status if no error
             message and corresponding status if error
         """
-        orders = Order.objects.filter(user=user).order_by("-id")
+        fieldset = Fieldset.from_request(request)
+        try:
+            orders = OrderRowSerializer.values(
+                Order.objects.filter(user=user).order_by("-id"), fieldset
+            )
+        except InvalidFieldset as e:
+            return Response(
+                {"message": messages.INVALID_FIELDS.format(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         paginated = self.paginate_queryset(orders, request, view=self)
-        serializer = OrderSerializer(paginated, many=True)
+        serializer = OrderRowSerializer(paginated, fieldset)
         response_data = dict(
             orders=serializer.data,
             next_offset=(
@@ -300,6 +350,7 @@ class ReturnOrder(APIView):
     """
 
     @jwt_auth_required
+    @idempotent("return_order")
     def post(self, request, user=None):
         """
         api for returning an order
@@ -363,6 +414,7 @@ class ApplyCouponView(APIView):
     """
 
     @jwt_auth_required
+    @idempotent("apply_coupon")
     def post(self, request, user=None):
         """
         api for checking if coupon is already claimed
@@ -408,9 +460,7 @@ class ApplyCouponView(APIView):
             )
 
         try:
-            coupon = Coupon.objects.using("mongodb").get(
-                coupon_code=coupon_request_body["coupon_code"]
-            )
+            coupon = coupons.get_coupon(coupon_request_body["coupon_code"])
         except ObjectDoesNotExist as e:
             log_error(request.path, request.data, 400, e)
             return Response(
@@ -0,0 +1,44 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+contains the signal receivers invalidating the view cache
+when the models the cached views read from change
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from crapi.mechanic.models import Mechanic, ServiceComment, ServiceRequest
+from crapi.shop.models import Product
+from utils.view_cache import invalidate
+
+
+@receiver([post_save, post_delete], sender=Mechanic)
+def invalidate_mechanic(sender, instance, **kwargs):
+    invalidate("mechanic")
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    invalidate("product")
+
+
+@receiver([post_save, post_delete], sender=ServiceRequest)
+def invalidate_service_request(sender, instance, **kwargs):
+    invalidate(f"service_request:{instance.id}")
+
+
+@receiver([post_save, post_delete], sender=ServiceComment)
+def invalidate_service_comment(sender, instance, **kwargs):
+    invalidate(f"service_request:{instance.service_request_id}")
@@ -10,6 +10,233 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+"""
+contains the query plan regression tests for the workshop endpoints
+"""
+import json
+import os
+from datetime import timedelta
+from unittest.mock import patch
+from utils.mock_methods import mock_jwt_auth_required
 
+patch("utils.jwt.jwt_auth_required", mock_jwt_auth_required).start()
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from crapi.mechanic.models import Mechanic, ServiceRequest, ServiceComment
+from crapi.shop.models import AppliedCoupon, Order, Product
+from crapi.user.models import User, Vehicle, VehicleCompany, VehicleModel
+
+# number of service requests and orders loaded for the query plan tests
+QUERY_PLAN_ROWS = int(os.environ.get("QUERY_PLAN_ROWS", 20000))
+QUERY_PLAN_USERS = max(QUERY_PLAN_ROWS // 20, 10)
+QUERY_PLAN_MECHANICS = max(QUERY_PLAN_ROWS // 400, 5)
+# tables which must never be read with a sequential scan on the hot paths
+HOT_TABLES = ("service_request", "service_comment", "order", "applied_coupon")
+
+
+def get_seq_scans(plan):
+    """
+    walks an EXPLAIN (FORMAT JSON) plan tree
+    :param plan: plan node
+    :return: list of hot tables read with a sequential scan
+    """
+    seq_scans = []
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in HOT_TABLES:
+        seq_scans.append(plan["Relation Name"])
+    for sub_plan in plan.get("Plans", []):
+        seq_scans.extend(get_seq_scans(sub_plan))
+    return seq_scans
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    loads a synthetic dataset, calls the hot endpoints and
+    checks the query plans of every query they run
+    Attributes:
+        client: Client object used for testing
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        bulk loads users, vehicles, mechanics, service requests,
+        comments, orders and applied coupons
+        :return: None
+        """
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            User(
+                id=i,
+                email=f"user{i}@example.com",
+                number=f"9{i:09d}",
+                password="password",
+                role=User.ROLE_CHOICES.USER,
+                created_on=now,
+            )
+            for i in range(1, QUERY_PLAN_USERS + 1)
+        )
+        mechanic_users = User.objects.bulk_create(
+            User(
+                id=QUERY_PLAN_USERS + i,
+                email=f"mechanic{i}@example.com",
+                number=f"8{i:09d}",
+                password="password",
+                role=User.ROLE_CHOICES.MECH,
+                created_on=now,
+            )
+            for i in range(1, QUERY_PLAN_MECHANICS + 1)
+        )
+        mechanics = Mechanic.objects.bulk_create(
+            Mechanic(id=i, mechanic_code=f"TRAC_{i}", user=user)
+            for i, user in enumerate(mechanic_users, start=1)
+        )
+        vehicle_model = VehicleModel.objects.create(
+            fuel_type=1,
+            model="NewModel",
+            vehicle_img="Image",
+            vehiclecompany=VehicleCompany.objects.create(name="RandomCompany"),
+        )
+        vehicles = Vehicle.objects.bulk_create(
+            Vehicle(
+                id=i,
+                pincode="1234",
+                vin=f"VIN{i:014d}",
+                year=2020,
+                status="ACTIVE",
+                owner=user,
+                vehicle_model=vehicle_model,
+            )
+            for i, user in enumerate(users, start=1)
+        )
+        service_requests = ServiceRequest.objects.bulk_create(
+            (
+                ServiceRequest(
+                    id=i,
+                    mechanic=mechanics[i % len(mechanics)],
+                    vehicle=vehicles[i % len(vehicles)],
+                    problem_details=f"Engine problem number {i}",
+                    created_on=now - timedelta(minutes=i),
+                )
+                for i in range(1, QUERY_PLAN_ROWS + 1)
+            ),
+            batch_size=5000,
+        )
+        ServiceComment.objects.bulk_create(
+            (
+                ServiceComment(
+                    service_request=service_request,
+                    comment=f"Comment {j} on {service_request.id}",
+                    created_on=now,
+                )
+                for service_request in service_requests
+                for j in range(2)
+            ),
+            batch_size=5000,
+        )
+        product = Product.objects.create(name="Seat", price=10, image_url="seat.svg")
+        Order.objects.bulk_create(
+            (
+                Order(
+                    id=i,
+                    user=users[i % len(users)],
+                    product=product,
+                    created_on=now,
+                )
+                for i in range(1, QUERY_PLAN_ROWS + 1)
+            ),
+            batch_size=5000,
+        )
+        AppliedCoupon.objects.bulk_create(
+            (
+                AppliedCoupon(user=user, coupon_code=f"TRAC{j:03d}")
+                for user in users
+                for j in range(5)
+            ),
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            # merge the GIN pending lists like autovacuum would on a live db
+            for index in ("service_request_search_idx", "service_comment_search_idx"):
+                cursor.execute("SELECT gin_clean_pending_list(%s::regclass)", [index])
+            for table in HOT_TABLES + ("mechanic", "vehicle_details", "user_login"):
+                cursor.execute(f'ANALYZE "{table}"')
+        cls.user = users[0]
+        cls.mechanic = mechanics[1]
+        cls.vehicle = vehicles[0]
+        cls.service_request = service_requests[0]
+
+    def setUp(self):
+        self.client = Client()
+        self.user_auth_headers = {"HTTP_AUTHORIZATION": "Bearer " + self.user.email}
+        self.mechanic_auth_headers = {
+            "HTTP_AUTHORIZATION": "Bearer " + self.mechanic.user.email
+        }
+
+    def assertNoSeqScans(self, method, path, auth_headers, **kwargs):
+        """
+        calls the endpoint and explains every query it ran on the default db
+        fails if any of the query plans reads a hot table sequentially
+        :return: None
+        """
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(path, **kwargs, **auth_headers)
+        self.assertLess(res.status_code, 500)
+        for query in queries.captured_queries:
+            if not query["sql"].lstrip().upper().startswith("SELECT"):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + query["sql"])
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            self.assertEqual(
+                get_seq_scans(plan[0]["Plan"]),
+                [],
+                "%s %s: %s" % (method.upper(), path, query["sql"]),
+            )
+
+    def test_mechanic_service_requests_plan(self):
+        self.assertNoSeqScans(
+            "get",
+            "/workshop/api/mechanic/service_requests",
+            self.mechanic_auth_headers,
+        )
+
+    def test_user_service_requests_plan(self):
+        self.assertNoSeqScans(
+            "get",
+            "/workshop/api/merchant/service_requests/%s" % self.vehicle.vin,
+            self.user_auth_headers,
+        )
+
+    def test_service_comments_plan(self):
+        self.assertNoSeqScans(
+            "get",
+            "/workshop/api/mechanic/service_request/%s/comment"
+            % self.service_request.id,
+            self.mechanic_auth_headers,
+        )
+
+    def test_search_service_requests_plan(self):
+        self.assertNoSeqScans(
+            "get",
+            "/workshop/api/mechanic/service_requests/search?q=engine",
+            self.mechanic_auth_headers,
+        )
+
+    def test_orders_plan(self):
+        self.assertNoSeqScans(
+            "get", "/workshop/api/shop/orders/all", self.user_auth_headers
+        )
+
+    def test_apply_coupon_plan(self):
+        self.assertNoSeqScans(
+            "post",
+            "/workshop/api/shop/apply_coupon",
+            self.user_auth_headers,
+            data={"coupon_code": "TRAC001", "amount": 75},
+            content_type="application/json",
+        )
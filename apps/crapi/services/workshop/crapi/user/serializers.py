@@ -18,6 +18,7 @@ contains all the serializers for User and Vehicle Objects
 from rest_framework import serializers
 
 from crapi.user.models import User, UserDetails, Vehicle
+from utils.row_serializers import RowSerializer
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -50,6 +51,14 @@ class UserDetailsSerializer(serializers.ModelSerializer):
         fields = ("user", "available_credit")
 
 
+class UserDetailsRowSerializer(RowSerializer):
+    """
+    Read only UserDetailsSerializer for the user list
+    """
+
+    serializer_class = UserDetailsSerializer
+
+
 class VehicleSerializer(serializers.ModelSerializer):
     """
     Serializer for Vehicle model
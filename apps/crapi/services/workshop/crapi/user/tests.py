@@ -25,6 +25,7 @@ from utils.mock_methods import (
 
 patch("utils.jwt.jwt_auth_required", mock_jwt_auth_required).start()
 
+import csv
 import logging
 import bcrypt
 import json
@@ -33,6 +34,7 @@ from django.utils import timezone
 from utils import messages
 from crapi_site import settings
 from crapi.user.models import User, UserDetails
+from utils.pagination import estimated_count
 
 logger = logging.getLogger("UserTest")
 MAX_USER_COUNT = 40
@@ -145,3 +147,124 @@ class UserDetailsTestCase(TestCase):
         """
         response = self.client.get("/workshop/api/management/users/all")
         self.assertEqual(response.status_code, 401)
+
+
+class AdminUserCountTestCase(TestCase):
+    """
+    contains the test cases related to counting and exporting user details
+    Attributes:
+        client: Client object used for testing
+        auth_headers: Auth headers for dummy admin user
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        creates an admin user and a few users with their details
+        :return: None
+        """
+        admin_data = get_sample_admin_user()
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=admin_data["email"],
+                    number=admin_data["number"],
+                    password="password",
+                    role=admin_data["role"],
+                    created_on=timezone.now(),
+                )
+            ]
+            + [
+                User(
+                    email="user%d@example.com" % i,
+                    number="90000000%02d" % i,
+                    password="password",
+                    role=User.ROLE_CHOICES.USER,
+                    created_on=timezone.now(),
+                )
+                for i in range(MAX_USER_COUNT)
+            ]
+        )
+        UserDetails.objects.bulk_create(
+            UserDetails(available_credit=100, name="User %d" % i, user=user)
+            for i, user in enumerate(users)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE user_details")
+
+    def setUp(self):
+        self.client = Client()
+        self.auth_headers = {
+            "HTTP_AUTHORIZATION": "Bearer " + get_sample_admin_user()["email"]
+        }
+
+    def test_estimated_count(self):
+        """
+        lowers the estimated count threshold below the number of users
+        should get the planner estimate and the next offset based on it
+        :return: None
+        """
+        self.assertEqual(estimated_count(UserDetails), MAX_USER_COUNT + 1)
+        with patch.object(settings, "ESTIMATED_COUNT_THRESHOLD", 0):
+            response = self.client.get(
+                "/workshop/api/management/users/all?limit=10", **self.auth_headers
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["count_is_estimated"])
+        self.assertEqual(response.json()["next_offset"], 10)
+        response = self.client.get(
+            "/workshop/api/management/users/all?limit=10&offset=40", **self.auth_headers
+        )
+        self.assertFalse(response.json()["count_is_estimated"])
+        self.assertIsNone(response.json()["next_offset"])
+
+    def test_count(self):
+        """
+        lists fewer users than there are with and without the estimate
+        should get the count of the table and not of the page
+        :return: None
+        """
+        response = self.client.get(
+            "/workshop/api/management/users/all?limit=10", **self.auth_headers
+        )
+        self.assertEqual(len(response.json()["users"]), 10)
+        self.assertEqual(response.json()["count"], MAX_USER_COUNT + 1)
+        self.assertFalse(response.json()["count_is_estimated"])
+        with patch.object(settings, "ESTIMATED_COUNT_THRESHOLD", 0):
+            response = self.client.get(
+                "/workshop/api/management/users/all?limit=10", **self.auth_headers
+            )
+        self.assertEqual(response.json()["count"], MAX_USER_COUNT + 1)
+        self.assertTrue(response.json()["count_is_estimated"])
+
+    def test_export_users(self):
+        """
+        tests the user details export api
+        should stream a csv with a row for every user
+        :return: None
+        """
+        with patch.object(settings, "EXPORT_CHUNK_SIZE", 7):
+            response = self.client.get(
+                "/workshop/api/management/users/export", **self.auth_headers
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            rows = list(
+                csv.reader(b"".join(response.streaming_content).decode().splitlines())
+            )
+        self.assertEqual(rows[0][:3], ["id", "email", "number"])
+        self.assertEqual(len(rows), MAX_USER_COUNT + 2)
+        self.assertEqual(rows[1][1], get_sample_admin_user()["email"])
+
+    def test_export_users_not_admin(self):
+        """
+        exports the user details as a user who is not an admin
+        should get a forbidden response
+        :return: None
+        """
+        response = self.client.get(
+            "/workshop/api/management/users/export",
+            HTTP_AUTHORIZATION="Bearer user0@example.com",
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["message"], messages.RESTRICTED)
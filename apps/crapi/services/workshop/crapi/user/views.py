@@ -15,24 +15,27 @@
 """
 contains all the views related to Merchant
 """
+import csv
 import logging
 import requests
+from django.http import StreamingHttpResponse
 from requests.exceptions import MissingSchema, InvalidURL
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from crapi.user.serializers import UserDetailsSerializer
+from crapi.user.serializers import UserDetailsRowSerializer
 from crapi.user.models import User, UserDetails
 from crapi_site import settings
 from utils.jwt import jwt_auth_required
 from utils import messages
 from utils.logging import log_error
-from rest_framework.pagination import LimitOffsetPagination
+from utils.pagination import EstimatedCountPagination
+from utils.row_serializers import Fieldset, InvalidFieldset
 
 logger = logging.getLogger()
 
 
-class AdminUserView(APIView, LimitOffsetPagination):
+class AdminUserView(APIView, EstimatedCountPagination):
     """
     View for admin user to fetch user details
     """
@@ -49,14 +52,23 @@ class AdminUserView(APIView, LimitOffsetPagination):
             user details and 200 status if no error
             message and corresponding status if error
         """
-        # Sort by id
-        userdetails = UserDetails.objects.all().order_by("id")
-        if not userdetails:
+        fieldset = Fieldset.from_request(request)
+        try:
+            # Sort by id
+            userdetails = UserDetailsRowSerializer.values(
+                UserDetails.objects.order_by("id"), fieldset
+            )
+        except InvalidFieldset as e:
+            return Response(
+                {"message": messages.INVALID_FIELDS.format(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not userdetails.exists():
             return Response(
                 {"message": messages.NO_USER_DETAILS}, status=status.HTTP_404_NOT_FOUND
             )
         paginated = self.paginate_queryset(userdetails, request)
-        serializer = UserDetailsSerializer(paginated, many=True)
+        serializer = UserDetailsRowSerializer(paginated, fieldset)
         response_data = dict(
             users=serializer.data,
             next_offset=(
@@ -67,6 +79,65 @@ class AdminUserView(APIView, LimitOffsetPagination):
             previous_offset=(
                 self.offset - self.limit if self.offset - self.limit >= 0 else None
             ),
-            count=self.get_count(paginated),
+            count=self.count,
+            count_is_estimated=self.count_is_estimated,
         )
         return Response(response_data, status=status.HTTP_200_OK)
+
+
+class Echo:
+    """
+    file like object which returns what is written to it
+    used to stream the rows written by csv.writer
+    """
+
+    def write(self, value):
+        return value
+
+
+class AdminUserExportView(APIView):
+    """
+    View for admin user to export user details
+    """
+
+    EXPORT_FIELDS = (
+        "id",
+        "user__email",
+        "user__number",
+        "name",
+        "status",
+        "available_credit",
+    )
+
+    @jwt_auth_required
+    def get(self, request, user=None):
+        """
+        Admin user view to export all user details as csv
+        rows are read from the database in chunks while the response is sent
+        :param request: http request for the view
+            method allowed: GET
+            http request should be authorised by the jwt token of an admin
+            mandatory fields: []
+        :returns StreamingHttpResponse object with the csv file
+            message and 403 status if the user is not an admin
+        """
+        if user.role != User.ROLE_CHOICES.ADMIN:
+            return Response(
+                {"message": messages.RESTRICTED}, status=status.HTTP_403_FORBIDDEN
+            )
+        rows = (
+            UserDetails.objects.order_by("id")
+            .values_list(*self.EXPORT_FIELDS)
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        )
+        writer = csv.writer(Echo())
+        header = [field.split("__")[-1] for field in self.EXPORT_FIELDS]
+
+        def stream():
+            yield writer.writerow(header)
+            for row in rows:
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(stream(), content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="users.csv"'
+        return response
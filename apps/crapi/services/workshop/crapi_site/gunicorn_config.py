@@ -0,0 +1,213 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Gunicorn configuration of the workshop service
+
+    gunicorn -c python:crapi_site.gunicorn_config crapi_site.wsgi
+
+Workers and threads are sized from the CPUs and the memory available to the
+container unless GUNICORN_WORKERS and GUNICORN_THREADS are set.
+The application is loaded once in the master and shared copy-on-write by the
+workers, the hooks below make sure no connection, thread or lock of the
+master is used by a worker.
+GUNICORN_WORKER_CLASS=gevent switches to gevent workers, which needs
+gevent and psycogreen installed.
+The database pool of every worker is sized so all the workers together hold
+at most DB_CONNECTION_BUDGET connections unless DB_POOL_MAX_SIZE is set
+"""
+import importlib
+import importlib.util
+import os
+import sys
+
+# memory a worker is expected to use, bounds the number of workers
+WORKER_MEMORY = int(os.environ.get("GUNICORN_WORKER_MEMORY_MB", 256)) * 1024 * 1024
+MAX_WORKERS = int(os.environ.get("GUNICORN_MAX_WORKERS", 16))
+# database connections all the workers may hold at once, split evenly
+# between them. Postgres allows 100 connections by default and is shared
+# with the identity service, keep the budget under what is left of them
+DB_CONNECTION_BUDGET = int(os.environ.get("DB_CONNECTION_BUDGET", 50))
+# modules the views import on first use, imported once by the master instead
+# of by every worker when the app is preloaded
+PRELOAD_MODULES = ("xhtml2pdf.pisa",)
+
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def get_cpu_count():
+    """
+    :return: number of CPUs the process may use, taking the cgroup quota
+        of the container into account
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota, period = None, None
+    cpu_max = read_file("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, period = cpu_max.split()[:2]
+    else:
+        quota = read_file("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = read_file("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and quota not in ("max", "-1"):
+        cpus = min(cpus, max(1, int(quota) // int(period)))
+    return cpus
+
+
+def get_memory():
+    """
+    :return: bytes of memory available to the container
+    """
+    memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    limit = read_file("/sys/fs/cgroup/memory.max") or read_file(
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+    )
+    if limit and limit.isdigit():
+        memory = min(memory, int(limit))
+    return memory
+
+
+def get_workers(cpus, memory, worker_memory=WORKER_MEMORY, max_workers=MAX_WORKERS):
+    """
+    :param cpus: available CPUs
+    :param memory: available bytes of memory
+    :param worker_memory: bytes of memory used by a worker
+    :param max_workers: upper bound of the workers
+    :return: 2 workers per CPU plus one, as many as fit in the memory
+    """
+    return max(1, min(2 * cpus + 1, memory // worker_memory, max_workers))
+
+
+def get_pool_size(concurrency, workers, budget=DB_CONNECTION_BUDGET):
+    """
+    :param concurrency: requests a worker runs at once
+    :param workers: number of workers
+    :param budget: database connections of all the workers together
+    :return: connections of the pool of a worker, a worker never needs more
+        than it runs requests at once nor gets more than its share of the budget
+    """
+    return max(1, min(concurrency, budget // workers))
+
+
+def get_log_level():
+    return os.environ.get("LOG_LEVEL", "info").lower()
+
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class == "gevent" and importlib.util.find_spec("psycogreen") is None:
+    # psycopg would block every greenlet of the worker on each query
+    raise RuntimeError("gevent workers need psycogreen, pip install psycogreen")
+
+workers = int(os.environ.get("GUNICORN_WORKERS", 0)) or get_workers(
+    get_cpu_count(), get_memory()
+)
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# concurrent requests of a gevent worker
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 100))
+bind = f"0.0.0.0:{os.environ.get('SERVER_PORT', 8000)}"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# recycles the workers to contain slow memory leaks, 0 disables it
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("true", "1")
+loglevel = get_log_level()
+
+os.environ.setdefault(
+    "DB_POOL_MAX_SIZE",
+    str(
+        get_pool_size(
+            worker_connections if worker_class == "gevent" else threads, workers
+        )
+    ),
+)
+
+
+def when_ready(server):
+    if preload_app:
+        for module in PRELOAD_MODULES:
+            importlib.import_module(module)
+
+
+def pre_fork(server, worker):
+    # connections opened while preloading would be shared with the worker
+    if "django.db" in sys.modules:
+        from django.db import connections
+
+        from core.db.pool import close_pools
+
+        connections.close_all()
+        close_pools()
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
+    # the modules below are only loaded here when the app was preloaded
+    if "django.db" in sys.modules:
+        from django.db import connections
+
+        for connection in connections.all(initialized_only=True):
+            # dropped without closing, closing would end the session of the master
+            connection.connection = None
+    if "utils.retry" in sys.modules:
+        sys.modules["utils.retry"].reset_after_fork()
+    if "utils.logging" in sys.modules:
+        restart_log_listeners()
+
+
+def post_worker_init(worker):
+    # started once the worker is initialized, gevent has patched threading by then
+    from core.health import prober
+
+    prober.start()
+
+
+def restart_log_listeners():
+    import logging
+
+    from utils.logging import QueueHandler
+
+    loggers = [logging.getLogger()] + [
+        logger
+        for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    handlers = {
+        handler
+        for logger in loggers
+        for handler in logger.handlers
+        if isinstance(handler, QueueHandler)
+    }
+    for handler in handlers:
+        handler.restart_listener()
+
+
+def child_exit(server, worker):
+    # drops the live gauges of the worker from the aggregated metrics
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -31,6 +31,13 @@ from django.core.exceptions import ImproperlyConfigured
 DEFAULT_LIMIT = 10
 DEFAULT_OFFSET = 0
 MAX_LIMIT = 100
+# Unfiltered tables with more rows than this are counted from the planner estimate
+ESTIMATED_COUNT_THRESHOLD = int(os.environ.get("ESTIMATED_COUNT_THRESHOLD", 1000000))
+# Number of rows fetched per round trip by the streaming exports
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+# Requests slower than this many seconds are logged with their slowest queries
+SLOW_REQUEST_THRESHOLD = float(os.environ.get("SLOW_REQUEST_THRESHOLD", 1))
+SLOW_REQUEST_TOP_QUERIES = int(os.environ.get("SLOW_REQUEST_TOP_QUERIES", 5))
 
 
 def get_env_value(env_variable):
@@ -67,6 +74,23 @@ API_GATEWAY_URL = get_env_value("API_GATEWAY_URL")
 API_GATEWAY_USERNAME = "vendorcrapi"
 API_GATEWAY_PASSWORD = "Pa$$4Vendor_1"
 
+# Retry policy and circuit breaker for the contact mechanic upstream calls
+MECHANIC_API_TIMEOUT = float(os.environ.get("MECHANIC_API_TIMEOUT", 10))
+MECHANIC_API_DEADLINE = float(os.environ.get("MECHANIC_API_DEADLINE", 30))
+MECHANIC_API_BACKOFF_BASE = float(os.environ.get("MECHANIC_API_BACKOFF_BASE", 0.1))
+MECHANIC_API_BACKOFF_MAX = float(os.environ.get("MECHANIC_API_BACKOFF_MAX", 2))
+MECHANIC_API_CIRCUIT_FAILURES = int(os.environ.get("MECHANIC_API_CIRCUIT_FAILURES", 5))
+MECHANIC_API_CIRCUIT_RESET = float(os.environ.get("MECHANIC_API_CIRCUIT_RESET", 30))
+# Send a hedged request after this many seconds, 0 disables hedging
+MECHANIC_API_HEDGE_AFTER = float(os.environ.get("MECHANIC_API_HEDGE_AFTER", 0))
+# Upper bound and read size of the mechanic api response bodies in bytes
+MECHANIC_API_MAX_RESPONSE_SIZE = int(
+    os.environ.get("MECHANIC_API_MAX_RESPONSE_SIZE", 5 * 1024 * 1024)
+)
+MECHANIC_API_CHUNK_SIZE = int(os.environ.get("MECHANIC_API_CHUNK_SIZE", 64 * 1024))
+# Upper bound of the time to live of cached mechanic api responses in seconds
+MECHANIC_API_CACHE_TTL = int(os.environ.get("MECHANIC_API_CACHE_TTL", 10))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -76,6 +100,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "corsheaders",
     "health_check",
     "health_check.db",
@@ -87,6 +112,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestTimingMiddleware",
+    "core.middleware.CompressionMiddleware",
+    "core.middleware.AdmissionControlMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -127,54 +156,61 @@ WSGI_APPLICATION = "crapi_site.wsgi.application"
 
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "utils.renderers.ORJSONRenderer",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": MAX_LIMIT,
     "DEFAULT_FILTER_BACKENDS": ("django_filters.rest_framework.DjangoFilterBackend",),
     "UNAUTHENTICATED_USER": None,  # Needed once you disable django.contrib.auth
 }
+# Logging goes through utils.logging.QueueHandler, records are written
+# as JSON lines by a background thread
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_MAX_FIELD_LENGTH = int(os.environ.get("LOG_MAX_FIELD_LENGTH", 1024))
+# records per second and burst allowed per logger
+LOG_RATE_LIMIT = float(os.environ.get("LOG_RATE_LIMIT", 100))
+LOG_RATE_BURST = int(os.environ.get("LOG_RATE_BURST", 200))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "formatters": {
-        "standard": {"format": "%(asctime)s %(name)-12s [%(levelname)s]: %(message)s"},
-        "console": {"format": "%(name)-12s %(levelname)-8s %(message)s"},
+    "filters": {
+        "sampling": {
+            "()": "utils.logging.SamplingFilter",
+            # fraction of the records below WARNING which are kept
+            "rates": {"django.db.backends": 0.01, "djongo": 0.1},
+        },
+        "rate_limit": {
+            "()": "utils.logging.RateLimitFilter",
+            "rate": LOG_RATE_LIMIT,
+            "burst": LOG_RATE_BURST,
+        },
     },
     "handlers": {
-        "file": {
+        "queue": {
+            "()": "utils.logging.QueueHandler",
             "level": LOG_LEVEL,
-            "class": "logging.FileHandler",
             "filename": BASE_DIR + "/debug.log",
-            "formatter": "standard",
-        },
-        "console": {
-            "level": LOG_LEVEL,
-            "class": "logging.StreamHandler",
-            "formatter": "console",
+            "maxsize": LOG_QUEUE_SIZE,
+            "max_length": LOG_MAX_FIELD_LENGTH,
+            "filters": ["sampling", "rate_limit"],
         },
     },
     "root": {
-        "handlers": ["file", "console"],
-        "level": LOG_LEVEL,
-    },
-    "django.request": {
-        "handlers": ["file"],
-        "level": LOG_LEVEL,
-    },
-    "djongo": {
+        "handlers": ["queue"],
         "level": LOG_LEVEL,
-        "handlers": ["console"],
-        "propogate": True,
     },
 }
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Set when the workshop connects through PgBouncer in transaction pooling mode
+DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "false").lower() in ("true", "1")
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.pooled_postgresql",
         "NAME": get_env_value("DB_NAME"),
         "USER": get_env_value("DB_USER"),
         "PASSWORD": get_env_value("DB_PASSWORD"),
@@ -184,7 +220,17 @@ DATABASES = {
             "NAME": "test_crapi",
             "USER": get_env_value("DB_USER"),
         },
+        # connections are returned to the pool at the end of every request
         "CONN_MAX_AGE": 0,
+        "POOL": {
+            "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", 20)),
+            "TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            "MAX_IDLE": float(os.environ.get("DB_POOL_MAX_IDLE", 300)),
+            "MAX_LIFETIME": float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+            "CHECK_INTERVAL": float(os.environ.get("DB_POOL_CHECK_INTERVAL", 30)),
+        },
+        # transaction pooling does not keep cursors open across transactions
+        "DISABLE_SERVER_SIDE_CURSORS": DB_PGBOUNCER,
     },
     "mongodb": {
         "ENGINE": "djongo",
@@ -200,6 +246,164 @@ DATABASES = {
     },
 }
 
+# Pool of the pymongo client reading the coupons, see crapi.shop.coupons
+MONGO_POOL_MAX_SIZE = int(os.environ.get("MONGO_POOL_MAX_SIZE", 20))
+# seconds to wait for mongo before a coupon lookup fails
+MONGO_TIMEOUT = float(os.environ.get("MONGO_TIMEOUT", 5))
+
+# seconds the cached data of the read heavy views is kept at most, see
+# utils.view_cache, changes through the models invalidate it before
+VIEW_CACHE_TTL = int(os.environ.get("VIEW_CACHE_TTL", 60))
+# VIEW_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache with
+# VIEW_CACHE_LOCATION=redis://host:6379 shares it between the workers
+VIEW_CACHE_BACKEND = os.environ.get(
+    "VIEW_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "views": {
+        "BACKEND": VIEW_CACHE_BACKEND,
+        "LOCATION": os.environ.get("VIEW_CACHE_LOCATION", "workshop-views"),
+        "TIMEOUT": VIEW_CACHE_TTL,
+    },
+}
+if VIEW_CACHE_BACKEND.endswith("LocMemCache"):
+    CACHES["views"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.environ.get("VIEW_CACHE_MAX_ENTRIES", 5000))
+    }
+
+# response bodies smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+# bytes of compressed response variants kept per process
+COMPRESSION_CACHE_SIZE = int(os.environ.get("COMPRESSION_CACHE_SIZE", 16 * 1024 * 1024))
+# views whose responses repeat, their compressed variants are cached
+COMPRESSION_CACHE_VIEWS = [
+    "crapi.shop.views.ProductView",
+    "crapi.mechanic.views.MechanicView",
+]
+# compressed besides the text/* responses
+COMPRESSION_CONTENT_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# limits the rate and the concurrency of the expensive views, see
+# utils.admission, the limits hold per worker process
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "true").lower() in ("true", "1")
+# proxies in front of the service appending to X-Forwarded-For, the client
+# of a request without a token is the address the outermost one saw, 0 to
+# use the address of the connection when the service is reached directly
+ADMISSION_TRUSTED_PROXIES = int(os.environ.get("ADMISSION_TRUSTED_PROXIES", 1))
+# seconds a request waits for a slot of its view before it gets a 503
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 2))
+# concurrency: requests of the view running at once, queue: requests waiting
+# for a slot, rate and burst: token bucket of all the requests of the view,
+# user_rate and user_burst: token bucket of every client
+ADMISSION_LIMITS = {
+    "crapi.mechanic.views.GetReportView": {
+        "concurrency": 2,
+        "queue": 4,
+        "user_rate": 2,
+        "user_burst": 10,
+    },
+    "crapi.merchant.views.ContactMechanicView": {
+        "concurrency": 2,
+        "queue": 4,
+        "user_rate": 2,
+        "user_burst": 10,
+    },
+    "crapi.mechanic.views.SignUpView": {
+        "concurrency": 2,
+        "queue": 8,
+        "rate": 20,
+        "burst": 40,
+        "user_rate": 1,
+        "user_burst": 10,
+    },
+}
+
+# seconds a request waits for the render of the same service report by
+# another request before it gets a 503
+SERVICE_REPORT_WAIT_TIMEOUT = float(os.environ.get("SERVICE_REPORT_WAIT_TIMEOUT", 20))
+
+# seconds the responses of the requests sent with an Idempotency-Key are
+# replayed, see utils.idempotency
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+# seconds after which the key of a request which never finished is dropped
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+# seconds a retry waits for the response of the request holding its key
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get("IDEMPOTENCY_WAIT_TIMEOUT", 10))
+# seconds between two deletions of the expired keys by a process
+IDEMPOTENCY_PURGE_INTERVAL = int(os.environ.get("IDEMPOTENCY_PURGE_INTERVAL", 60))
+
+# seconds between two background health checks of the dependencies, see core.health
+HEALTH_CHECK_INTERVAL = float(os.environ.get("HEALTH_CHECK_INTERVAL", 10))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get("HEALTH_CHECK_TIMEOUT", 3))
+# results older than this are reported down, the prober is stuck
+HEALTH_CHECK_MAX_AGE = float(
+    os.environ.get(
+        "HEALTH_CHECK_MAX_AGE", 3 * HEALTH_CHECK_INTERVAL + HEALTH_CHECK_TIMEOUT
+    )
+)
+# dependencies which must be up for the service to be ready, the others are
+# only reported, most views work without identity and mongodb so a deployment
+# opts in to them with HEALTH_CHECK_REQUIRED=database,identity,mongodb
+HEALTH_CHECK_REQUIRED = [
+    name.strip()
+    for name in os.environ.get("HEALTH_CHECK_REQUIRED", "database").split(",")
+    if name.strip()
+]
+
+# Read replicas of the default database, comma separated host[:port] reached
+# with the credentials of the primary, see core.db.router
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+# seconds a client keeps reading from the primary after its own writes
+DB_REPLICA_PIN_SECONDS = float(os.environ.get("DB_REPLICA_PIN_SECONDS", 5))
+# replicas lagging more than this many seconds are not read from
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 2))
+DB_REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_LAG_CHECK_INTERVAL", 5))
+# seconds to wait for a replica to accept a connection, the lag check runs on
+# the request thread which then falls back to the primary if it is down
+DB_REPLICA_CONNECT_TIMEOUT = int(os.environ.get("DB_REPLICA_CONNECT_TIMEOUT", 2))
+
+
+def get_replica_databases(default, replicas, connect_timeout):
+    """
+    builds the DATABASES entries of the read replicas
+    :param default: DATABASES entry of the primary
+    :param replicas: host[:port] of every replica
+    :param connect_timeout: seconds to wait for a replica connection
+    :return: dict of the replica aliases and their settings
+    """
+    databases = {}
+    for index, replica in enumerate(replicas, 1):
+        host, _, port = replica.partition(":")
+        databases[f"replica_{index}"] = {
+            **default,
+            "HOST": host,
+            "PORT": port or default["PORT"],
+            "OPTIONS": {
+                **default.get("OPTIONS", {}),
+                "connect_timeout": connect_timeout,
+            },
+            "TEST": {"MIRROR": "default"},
+        }
+    return databases
+
+
+DATABASES.update(
+    get_replica_databases(
+        DATABASES["default"], DB_REPLICA_HOSTS, DB_REPLICA_CONNECT_TIMEOUT
+    )
+)
+DATABASE_ROUTERS = ["core.db.router.ReplicaRouter"]
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,111 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the gunicorn configuration
+"""
+import importlib
+import json
+import logging
+import os
+import tempfile
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from utils.logging import QueueHandler
+
+
+class GunicornConfigTestCase(SimpleTestCase):
+    """
+    contains the test cases related to the gunicorn configuration
+    """
+
+    def setUp(self):
+        # the module sets the default pool size of the process on import
+        with patch.dict(os.environ):
+            self.config = importlib.import_module("crapi_site.gunicorn_config")
+
+    def test_get_workers(self):
+        """
+        sizes the workers of machines short of CPUs, of memory or of neither
+        should get 2 workers per CPU plus one as long as they fit in the memory
+        :return: None
+        """
+        mb = 1024 * 1024
+        get_workers = self.config.get_workers
+        self.assertEqual(get_workers(1, 4096 * mb, 256 * mb, 16), 3)
+        self.assertEqual(get_workers(4, 1024 * mb, 256 * mb, 16), 4)
+        self.assertEqual(get_workers(32, 64000 * mb, 256 * mb, 16), 16)
+        self.assertEqual(get_workers(2, 100 * mb, 256 * mb, 16), 1)
+
+    def test_get_pool_size(self):
+        """
+        sizes the pools of gevent and threaded workers against the budget
+        should give each worker its share of the budget, at most its concurrency
+        :return: None
+        """
+        get_pool_size = self.config.get_pool_size
+        self.assertEqual(get_pool_size(100, 16, 50), 3)
+        self.assertEqual(get_pool_size(100, 2, 50), 25)
+        self.assertEqual(get_pool_size(4, 3, 50), 4)
+        self.assertEqual(get_pool_size(4, 100, 50), 1)
+
+    def test_post_fork(self):
+        """
+        runs the post fork hook in a process with a database connection
+        should drop the connection without closing it and reset the hedge
+        threads and the log listeners
+        :return: None
+        """
+        import utils.retry
+
+        inherited = type("Connection", (), {"connection": object()})()
+        utils.retry.get_hedge_executor()
+        with patch("django.db.connections.all", return_value=[inherited]), patch.object(
+            QueueHandler, "restart_listener"
+        ) as restart_listener:
+            self.config.post_fork(None, None)
+        self.assertIsNone(inherited.connection)
+        self.assertIsNone(utils.retry._hedge_executor)
+        restart_listener.assert_called()
+
+    def test_restart_listener(self):
+        """
+        logs through a handler whose listener thread did not survive a fork
+        should write the records logged after the restart
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "debug.log")
+            handler = QueueHandler(filename=filename, console=False)
+            handler.stop_listener()
+            handler.restart_listener()
+            handler.handle(
+                logging.LogRecord(
+                    "crapi", logging.INFO, __file__, 0, "after fork", (), None
+                )
+            )
+            handler.close()
+            with open(filename) as f:
+                self.assertEqual(json.loads(f.read())["message"], "after fork")
+
+    def test_child_exit(self):
+        """
+        runs the child exit hook with multiprocess metrics
+        should mark the worker dead for the live gauges
+        :return: None
+        """
+        worker = type("Worker", (), {"pid": 1234})
+        with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": "/tmp"}), patch(
+            "prometheus_client.multiprocess.mark_process_dead"
+        ) as mark_process_dead:
+            self.config.child_exit(None, worker)
+        mark_process_dead.assert_called_once_with(1234)
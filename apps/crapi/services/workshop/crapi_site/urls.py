@@ -31,8 +31,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import liveness_view, metrics_view, readiness_view
+
 urlpatterns = [
     path("workshop/admin/", admin.site.urls),
-    path("workshop/health_check/", include("health_check.urls")),
+    path("workshop/health_check/", readiness_view),
+    path("workshop/health_check/live", liveness_view),
+    path("workshop/health_check/ready", readiness_view),
+    path("workshop/metrics", metrics_view),
     path("workshop/", include("crapi.urls")),
 ]
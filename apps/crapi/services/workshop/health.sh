@@ -3,4 +3,5 @@ SCHEME="http"
 if [ "$TLS_ENABLED" = "true" ] || [ "$TLS_ENABLED" = "1" ]; then
   SCHEME="https"
 fi
-curl -k $SCHEME://0.0.0.0:${SERVER_PORT:-8000}/workshop/health_check/
+# served from the results of the background health checks, see core/health.py
+curl -fsk $SCHEME://0.0.0.0:${SERVER_PORT:-8000}/workshop/health_check/ready
@@ -16,24 +16,20 @@
 # Get script directory
 DIR="$( cd "$( dirname "$0" )" >/dev/null 2>&1 && pwd )"
 
-# Load the data
-echo "Check Django models"
-python3 manage.py migrate
-
-python3 manage.py check &&\
-python3 manage.py health_check
+# Migrate, check and seed the database, migrate is skipped when the
+# migrations did not change since the last start
+python3 manage.py startup
 if [ $? -ne 0 ]; then
-  echo "Django database check failed. Exiting."
+  echo "Django database startup failed. Exiting."
   exit 1
 fi
 
-echo "Seeding the database"
-python3 manage.py seed_database
-if [ $? -ne 0 ]; then
-  echo "Django database seeding failed. Exiting."
-  exit 1
-fi
+# Every gunicorn worker writes its metrics to this directory
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/workshop_metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 
+# Workers and threads are sized in crapi_site/gunicorn_config.py
 echo "Starting Django server"
 if [ "$TLS_ENABLED" = "true" ] || [ "$TLS_ENABLED" = "1" ]; then
   echo "TLS is ENABLED"
@@ -47,9 +43,9 @@ if [ "$TLS_ENABLED" = "true" ] || [ "$TLS_ENABLED" = "1" ]; then
   echo "TLS_CERTIFICATE: $TLS_CERTIFICATE"
   echo "TLS_KEY: $TLS_KEY"
   # python3 manage.py runserver_plus --cert-file $TLS_CERTIFICATE --key-file $TLS_KEY --noreload 0.0.0.0:${SERVER_PORT}
-  gunicorn --workers=1 --threads=20  --timeout 60 --bind 0.0.0.0:${SERVER_PORT} --certfile $TLS_CERTIFICATE --keyfile $TLS_KEY --log-level=debug crapi_site.wsgi
+  gunicorn --config python:crapi_site.gunicorn_config --certfile $TLS_CERTIFICATE --keyfile $TLS_KEY crapi_site.wsgi
 else
   echo "TLS is DISABLED"
   # python3 manage.py runserver 0.0.0.0:${SERVER_PORT} --noreload
-  gunicorn --workers=1 --threads=20  --timeout 60 --bind 0.0.0.0:${SERVER_PORT} --log-level=debug crapi_site.wsgi
+  gunicorn --config python:crapi_site.gunicorn_config crapi_site.wsgi
 fi
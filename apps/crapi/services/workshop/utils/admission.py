@@ -0,0 +1,203 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the admission control of the expensive views used by the
+AdmissionControlMiddleware
+A view gets token buckets limiting the rate of its requests per client and
+in total and a limit of the requests it runs at once, the requests over
+the limit wait in a bounded queue until a slot frees up or their deadline
+passes. The limits hold per process, every worker has its own
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from crapi_site import settings
+
+# clients whose token buckets are kept per view, the least recently seen
+# are dropped first, which gives them a full bucket again
+MAX_CLIENTS = 10000
+
+
+class Rejected(Exception):
+    """
+    raised when a request is not admitted
+    Attributes:
+        status: http status of the response
+        reason: reason of the rejection, label of the metrics
+        retry_after: seconds after which the client may retry
+    """
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled with rate tokens per second up to burst tokens
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now=None):
+        """
+        :param now: time.monotonic() of the request
+        :return: 0 if a token was taken, else the seconds until one is available
+        """
+        now = time.monotonic() if now is None else now
+        if now > self.updated:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets by client, the least recently used ones are dropped
+    once there are more than max_clients
+    """
+
+    def __init__(self, rate, burst, max_clients=MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, client, now=None):
+        """
+        :param client: key of the client
+        :param now: time.monotonic() of the request
+        :return: 0 if a token was taken, else the seconds until one is available
+        """
+        with self.lock:
+            bucket = self.buckets.pop(client, None)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+            self.buckets[client] = bucket
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+            return bucket.take(now)
+
+
+class ConcurrencyLimiter:
+    """
+    Lets at most limit requests run at once, at most queue_size more
+    wait up to timeout seconds for a slot, in the order they arrived
+    """
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        takes a slot, waiting for one if they are all taken
+        :return: True if the request had to wait
+        :raises: Rejected if the queue is full or the deadline passed
+        """
+        with self.condition:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return False
+            if self.waiting >= self.queue_size:
+                raise Rejected(503, "queue_full", self.timeout)
+            self.waiting += 1
+            try:
+                if not self.condition.wait_for(
+                    lambda: self.active < self.limit, self.timeout
+                ):
+                    raise Rejected(503, "queue_timeout", self.timeout)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+
+class ViewAdmission:
+    """
+    Admission of the requests of one view
+    Attributes:
+        client_rate: RateLimiter of every client, None if unlimited
+        rate: TokenBucket of all the requests, None if unlimited
+        concurrency: ConcurrencyLimiter, None if unlimited
+    """
+
+    def __init__(
+        self,
+        concurrency=None,
+        queue=0,
+        queue_timeout=None,
+        rate=None,
+        burst=None,
+        user_rate=None,
+        user_burst=None,
+    ):
+        self.client_rate = None
+        if user_rate:
+            self.client_rate = RateLimiter(user_rate, user_burst or 1)
+        self.rate = TokenBucket(rate, burst or 1) if rate else None
+        self.rate_lock = threading.Lock()
+        self.concurrency = None
+        if concurrency:
+            if queue_timeout is None:
+                queue_timeout = settings.ADMISSION_QUEUE_TIMEOUT
+            self.concurrency = ConcurrencyLimiter(concurrency, queue, queue_timeout)
+
+    def admit(self, client):
+        """
+        :param client: key of the client sending the request
+        :return: True if the request had to wait for a slot
+        :raises: Rejected with a 429 if the client is over its rate,
+            a 503 if the view is over its rate or its concurrency
+        """
+        if self.client_rate is not None:
+            wait = self.client_rate.take(client)
+            if wait:
+                raise Rejected(429, "user_rate", wait)
+        if self.rate is not None:
+            with self.rate_lock:
+                wait = self.rate.take()
+            if wait:
+                raise Rejected(503, "rate", wait)
+        if self.concurrency is None:
+            return False
+        return self.concurrency.acquire()
+
+    def release(self):
+        if self.concurrency is not None:
+            self.concurrency.release()
@@ -0,0 +1,148 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the response body compression used by the CompressionMiddleware
+gzip is always available, brotli is used when the brotli package
+is installed and the client accepts it
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+IDENTITY = "identity"
+GZIP_LEVEL = 6
+# quality 11 takes more than ten times longer for a few percent less
+BROTLI_QUALITY = 5
+
+
+def get_encodings():
+    """
+    :return: encodings this process can compress with, preferred first
+    """
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def parse_accept_encoding(header):
+    """
+    :param header: value of the Accept-Encoding header
+    :return: (set of the encodings the client accepts, set of the ones
+        it refuses with q=0)
+    """
+    accepted, refused = set(), set()
+    for item in header.split(","):
+        encoding, _, params = item.partition(";")
+        encoding = encoding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if encoding:
+            (accepted if quality > 0 else refused).add(encoding)
+    return accepted, refused
+
+
+def choose_encoding(header):
+    """
+    :param header: value of the Accept-Encoding header
+    :return: encoding to compress the response with, None if the client
+        accepts none of the available ones
+    """
+    accepted, refused = parse_accept_encoding(header)
+    for encoding in get_encodings():
+        # * only stands for the encodings which are not named
+        if encoding in accepted or ("*" in accepted and encoding not in refused):
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    """
+    :param body: bytes to compress
+    :param encoding: GZIP or BROTLI
+    :return: compressed bytes
+    """
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # no timestamp, so the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressedCache:
+    """
+    LRU cache of the compressed variants of response bodies, keyed by
+    the digest of the body so a variant is only served for the same bytes
+    Attributes:
+        max_size: total bytes of the compressed variants kept
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.variants = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_key(self, body, encoding):
+        return encoding, hashlib.sha256(body).digest()
+
+    def get(self, key):
+        with self.lock:
+            compressed = self.variants.get(key)
+            if compressed is not None:
+                self.variants.move_to_end(key)
+            return compressed
+
+    def set(self, key, compressed):
+        if len(compressed) > self.max_size:
+            return
+        with self.lock:
+            previous = self.variants.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.variants[key] = compressed
+            self.size += len(compressed)
+            while self.size > self.max_size:
+                key, evicted = self.variants.popitem(last=False)
+                self.size -= len(evicted)
+
+    def compress(self, body, encoding):
+        """
+        :param body: bytes to compress
+        :param encoding: GZIP or BROTLI
+        :return: (compressed bytes, True if they were cached)
+        """
+        key = self.get_key(body, encoding)
+        compressed = self.get(key)
+        if compressed is not None:
+            return compressed, True
+        compressed = compress(body, encoding)
+        self.set(key, compressed)
+        return compressed, False
+
+    def clear(self):
+        with self.lock:
+            self.variants.clear()
+            self.size = 0
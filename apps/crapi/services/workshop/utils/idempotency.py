@@ -0,0 +1,203 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the idempotent decorator of the write views the clients retry
+The first request sent with an Idempotency-Key header claims the key and
+its response is stored, the retries with the same key get that response
+back without running the view again and the ones arriving while the first
+request runs wait for its response. Responses are kept IDEMPOTENCY_KEY_TTL
+seconds, the claim of a request which never finished is dropped after
+IDEMPOTENCY_LOCK_TIMEOUT seconds
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from crapi.shop.models import IdempotencyKey
+from crapi_site import settings
+from utils import messages, metrics
+
+logger = logging.getLogger()
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# seconds between two reads of a key claimed by a running request
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+# expired keys deleted at once
+PURGE_BATCH_SIZE = 1000
+
+_last_purge = 0
+
+
+def get_key(scope, user, header):
+    """
+    :param scope: name of the endpoint
+    :param user: User object of the requesting user
+    :param header: value of the Idempotency-Key header
+    :return: key of the request in the store, users never share keys
+    """
+    key = json.dumps([scope, user.id, header]).encode("utf-8")
+    return hashlib.sha256(key).hexdigest()
+
+
+def get_fingerprint(request):
+    """
+    :param request: http request
+    :return: digest of the method, path and body of the request
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.get_full_path()}\n".encode("utf-8"))
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim(key, fingerprint):
+    """
+    :param key: key returned by get_key
+    :param fingerprint: fingerprint of the request
+    :return: True if the key was claimed, False if another request holds it
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(key=key, expires_on__lte=now).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                key=key,
+                fingerprint=fingerprint,
+                expires_on=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def release(key):
+    IdempotencyKey.objects.filter(key=key, status_code=None).delete()
+
+
+def store(key, response):
+    """
+    stores the response of the request which claimed the key
+    :return: True if it was stored, False if the data is not JSON
+    """
+    try:
+        body = JSONRenderer().render(response.data)
+    except TypeError:
+        return False
+    IdempotencyKey.objects.filter(key=key).update(
+        status_code=response.status_code,
+        response=body,
+        expires_on=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    )
+    return True
+
+
+def purge_expired():
+    """
+    deletes a batch of expired keys, at most once every
+    IDEMPOTENCY_PURGE_INTERVAL seconds per process
+    :return: None
+    """
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < settings.IDEMPOTENCY_PURGE_INTERVAL:
+        return
+    _last_purge = now
+    expired = IdempotencyKey.objects.filter(expires_on__lte=timezone.now())
+    keys = list(expired.values_list("key", flat=True)[:PURGE_BATCH_SIZE])
+    if keys:
+        IdempotencyKey.objects.filter(key__in=keys).delete()
+
+
+def replay(record):
+    response = Response(json.loads(bytes(record.response)), status=record.status_code)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(scope):
+    """
+    decorator for the write views retried by the clients,
+    goes below jwt_auth_required which passes the user
+    :param scope: name of the endpoint, a key is only replayed on it
+    :return: decorator making the view run once per Idempotency-Key
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def new_func(*args, **kwargs):
+            request = args[1]
+            header = request.META.get(HEADER)
+            if header is None:
+                return func(*args, **kwargs)
+            if not header or len(header) > MAX_KEY_LENGTH:
+                return Response(
+                    {"message": messages.INVALID_IDEMPOTENCY_KEY},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            key = get_key(scope, kwargs["user"], header)
+            fingerprint = get_fingerprint(request)
+            purge_expired()
+            deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+            interval = POLL_INTERVAL
+            while not claim(key, fingerprint):
+                record = IdempotencyKey.objects.filter(key=key).first()
+                if record is None:
+                    # released by a request which failed, claimed again
+                    continue
+                if record.fingerprint != fingerprint:
+                    metrics.IDEMPOTENCY.labels(scope, "mismatch").inc()
+                    return Response(
+                        {"message": messages.IDEMPOTENCY_KEY_REUSED},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if record.status_code is not None:
+                    metrics.IDEMPOTENCY.labels(scope, "replayed").inc()
+                    logger.debug(f"Replayed {request.method} {request.path}")
+                    return replay(record)
+                if time.monotonic() >= deadline:
+                    metrics.IDEMPOTENCY.labels(scope, "in_progress").inc()
+                    return Response(
+                        {"message": messages.IDEMPOTENCY_KEY_IN_PROGRESS},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                time.sleep(interval)
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+            metrics.IDEMPOTENCY.labels(scope, "executed").inc()
+            try:
+                response = func(*args, **kwargs)
+            except Exception:
+                release(key)
+                raise
+            # server errors are not replayed, the retry runs the view again
+            if response.status_code >= 500 or not store(key, response):
+                release(key)
+            return response
+
+        return new_func
+
+    return decorator
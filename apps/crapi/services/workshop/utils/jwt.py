@@ -20,6 +20,7 @@ from rest_framework import status
 from rest_framework.response import Response
 from django.conf import settings
 from utils import messages
+from utils.timing import outbound
 from crapi.user.models import User
 import urllib3
 import logging
@@ -50,9 +51,10 @@ def jwt_auth_required(func):
                 tokenJson = {"token": token}
                 identity_url = settings.IDENTITY_VERIFY
                 logger.debug(f"Identity url: {identity_url}, tokenJson: {tokenJson}")
-                token_verify_response = requests.post(
-                    identity_url, json=tokenJson, verify=False
-                )
+                with outbound("identity"):
+                    token_verify_response = requests.post(
+                        identity_url, json=tokenJson, verify=False
+                    )
                 logger.debug(
                     f"Identity url: {identity_url}, token_verify_response: {token_verify_response}"
                 )
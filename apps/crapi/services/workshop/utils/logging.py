@@ -12,7 +12,238 @@
 # limitations under the License.
 
 
+"""
+Contains the logging pipeline of the workshop service
+Records are filtered and reduced to their message in the calling thread
+and serialized to JSON and written by a background listener thread
+"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+# keys whose values are never written to the logs
+SENSITIVE_KEYS = (
+    "password",
+    "token",
+    "authorization",
+    "secret",
+    "api_key",
+    "card",
+    "cvv",
+    "otp",
+)
+REDACTED = "[REDACTED]"
+MAX_FIELD_LENGTH = 1024
+MAX_ITEMS = 20
+# attributes every LogRecord has, anything else was passed in extra
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+}
+
+
+def truncate(value, max_length=MAX_FIELD_LENGTH):
+    if len(value) <= max_length:
+        return value
+    return f"{value[:max_length]}...({len(value) - max_length} more)"
+
+
+def redact(value, max_length=MAX_FIELD_LENGTH, depth=3):
+    """
+    :param value: value to be logged
+    :param max_length: maximum length of a string
+    :param depth: maximum nesting depth
+    :return: copy of value which is safe and small enough to be logged
+    """
+    if isinstance(value, dict):
+        if depth == 0:
+            return f"{{...{len(value)} keys}}"
+        redacted = {}
+        for i, (key, item) in enumerate(value.items()):
+            if i == MAX_ITEMS:
+                redacted["..."] = f"{len(value) - MAX_ITEMS} more"
+                break
+            if any(sensitive in str(key).lower() for sensitive in SENSITIVE_KEYS):
+                redacted[key] = REDACTED
+            else:
+                redacted[key] = redact(item, max_length, depth - 1)
+        return redacted
+    if isinstance(value, (list, tuple)):
+        if depth == 0:
+            return f"[...{len(value)} items]"
+        redacted = [redact(item, max_length, depth - 1) for item in value[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            redacted.append(f"...{len(value) - MAX_ITEMS} more")
+        return redacted
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return truncate(str(value), max_length)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as a single line JSON object
+    with the values passed in extra as additional keys
+    """
+
+    def __init__(self, max_length=MAX_FIELD_LENGTH):
+        super().__init__()
+        self.max_length = max_length
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage(), self.max_length),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = redact(value, self.max_length)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the records below WARNING of the given loggers
+    rates maps logger names to the fraction to keep, a logger without
+    a rate uses the one of its closest configured parent
+    """
+
+    def __init__(self, rates=None, default=1.0):
+        super().__init__()
+        self.rates = rates or {}
+        self.default = default
+
+    def get_rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return self.default
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.get_rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger, records below WARNING over the limit are
+    dropped and their number is added to the next record of the logger
+    Attributes:
+        rate: records per second allowed per logger
+        burst: records allowed at once per logger
+        rates: dict mapping logger names to their own rate
+    """
+
+    def __init__(self, rate=100, burst=200, rates=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.rates = rates or {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        rate = self.rates.get(record.name, self.rate)
+        with self.lock:
+            tokens, updated, dropped = self.buckets.get(
+                record.name, (self.burst, now, 0)
+            )
+            tokens = min(self.burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self.buckets[record.name] = (tokens, now, dropped + 1)
+                return False
+            self.buckets[record.name] = (tokens - 1, now, 0)
+        if dropped:
+            record.dropped_records = dropped
+        return True
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Non blocking handler putting the records on a bounded queue
+    a listener thread formats them as JSON and writes them to the
+    console and the log file, records are dropped when the queue is full
+    """
+
+    def __init__(self, filename=None, console=True, maxsize=10000, max_length=None):
+        super().__init__(queue.Queue(maxsize))
+        self.max_length = max_length or MAX_FIELD_LENGTH
+        self.dropped = 0
+        formatter = JSONFormatter(self.max_length)
+        handlers = []
+        if console:
+            handlers.append(logging.StreamHandler())
+        if filename:
+            handlers.append(logging.FileHandler(filename, delay=True))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers)
+        self.listener.start()
+        atexit.register(self.stop_listener)
+
+    def restart_listener(self):
+        """
+        called in a forked worker, where the listener thread of the
+        parent does not run, with a new queue as the lock of the old one
+        may have been held by that thread
+        :return: None
+        """
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(
+            self.queue, *self.listener.handlers
+        )
+        self.listener.start()
+
+    def prepare(self, record):
+        # only the message is built here, the rest is formatted by the listener
+        record = copy.copy(record)
+        record.msg = truncate(record.getMessage(), self.max_length)
+        record.args = None
+        record.message = record.msg
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # the number of records dropped so far travels with the next one queued
+        dropped = self.dropped
+        if dropped:
+            record.dropped_by_queue = dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped -= dropped
+
+    def stop_listener(self):
+        # writes out the queued records, safe to call more than once
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self.stop_listener()
+        super().close()
 
 
 def log_error(url, params, status_code, message):
@@ -23,4 +254,10 @@ def log_error(url, params, status_code, message):
     :param message: The message of the error.
     :return:
     """
-    logging.getLogger().error(f"{url} - {params} - {status_code} -{message}")
+    logging.getLogger().error(
+        "%s - %s - %s",
+        url,
+        status_code,
+        message,
+        extra={"url": url, "status_code": status_code, "params": redact(params)},
+    )
@@ -49,7 +49,20 @@ INVALID_SERVICE_REQUEST_STATUS = (
 REPORT_ID_MISSING = "Please enter the report_id value."
 INVALID_REPORT_ID = "Please enter a valid report_id value."
 REPORT_DOES_NOT_EXIST = "The Report does not exist for given report_id."
+REPORT_NOT_READY = "The Report is still being generated. Please try again later."
+SEARCH_QUERY_MISSING = "Please enter a search text using the 'q' parameter."
 COULD_NOT_CONNECT = "Could not connect to mechanic api."
+MECHANIC_API_UNAVAILABLE = "Mechanic api is unavailable. Please try again later."
+MECHANIC_API_TIMEOUT = "Mechanic api did not respond in time."
+MECHANIC_API_RESPONSE_TOO_LARGE = "Mechanic api response is too large."
 INVALID_LIMIT_OR_OFFSET = "Param limit and offset values should be integers."
 NO_USER_DETAILS = "No user details found."
 NO_OBJECT_FOUND = "No object found."
+TOO_MANY_REQUESTS = "Too many requests. Please try again later."
+SERVICE_OVERLOADED = "Service is busy. Please try again later."
+INVALID_IDEMPOTENCY_KEY = "Idempotency-Key should be 1 to 255 characters long."
+IDEMPOTENCY_KEY_REUSED = "Idempotency-Key was already used for another request."
+IDEMPOTENCY_KEY_IN_PROGRESS = (
+    "A request with this Idempotency-Key is still in progress. Please retry later."
+)
+INVALID_FIELDS = "Unknown fields in 'fields' or 'expand': {}"
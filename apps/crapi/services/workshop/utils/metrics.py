@@ -0,0 +1,193 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the prometheus metrics of the workshop service
+When PROMETHEUS_MULTIPROC_DIR is set every gunicorn worker writes its
+samples there and the metrics endpoint aggregates the files of all workers
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from crapi_site import settings
+
+REQUESTS = Counter(
+    "workshop_requests",
+    "Number of handled requests",
+    ["view", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "workshop_request_duration_seconds",
+    "Time spent handling a request",
+    ["view", "method", "status"],
+)
+REQUEST_DB_TIME = Histogram(
+    "workshop_request_db_duration_seconds",
+    "Time spent on SQL queries by a request",
+    ["view"],
+)
+REQUEST_QUERIES = Histogram(
+    "workshop_request_queries",
+    "Number of SQL queries run by a request",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+REQUEST_HTTP_TIME = Histogram(
+    "workshop_request_http_duration_seconds",
+    "Time spent on outbound http calls by a request",
+    ["view"],
+)
+REQUEST_RENDER_TIME = Histogram(
+    "workshop_request_render_duration_seconds",
+    "Time spent rendering the response body of a request",
+    ["view"],
+)
+OUTBOUND_LATENCY = Histogram(
+    "workshop_outbound_request_duration_seconds",
+    "Time spent on an outbound http call",
+    ["upstream"],
+)
+RESPONSE_BYTES = Counter(
+    "workshop_response_bytes",
+    "Bytes of the response bodies sent, by content encoding",
+    ["view", "encoding"],
+)
+RESPONSE_UNCOMPRESSED_BYTES = Counter(
+    "workshop_response_uncompressed_bytes",
+    "Bytes of the response bodies before compression",
+    ["view"],
+)
+COMPRESSION_CACHE = Counter(
+    "workshop_compression_cache",
+    "Lookups of the compressed variants of cacheable responses",
+    ["result"],
+)
+VIEW_CACHE = Counter(
+    "workshop_view_cache",
+    "Lookups of the view cache by view and result",
+    ["view", "result"],
+)
+SINGLE_FLIGHT = Counter(
+    "workshop_single_flight",
+    "Calls which ran or shared the identical call in flight",
+    ["name", "result"],
+)
+IDEMPOTENCY = Counter(
+    "workshop_idempotency",
+    "Requests sent with an Idempotency-Key by endpoint and result",
+    ["scope", "result"],
+)
+ADMISSION = Counter(
+    "workshop_admission",
+    "Requests of the admission controlled views by view and result",
+    ["view", "result"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "workshop_db_pool_connections",
+    "Number of pooled database connections",
+    ["database", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "workshop_db_pool_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["database"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "workshop_db_pool_timeouts",
+    "Number of times no pooled database connection was available in time",
+    ["database"],
+)
+DB_REPLICA_LAG = Gauge(
+    "workshop_db_replica_lag_seconds",
+    "Last measured replication lag of a read replica, -1 when unreachable",
+    ["database"],
+    multiprocess_mode="livemax",
+)
+DEPENDENCY_UP = Gauge(
+    "workshop_dependency_up",
+    "1 when the last background health check of a dependency succeeded",
+    ["dependency"],
+    multiprocess_mode="livemin",
+)
+PDF_RENDERS_IN_PROGRESS = Gauge(
+    "workshop_pdf_renders_in_progress",
+    "Number of service report PDFs being rendered",
+    multiprocess_mode="livesum",
+)
+PDF_RENDER_TIME = Histogram(
+    "workshop_pdf_render_duration_seconds",
+    "Time spent rendering a service report PDF",
+)
+
+
+class ReportsDirectoryCollector:
+    """
+    Reports the size of the service reports directory at scrape time
+    """
+
+    def collect(self):
+        size = files = 0
+        try:
+            with os.scandir(os.path.join(settings.BASE_DIR, "reports")) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files += 1
+                        size += entry.stat().st_size
+        except FileNotFoundError:
+            pass
+        yield GaugeMetricFamily(
+            "workshop_reports_directory_bytes",
+            "Total size of the service reports",
+            value=size,
+        )
+        yield GaugeMetricFamily(
+            "workshop_reports_directory_files",
+            "Number of service reports",
+            value=files,
+        )
+
+
+def render_metrics():
+    """
+    :return: content type and body of the metrics in the text format
+    """
+    registry = CollectorRegistry()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(_ProcessRegistry())
+    registry.register(ReportsDirectoryCollector())
+    return CONTENT_TYPE_LATEST, generate_latest(registry)
+
+
+class _ProcessRegistry:
+    """
+    exposes the metrics of the default registry in another registry
+    """
+
+    def collect(self):
+        return REGISTRY.collect()
@@ -13,14 +13,12 @@
 
 import logging
 import jwt
-from functools import wraps
+from functools import lru_cache, wraps
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from utils import messages
-from crapi.user.models import User
-from faker import Faker
-
-Faker.seed(4321)
+from crapi.user.models import User, Vehicle, VehicleCompany, VehicleModel
 
 
 """
@@ -58,7 +56,20 @@ def get_sample_user_data():
     }
 
 
-def fake_phone_number(fake: Faker) -> str:
+@lru_cache(maxsize=None)
+def get_faker_class():
+    """
+    imports faker on first use, it is slow to import and only needed
+    to generate sample users
+    :return: Faker class, seeded once
+    """
+    from faker import Faker
+
+    Faker.seed(4321)
+    return Faker
+
+
+def fake_phone_number(fake) -> str:
     return f"{fake.msisdn()[3:]}"
 
 
@@ -66,7 +77,7 @@ def get_sample_users(users_count=100):
     """
     gives sample users which can be used for testing
     """
-    fake = Faker()
+    fake = get_faker_class()()
     users = []
     for i in range(users_count):
         users.append(
@@ -94,6 +105,45 @@ def get_sample_admin_user():
     }
 
 
+def create_user(email, number, role=User.ROLE_CHOICES.USER):
+    """
+    creates a user whose token in the tests is its email
+    :param email: email of the user
+    :param number: phone number of the user
+    :param role: role of the user
+    :return: User object
+    """
+    return User.objects.create(
+        email=email,
+        number=number,
+        password="password",
+        role=role,
+        created_on=timezone.now(),
+    )
+
+
+def create_vehicle(owner, vin, **kwargs):
+    """
+    creates a vehicle of a new model of a new company
+    :param owner: User owning the vehicle
+    :param vin: vin of the vehicle
+    :param kwargs: other fields of the vehicle
+    :return: Vehicle object
+    """
+    return Vehicle.objects.create(
+        vin=vin,
+        owner=owner,
+        status="ACTIVE",
+        vehicle_model=VehicleModel.objects.create(
+            fuel_type=1,
+            model="NewModel",
+            vehicle_img="Image",
+            vehiclecompany=VehicleCompany.objects.create(name="RandomCompany"),
+        ),
+        **kwargs,
+    )
+
+
 def mock_jwt_auth_required(func):
     """
     mock function to validate jwt
@@ -0,0 +1,66 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the pagination helpers for large tables
+"""
+from django.db import connections
+from rest_framework.pagination import LimitOffsetPagination
+
+from crapi_site import settings
+
+
+def estimated_count(model, using="default"):
+    """
+    reads the row estimate the planner keeps for the table of the model
+    :param model: model class
+    :param using: database alias
+    :return: estimated number of rows, None if there is no estimate
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 for tables which were never vacuumed or analyzed
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination which counts unfiltered querysets of large tables
+    from the planner estimate instead of running COUNT(*)
+    Attributes:
+        count_is_estimated: True if count is an estimate
+    """
+
+    count_is_estimated = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_is_estimated = False
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        if getattr(queryset, "query", None) is not None and not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+                self.count_is_estimated = True
+                return estimate
+        return super().get_count(queryset)
@@ -0,0 +1,197 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the helpers to read or stream upstream http responses
+with a bounded amount of memory
+"""
+import hashlib
+import json
+import logging
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.http import StreamingHttpResponse
+
+from utils.retry import DeadlineExceeded
+
+logger = logging.getLogger()
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class ResponseTooLarge(Exception):
+    """
+    raised when an upstream response is bigger than the allowed size
+    """
+
+
+def check_content_length(response, max_size):
+    """
+    rejects responses which announce a body bigger than max_size
+    :param response: requests.Response object opened with stream=True
+    :param max_size: maximum body size in bytes
+    :raises ResponseTooLarge: if the Content-Length exceeds max_size
+    """
+    try:
+        content_length = int(response.headers.get("Content-Length", 0))
+    except ValueError:
+        content_length = 0
+    if content_length > max_size:
+        response.close()
+        raise ResponseTooLarge(content_length)
+
+
+def check_deadline(response, deadline):
+    """
+    :param response: requests.Response object being read
+    :param deadline: time.monotonic() of the deadline, None if there is none
+    :raises DeadlineExceeded: if the deadline passed
+    """
+    if deadline is not None and time.monotonic() > deadline:
+        logger.warning(f"Upstream response from {response.url} is too slow")
+        raise DeadlineExceeded()
+
+
+def read_limited(response, max_size, chunk_size, deadline=None):
+    """
+    reads the whole body of an upstream response
+    :param response: requests.Response object opened with stream=True
+    :param max_size: maximum body size in bytes
+    :param chunk_size: size of a single read in bytes
+    :param deadline: time.monotonic() by which the body must be read,
+        a single read may still take up to the timeout of the request
+    :return: body as bytes
+    :raises ResponseTooLarge: if the body exceeds max_size
+    :raises DeadlineExceeded: if the body is still being read at the deadline
+    """
+    check_content_length(response, max_size)
+    body = bytearray()
+    try:
+        for chunk in response.iter_content(chunk_size):
+            body.extend(chunk)
+            if len(body) > max_size:
+                raise ResponseTooLarge(len(body))
+            check_deadline(response, deadline)
+    finally:
+        response.close()
+    return bytes(body)
+
+
+def iter_limited(response, max_size, chunk_size, deadline=None):
+    """
+    yields the body of an upstream response chunk by chunk
+    raises once the body exceeds max_size, which aborts the response
+    already sent to the client instead of ending a truncated body normally
+    :param response: requests.Response object opened with stream=True
+    :param max_size: maximum body size in bytes
+    :param chunk_size: size of a single read in bytes
+    :param deadline: time.monotonic() by which the body must be sent
+    :raises ResponseTooLarge: if the body exceeds max_size
+    :raises DeadlineExceeded: if the body is still being sent at the deadline
+    """
+    sent = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if sent + len(chunk) > max_size:
+                logger.warning(
+                    f"Aborted upstream response from {response.url} at {sent} bytes"
+                )
+                raise ResponseTooLarge(sent + len(chunk))
+            sent += len(chunk)
+            yield chunk
+            check_deadline(response, deadline)
+    finally:
+        response.close()
+
+
+def decode_body(response, body):
+    """
+    :param response: requests.Response the body was read from
+    :param body: body as bytes
+    :return: the parsed json body or the body as text if it is not json
+    """
+    try:
+        return json.loads(body)
+    except ValueError:
+        return str(body, response.encoding or "utf-8", errors="replace")
+
+
+def streaming_response(response, max_size, chunk_size, deadline=None):
+    """
+    streams an upstream response to the client as it is,
+    the stream is aborted once it exceeds max_size or the deadline
+    :param response: requests.Response object opened with stream=True
+    :param max_size: maximum body size in bytes
+    :param chunk_size: size of a single read in bytes
+    :param deadline: time.monotonic() by which the body must be sent
+    :return: StreamingHttpResponse object
+    :raises ResponseTooLarge: if the Content-Length exceeds max_size
+    """
+    check_content_length(response, max_size)
+    return StreamingHttpResponse(
+        iter_limited(response, max_size, chunk_size, deadline),
+        status=response.status_code,
+        content_type=response.headers.get("Content-Type", "application/octet-stream"),
+    )
+
+
+def normalize_url(url):
+    """
+    :param url: upstream url
+    :return: url with lowercase scheme and host, without the default port
+        and the fragment, and with sorted query parameters
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def cache_key(url, params, caller):
+    """
+    :param url: upstream url
+    :param params: query parameters sent to the upstream
+    :param caller: identity of the requesting user
+    :return: cache key of an upstream response
+    """
+    key = json.dumps(
+        [normalize_url(url), params, caller], sort_keys=True, default=str
+    ).encode("utf-8")
+    return "upstream_response:" + hashlib.sha256(key).hexdigest()
+
+
+def cache_ttl(response, max_ttl):
+    """
+    :param response: requests.Response object
+    :param max_ttl: upper bound of the time to live in seconds
+    :return: seconds the response may be cached for, 0 if it may not be cached
+    """
+    directives = {}
+    for directive in response.headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return max(min(int(directives["max-age"]), max_ttl), 0)
+        except ValueError:
+            return 0
+    return max_ttl
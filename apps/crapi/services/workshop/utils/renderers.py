@@ -0,0 +1,72 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the renderers of the workshop APIs
+"""
+import re
+
+import orjson
+from rest_framework import renderers
+
+from utils.timing import rendering
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+# floats below 1e-4 or from 1e16 on, which orjson writes as 0.00001 or 1e16
+# where the json module writes 1e-05 or 1e+16
+ORJSON_FLOAT_MISMATCH = re.compile(rb"[:,\[]-?(?:\d+(?:\.\d+)?[eE]|0\.0000)")
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer which records its time in the request timings
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with rendering():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer writing the compact output with orjson
+    The bytes are the same as the ones of the json module, whatever orjson
+    writes differently (datetimes, floats in exponent notation, integers
+    over 64 bits, indented output) is rendered by the json module
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with rendering():
+            if data is None:
+                return b""
+            indent = self.get_indent(accepted_media_type, renderer_context or {})
+            if not self.ensure_ascii and self.compact and indent is None:
+                try:
+                    ret = orjson.dumps(
+                        data, default=self.encoder.default, option=ORJSON_OPTIONS
+                    )
+                except orjson.JSONEncodeError:
+                    ret = None
+                if ret is not None and not ORJSON_FLOAT_MISMATCH.search(ret):
+                    if b"\xe2\x80" in ret:
+                        ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+                        ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+                    return ret
+            return renderers.JSONRenderer.render(
+                self, data, accepted_media_type, renderer_context
+            )
+
+    @property
+    def encoder(self):
+        return self.encoder_class()
@@ -0,0 +1,305 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the retry policy, circuit breaker and hedging helpers
+used for calls to upstream http services
+"""
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+    wait,
+)
+
+import requests
+
+logger = logging.getLogger()
+
+# number of hosts for which circuit breaker state is kept per process
+MAX_CIRCUIT_BREAKERS = 1024
+HEDGE_WORKERS = 16
+
+
+class CircuitOpenError(Exception):
+    """
+    raised when the circuit breaker of an upstream host is open
+    """
+
+
+class DeadlineExceeded(Exception):
+    """
+    raised when the overall deadline of a call runs out
+    """
+
+
+class CircuitBreaker:
+    """
+    Per host circuit breaker
+    opens after failure_threshold consecutive failures and then lets a
+    single probe call through every reset_timeout seconds until one succeeds
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        :return: True if a call may be sent to the host
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            # one probe per reset_timeout window while the circuit is not closed
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def is_open(self):
+        with self.lock:
+            return self.state == self.OPEN
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+_circuit_breakers = OrderedDict()
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host, failure_threshold, reset_timeout):
+    """
+    returns the circuit breaker of the given host, creating it if needed
+    :param host: network location of the upstream
+    :param failure_threshold: consecutive failures before opening
+    :param reset_timeout: seconds to wait before probing an open circuit
+    :return: CircuitBreaker object
+    """
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(failure_threshold, reset_timeout)
+            _circuit_breakers[host] = breaker
+            if len(_circuit_breakers) > MAX_CIRCUIT_BREAKERS:
+                _circuit_breakers.popitem(last=False)
+        else:
+            _circuit_breakers.move_to_end(host)
+        return breaker
+
+
+class RetryPolicy:
+    """
+    Retry policy with exponential backoff, full jitter and an overall deadline
+    Attributes:
+        max_attempts: total number of calls including the first one
+        base_delay: backoff delay of the first retry in seconds
+        max_delay: upper bound of a single backoff delay in seconds
+        deadline: overall time budget for all attempts in seconds
+        attempt_timeout: timeout of a single attempt in seconds
+        hedge_after: seconds after which a second identical call is sent,
+            hedging is disabled if not set
+    """
+
+    def __init__(
+        self,
+        max_attempts=1,
+        base_delay=0.1,
+        max_delay=2.0,
+        deadline=30.0,
+        attempt_timeout=10.0,
+        hedge_after=None,
+    ):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.hedge_after = hedge_after
+
+    def backoff(self, attempt):
+        """
+        :param attempt: number of the retry, starting from 1
+        :return: seconds to sleep before the retry
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def get_hedge_executor():
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=HEDGE_WORKERS, thread_name_prefix="hedge"
+            )
+        return _hedge_executor
+
+
+def reset_after_fork():
+    """
+    called in a forked worker, the hedge threads and the locks
+    of the parent process are not usable there
+    :return: None
+    """
+    global _hedge_executor, _hedge_executor_lock, _circuit_breakers_lock
+    _hedge_executor = None
+    _hedge_executor_lock = threading.Lock()
+    _circuit_breakers_lock = threading.Lock()
+
+
+def close_result(future):
+    """
+    done callback releasing the connection of a response nobody will read
+    """
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), "close", None)
+        if close is not None:
+            close()
+
+
+def hedged_call(send, timeout, hedge_after):
+    """
+    calls send and, if it has not finished after hedge_after seconds,
+    sends the same call once more and returns whichever succeeds first
+    :param send: function taking the timeout of the call
+    :param timeout: timeout of the call in seconds
+    :param hedge_after: seconds to wait before hedging
+    :return: result of send
+    """
+    if not hedge_after or hedge_after >= timeout:
+        return send(timeout)
+    executor = get_hedge_executor()
+    pending = {executor.submit(send, timeout)}
+    try:
+        return next(iter(pending)).result(timeout=hedge_after)
+    except FutureTimeoutError:
+        pass
+    logger.debug("Sending hedged request after %ss", hedge_after)
+    pending.add(executor.submit(send, timeout - hedge_after))
+    end = time.monotonic() + timeout - hedge_after
+    error = None
+    while pending:
+        done, pending = wait(
+            pending,
+            timeout=max(end - time.monotonic(), 0),
+            return_when=FIRST_COMPLETED,
+        )
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.add_done_callback(close_result)
+                return future.result()
+            error = future.exception()
+    if error is not None:
+        raise error
+    raise requests.exceptions.Timeout("Hedged requests timed out")
+
+
+def call_with_retry(
+    send,
+    policy,
+    breaker=None,
+    retry_on_response=lambda response: False,
+    retry_on=(requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+):
+    """
+    calls send until it succeeds, the attempts or the deadline run out
+    The breaker is checked before the first attempt and gets a single
+    success or failure per call, the retries of one call never open it.
+    The retries stop if the circuit was opened by other calls meanwhile
+    :param send: function taking the timeout of a single call
+    :param policy: RetryPolicy object
+    :param breaker: CircuitBreaker of the upstream host if any
+    :param retry_on_response: returns True if a response should be retried
+    :param retry_on: exceptions which should be retried
+    :return: the last response
+    :raises CircuitOpenError: if the circuit of the host is open
+    :raises DeadlineExceeded: if the deadline ran out before any response
+    :raises retry_on: the last error once all the attempts failed
+    """
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError()
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded()
+        response = None
+        try:
+            response = hedged_call(
+                send, min(policy.attempt_timeout, remaining), policy.hedge_after
+            )
+        except retry_on as e:
+            error = e
+        else:
+            if not retry_on_response(response):
+                if breaker is not None:
+                    if response.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                return response
+        attempt += 1
+        delay = policy.backoff(attempt)
+        out_of_time = time.monotonic() + delay >= deadline
+        if (
+            attempt >= policy.max_attempts
+            or out_of_time
+            or (breaker is not None and breaker.is_open())
+        ):
+            if breaker is not None:
+                if response is None or response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if response is not None:
+                return response
+            if attempt < policy.max_attempts and out_of_time:
+                raise DeadlineExceeded() from error
+            raise error
+        if response is not None:
+            response.close()
+        logger.info(f"Retry {attempt} in {delay:.3f}s")
+        time.sleep(delay)
@@ -0,0 +1,340 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Read only serializers for the list endpoints
+A RowSerializer is compiled once from a ModelSerializer into the lookups
+of a values_list() query and the fields each row value goes to, so a page is
+built from plain row tuples without any model instance or field introspection.
+The output is the one of the ModelSerializer it is compiled from, or the
+part of it asked for with ?fields= and ?expand=, whose rows are read with
+only the lookups and joins of the fields asked for
+"""
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers
+
+# fields whose to_representation returns database values unchanged
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+# values of an IN lookup per query, a long list of keys would make the
+# planner read the whole table instead of the index of the key
+GROUP_CHUNK_SIZE = 100
+# fieldsets compiled per serializer, the others are compiled on every request
+MAX_COMPILED_FIELDSETS = 64
+
+
+def get_lookup(prefix, field):
+    if field.source == "*":
+        raise ImproperlyConfigured(
+            f"{field.field_name} can not be read from a row, use a method field"
+        )
+    return prefix + field.source.replace(".", "__")
+
+
+def get_formatter(field):
+    """
+    :param field: bound serializer field
+    :return: function turning a row value into the representation
+        of the field, None if the value is used as it is
+    """
+    if type(field) in IDENTITY_FIELDS:
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # values_list already returns the primary key of the relation
+        return None if field.pk_field is None else field.pk_field.to_representation
+    if isinstance(field, serializers.RelatedField):
+        raise ImproperlyConfigured(
+            f"{field.field_name}: {type(field).__name__} can not be read from a row"
+        )
+    return field.to_representation
+
+
+def is_nullable(serializer, field):
+    model = getattr(getattr(serializer, "Meta", None), "model", None)
+    if model is None or "." in field.source:
+        return False
+    try:
+        return model._meta.get_field(field.source).null
+    except FieldDoesNotExist:
+        return False
+
+
+class InvalidFieldset(ValueError):
+    """
+    raised when ?fields= or ?expand= names fields the serializer does not have
+    """
+
+
+class Fieldset:
+    """
+    Fields asked for with ?fields= and relations asked for with ?expand=,
+    nested fields are named by their dotted path
+
+        ?fields=id,status,vehicle.vin&expand=mechanic
+
+    Only the fields named are serialized, a relation named without any of
+    its fields is serialized as its primary key unless it is expanded.
+    With ?expand= alone all the fields are serialized and only the
+    relations expanded are serialized in full
+    Attributes:
+        fields: frozenset of the dotted paths asked for, None for all
+        expand: frozenset of the dotted paths of the relations to expand
+    """
+
+    def __init__(self, fields=None, expand=()):
+        self.fields = None if fields is None else frozenset(fields)
+        self.expand = frozenset(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        :param request: http request
+        :return: Fieldset of the query params, None if there is none
+        """
+        params = request.query_params
+        if "fields" not in params and "expand" not in params:
+            return None
+        fields = params.get("fields")
+        return cls(
+            None if fields is None else split_paths(fields),
+            split_paths(params.get("expand", "")),
+        )
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Fieldset)
+            and self.fields == other.fields
+            and self.expand == other.expand
+        )
+
+    def __hash__(self):
+        return hash((self.fields, self.expand))
+
+    def has_children(self, path):
+        return self.fields is not None and any(
+            field.startswith(path + ".") for field in self.fields
+        )
+
+
+def split_paths(value):
+    return [path.strip() for path in value.split(",") if path.strip()]
+
+
+class RowSerializer:
+    """
+    Compiled read only version of serializer_class
+    SerializerMethodFields are filled by a get_<field name> method taking
+    the primary keys of all the rows and returning a dict mapping them to
+    the values, so they cost one query per page instead of one per row
+
+        paginated = self.paginate_queryset(OrderRowSerializer.values(orders), request)
+        OrderRowSerializer(paginated).data
+
+    The same Fieldset goes to values() and to the serializer of its rows
+
+        fieldset = Fieldset.from_request(request)
+        rows = OrderRowSerializer.values(orders, fieldset)
+        OrderRowSerializer(rows, fieldset).data
+    """
+
+    serializer_class = None
+    _compiled = None
+    _paths = None
+
+    def __init__(self, rows, fieldset=None):
+        self.rows = rows
+        self.fieldset = fieldset
+
+    @classmethod
+    def compile(cls, fieldset=None):
+        """
+        :param fieldset: Fieldset to serialize, None for every field
+        :return: (lookups, plan) of the serializer_class, the first lookup
+            is always the primary key
+        :raises: InvalidFieldset if the fieldset names unknown fields
+        """
+        if cls.__dict__.get("_compiled") is None:
+            cls._compiled = {}
+        compiled = cls._compiled.get(fieldset)
+        if compiled is None:
+            if fieldset is not None:
+                cls.validate(fieldset)
+            lookups = ["pk"]
+            plan = cls.compile_serializer(cls.serializer_class(), "", lookups, fieldset)
+            compiled = (tuple(lookups), plan)
+            if len(cls._compiled) < MAX_COMPILED_FIELDSETS:
+                cls._compiled[fieldset] = compiled
+        return compiled
+
+    @classmethod
+    def get_paths(cls):
+        """
+        :return: (dotted paths of all the fields, dotted paths of the relations)
+        """
+        if cls.__dict__.get("_paths") is None:
+            fields, relations = set(), set()
+
+            def walk(serializer, prefix):
+                for field in serializer.fields.values():
+                    if field.write_only:
+                        continue
+                    path = prefix + field.field_name
+                    fields.add(path)
+                    if isinstance(field, serializers.Serializer):
+                        relations.add(path)
+                        walk(field, path + ".")
+
+            walk(cls.serializer_class(), "")
+            cls._paths = (frozenset(fields), frozenset(relations))
+        return cls._paths
+
+    @classmethod
+    def validate(cls, fieldset):
+        fields, relations = cls.get_paths()
+        unknown = (fieldset.fields or frozenset()) - fields
+        unknown |= fieldset.expand - relations
+        if unknown:
+            raise InvalidFieldset(", ".join(sorted(unknown)))
+
+    @classmethod
+    def compile_serializer(cls, serializer, prefix, lookups, fieldset, path=""):
+        """
+        :param fieldset: Fieldset to serialize, None for every field
+        :param path: dotted path of the serializer, empty at the top level
+        :return: list of (key, row index, formatter, nested plan or method name)
+        """
+        plan = []
+        # the fields of an expanded relation are all serialized
+        select_all = (
+            fieldset is None
+            or fieldset.fields is None
+            or (path and not fieldset.has_children(path.rstrip(".")))
+        )
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            field_path = path + field.field_name
+            if not select_all and not (
+                field_path in fieldset.fields or fieldset.has_children(field_path)
+            ):
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if prefix:
+                    raise ImproperlyConfigured(
+                        f"{field.field_name}: method fields must be at the top level"
+                    )
+                plan.append((field.field_name, None, None, field.field_name))
+            elif isinstance(field, serializers.ListSerializer):
+                raise ImproperlyConfigured(
+                    f"{field.field_name}: nested lists can not be read from a row"
+                )
+            elif isinstance(field, serializers.BaseSerializer):
+                lookup = get_lookup(prefix, field)
+                if not (
+                    fieldset is None
+                    or field_path in fieldset.expand
+                    or fieldset.has_children(field_path)
+                ):
+                    # the foreign key, without joining the relation
+                    plan.append((field.field_name, len(lookups), None, None))
+                    lookups.append(lookup)
+                    continue
+                null_index = None
+                if is_nullable(serializer, field):
+                    null_index = len(lookups)
+                    lookups.append(lookup)
+                nested = cls.compile_serializer(
+                    field, lookup + "__", lookups, fieldset, field_path + "."
+                )
+                plan.append((field.field_name, null_index, None, nested))
+            else:
+                plan.append(
+                    (field.field_name, len(lookups), get_formatter(field), None)
+                )
+                lookups.append(get_lookup(prefix, field))
+        return plan
+
+    @classmethod
+    def values(cls, queryset, fieldset=None):
+        """
+        :param queryset: queryset of the model of serializer_class
+        :param fieldset: Fieldset to serialize, None for every field
+        :return: queryset of the rows the serializer reads
+        :raises: InvalidFieldset if the fieldset names unknown fields
+        """
+        return queryset.values_list(*cls.compile(fieldset)[0])
+
+    @classmethod
+    def group(cls, queryset, key, values=None):
+        """
+        :param queryset: queryset of the model of serializer_class
+        :param key: lookup the rows are grouped by
+        :param values: keys of the rows to read, queried GROUP_CHUNK_SIZE
+            at a time, all the rows of the queryset if None
+        :return: defaultdict mapping the key of the rows to the list
+            of their representations
+        """
+        lookups, plan = cls.compile()
+        groups = defaultdict(list)
+        serializer = cls(())
+        if values is None:
+            querysets = [queryset]
+        else:
+            values = list(values)
+            querysets = [
+                queryset.filter(**{f"{key}__in": values[i : i + GROUP_CHUNK_SIZE]})
+                for i in range(0, len(values), GROUP_CHUNK_SIZE)
+            ]
+        for chunk in querysets:
+            for row in chunk.values_list(*lookups, key):
+                groups[row[-1]].append(serializer.build(plan, row, {}))
+        return groups
+
+    def build(self, plan, row, extra):
+        data = {}
+        for key, index, formatter, nested in plan:
+            if nested is None:
+                value = row[index]
+                data[key] = (
+                    value if formatter is None or value is None else formatter(value)
+                )
+            elif isinstance(nested, str):
+                data[key] = extra[nested](row[0])
+            elif index is not None and row[index] is None:
+                data[key] = None
+            else:
+                data[key] = self.build(nested, row, extra)
+        return data
+
+    @property
+    def data(self):
+        """
+        :return: list with the representation of every row
+        """
+        plan = self.compile(self.fieldset)[1]
+        rows = list(self.rows)
+        extra = {}
+        for key, index, formatter, nested in plan:
+            if isinstance(nested, str):
+                values = getattr(self, f"get_{nested}")([row[0] for row in rows])
+                extra[nested] = values.__getitem__
+        return [self.build(plan, row, extra) for row in rows]
@@ -0,0 +1,93 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the single flight helper which collapses concurrent
+identical calls into a single execution
+"""
+import threading
+
+from utils import metrics
+
+
+class SingleFlightTimeout(Exception):
+    """
+    raised to a caller which waited longer than its timeout
+    for the identical call in flight
+    """
+
+
+class _Call:
+    """
+    state of a call which is in flight
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time in the process
+    callers arriving while a call with the same key is in flight
+    wait for it and get its result or its error
+    Attributes:
+        name: name of the calls in the metrics, None to not count them
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """
+        :param key: hashable key identifying identical calls,
+            such as a tuple of the view and its arguments
+        :param fn: function without arguments doing the actual work
+        :param timeout: seconds a caller waits for the call in flight,
+            None to wait until it finishes
+        :return: result of fn, possibly computed by another thread
+        :raises SingleFlightTimeout: if the call in flight did not finish
+            within the timeout
+        :raises: the error raised by fn
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+        if self.name is not None:
+            metrics.SINGLE_FLIGHT.labels(self.name, "run" if leader else "shared").inc()
+        if not leader:
+            if not call.done.wait(timeout):
+                if self.name is not None:
+                    metrics.SINGLE_FLIGHT.labels(self.name, "timeout").inc()
+                raise SingleFlightTimeout(key)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
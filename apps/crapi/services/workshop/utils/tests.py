@@ -0,0 +1,674 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+contains the test cases related to the view cache, request coalescing,
+logging pipeline, and the row serializers, sparse fieldsets and renderer
+of the list endpoints
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from utils.mock_methods import create_user, create_vehicle, mock_jwt_auth_required
+
+patch("utils.jwt.jwt_auth_required", mock_jwt_auth_required).start()
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from crapi.mechanic.models import Mechanic, ServiceRequest, ServiceComment
+from crapi.mechanic.serializers import (
+    MechanicSerializer,
+    MechanicRowSerializer,
+    MechanicServiceRequestSerializer,
+    MechanicServiceRequestRowSerializer,
+)
+from crapi.merchant.serializers import (
+    UserServiceRequestSerializer,
+    UserServiceRequestRowSerializer,
+)
+from crapi.shop.serializers import (
+    OrderSerializer,
+    OrderRowSerializer,
+    ProductSerializer,
+    ProductRowSerializer,
+)
+from crapi.user.serializers import UserDetailsSerializer, UserDetailsRowSerializer
+from crapi.shop.models import Order, Product
+from crapi.user.models import User, UserDetails
+from crapi_site import settings
+from prometheus_client import REGISTRY
+from utils import messages, view_cache
+from utils.renderers import ORJSONRenderer
+from utils.singleflight import SingleFlight, SingleFlightTimeout
+from utils.logging import (
+    JSONFormatter,
+    QueueHandler,
+    RateLimitFilter,
+    SamplingFilter,
+    redact,
+)
+
+
+class ViewCacheTestCase(TestCase):
+    """
+    contains the test cases related to the view cache
+    Attributes:
+        client: Client object used for testing
+        auth_headers: Auth headers for dummy user
+    """
+
+    def setUp(self):
+        self.client = Client()
+        view_cache.get_cache().clear()
+        user = create_user(
+            "viewcache@example.com", "9000000020", User.ROLE_CHOICES.MECH
+        )
+        UserDetails.objects.create(name="View Cache", available_credit=100, user=user)
+        self.mechanic = Mechanic.objects.create(mechanic_code="TRAC_VC0", user=user)
+        self.auth_headers = {"HTTP_AUTHORIZATION": "Bearer viewcache@example.com"}
+
+    def get_sample(self, view, result):
+        return (
+            REGISTRY.get_sample_value(
+                "workshop_view_cache_total", {"view": view, "result": result}
+            )
+            or 0
+        )
+
+    def test_build_key(self):
+        """
+        builds keys from differently ordered params and scopes
+        should only depend on the params, not on their order
+        :return: None
+        """
+        key = view_cache.build_key("products", {"limit": 10, "offset": 0})
+        self.assertEqual(
+            key, view_cache.build_key("products", {"offset": 0, "limit": 10})
+        )
+        self.assertNotEqual(
+            key, view_cache.build_key("products", {"limit": 10, "offset": 10})
+        )
+        self.assertNotEqual(
+            key, view_cache.build_key("products", {"limit": 10, "offset": 0}, scope=1)
+        )
+        self.assertTrue(key.startswith("view-cache:products:"))
+
+    def test_hit_and_invalidation(self):
+        """
+        lists the mechanics twice, then adds a mechanic and lists them again
+        should serve the second list from the cache and the third from the database
+        :return: None
+        """
+        hits_before = self.get_sample("mechanics", "hit")
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(len(res.json()["mechanics"]), 1)
+        first_queries = len(queries)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(len(res.json()["mechanics"]), 1)
+        self.assertLess(len(queries), first_queries)
+        self.assertEqual(self.get_sample("mechanics", "hit") - hits_before, 1)
+
+        user = create_user(
+            "viewcache1@example.com", "9000000021", User.ROLE_CHOICES.MECH
+        )
+        Mechanic.objects.create(mechanic_code="TRAC_VC1", user=user)
+        res = self.client.get("/workshop/api/mechanic/", **self.auth_headers)
+        self.assertEqual(len(res.json()["mechanics"]), 2)
+
+    def test_product_invalidation(self):
+        """
+        lists the products, changes the price of a product and lists them again
+        should get the new price and the credit of the user on every request
+        :return: None
+        """
+        product = Product.objects.create(name="Seat", price="10.00", image_url="")
+        res = self.client.get("/workshop/api/shop/products", **self.auth_headers)
+        self.assertEqual(res.json()["products"][0]["price"], "10.00")
+        UserDetails.objects.filter(user__email="viewcache@example.com").update(
+            available_credit=50
+        )
+        product.price = "20.00"
+        product.save()
+        res = self.client.get("/workshop/api/shop/products", **self.auth_headers)
+        self.assertEqual(res.json()["products"][0]["price"], "20.00")
+        self.assertEqual(res.json()["credit"], 50)
+
+    def test_service_request_invalidation(self):
+        """
+        gets a service request, comments on it and gets it again
+        should get the comment once the transaction of the comment committed
+        :return: None
+        """
+        vehicle = create_vehicle(
+            self.mechanic.user, "0VIEWCACHE0000001", pincode="1234", year=2020
+        )
+        service_request = ServiceRequest.objects.create(
+            mechanic=self.mechanic,
+            vehicle=vehicle,
+            problem_details="Brakes",
+            created_on=timezone.now(),
+        )
+        url = f"/workshop/api/mechanic/service_request/{service_request.id}"
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceComment.objects.create(
+                comment="Fixed",
+                service_request=service_request,
+                created_on=timezone.now(),
+            )
+        res = self.client.get(url)
+        self.assertEqual(len(res.json()["comments"]), 1)
+
+    def test_single_flight(self):
+        """
+        misses the same entry from several threads at once
+        should compute it once and give every thread the same data
+        :return: None
+        """
+        started = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.wait(1)
+            return {"mechanics": []}
+
+        key = view_cache.build_key("mechanics", {"limit": 1})
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    view_cache.get_or_compute(key, ["mechanic"], compute)
+                )
+            )
+            for i in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        started.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"mechanics": []}] * 5)
+        self.assertEqual(
+            view_cache.get_or_compute(key, ["mechanic"], compute), {"mechanics": []}
+        )
+        self.assertEqual(len(calls), 1)
+
+
+class SingleFlightTestCase(TestCase):
+    """
+    contains the test cases related to the coalescing of identical requests
+    Attributes:
+        client: Client object used for testing
+        order: Order read by the tests
+    """
+
+    def setUp(self):
+        self.client = Client()
+        user = create_user("singleflight@example.com", "9000000040")
+        UserDetails.objects.create(
+            name="Single Flight", available_credit=100, user=user
+        )
+        product = Product.objects.create(name="Seat", price="10.00", image_url="")
+        self.order = Order.objects.create(
+            user=user, product=product, created_on=timezone.now()
+        )
+
+    def get_shared(self):
+        return (
+            REGISTRY.get_sample_value(
+                "workshop_single_flight_total", {"name": "order", "result": "shared"}
+            )
+            or 0
+        )
+
+    @patch("crapi.shop.views.requests.post")
+    def test_order_reads(self, mock_post):
+        """
+        reads the same order from several threads while the payment gateway
+        answers the first one
+        should call the payment gateway once and give every request its answer
+        :return: None
+        """
+        url = f"/workshop/api/shop/orders/{self.order.id}"
+        shared_before = self.get_shared()
+        responses = []
+        followers = [
+            threading.Thread(target=lambda: responses.append(self.client.get(url)))
+            for i in range(3)
+        ]
+
+        def slow_payment(*args, **kwargs):
+            for follower in followers:
+                follower.start()
+            deadline = time.monotonic() + 5
+            while self.get_shared() - shared_before < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return MagicMock(
+                status_code=200, **{"json.return_value": {"card_number": "XXXX"}}
+            )
+
+        mock_post.side_effect = slow_payment
+        responses.append(self.client.get(url))
+        for follower in followers:
+            follower.join(5)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(self.get_shared() - shared_before, 3)
+        self.assertEqual(len(responses), 4)
+        for res in responses:
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json()["order"]["id"], self.order.id)
+            self.assertEqual(res.json()["payment"], {"card_number": "XXXX"})
+
+    def test_wait_timeout(self):
+        """
+        calls with a timeout while the identical call in flight hangs
+        should give up waiting after the timeout without running the call
+        :return: None
+        """
+        group = SingleFlight()
+        running, hung = threading.Event(), threading.Event()
+
+        def hang():
+            running.set()
+            hung.wait(5)
+            return "rendered"
+
+        leader = threading.Thread(target=lambda: group.do("report", hang))
+        leader.start()
+        try:
+            self.assertTrue(running.wait(5))
+            with self.assertRaises(SingleFlightTimeout):
+                group.do("report", lambda: "second", timeout=0.05)
+        finally:
+            hung.set()
+            leader.join(5)
+        self.assertEqual(group.do("report", lambda: "second", timeout=0.05), "second")
+
+    @patch("crapi.mechanic.views.report_renders.do", side_effect=SingleFlightTimeout)
+    def test_report_wait_timeout(self, mock_do):
+        """
+        gets a report while the render of the same report outlasts the timeout
+        should get a 503 telling the report is not ready
+        :return: None
+        """
+        user = self.order.user
+        service_request = ServiceRequest.objects.create(
+            mechanic=Mechanic.objects.create(mechanic_code="TRAC_SF0", user=user),
+            vehicle=create_vehicle(user, "VIN00000000000040"),
+            problem_details="Brakes squeal",
+            created_on=timezone.now(),
+        )
+        res = self.client.get(
+            f"/workshop/api/mechanic/mechanic_report?report_id={service_request.id}",
+            HTTP_AUTHORIZATION="Bearer singleflight@example.com",
+        )
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()["message"], messages.REPORT_NOT_READY)
+        self.assertEqual(
+            mock_do.call_args.kwargs["timeout"], settings.SERVICE_REPORT_WAIT_TIMEOUT
+        )
+
+
+class LoggingTestCase(SimpleTestCase):
+    """
+    contains the test cases related to the logging pipeline
+    """
+
+    def make_record(self, name="crapi", level=logging.INFO, msg="message", **extra):
+        record = logging.LogRecord(name, level, __file__, 0, msg, (), None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_redact(self):
+        """
+        redacts a request payload with secrets, long values and many items
+        should mask the secrets and cap the sizes
+        :return: None
+        """
+        params = {
+            "password": "secret",
+            "Authorization": "Bearer token",
+            "problem_details": "a" * 5000,
+            "items": list(range(100)),
+        }
+        redacted = redact(params, max_length=100)
+        self.assertEqual(redacted["password"], "[REDACTED]")
+        self.assertEqual(redacted["Authorization"], "[REDACTED]")
+        self.assertLess(len(redacted["problem_details"]), 200)
+        self.assertEqual(len(redacted["items"]), 21)
+
+    def test_json_formatter(self):
+        """
+        formats a record with extra values
+        should get a single JSON line with the redacted extra values
+        :return: None
+        """
+        record = self.make_record(
+            msg="failed %s", status_code=400, params={"token": "x", "vin": "1"}
+        )
+        record.args = ("request",)
+        data = json.loads(JSONFormatter().format(record))
+        self.assertEqual(data["message"], "failed request")
+        self.assertEqual(data["status_code"], 400)
+        self.assertEqual(data["params"], {"token": "[REDACTED]", "vin": "1"})
+
+    def test_sampling_filter(self):
+        """
+        samples a child of a logger which keeps no debug records
+        should drop its debug records but keep its warnings
+        :return: None
+        """
+        sampling = SamplingFilter({"django.db": 0})
+        self.assertFalse(sampling.filter(self.make_record("django.db.backends")))
+        self.assertTrue(
+            sampling.filter(self.make_record("django.db.backends", logging.WARNING))
+        )
+        self.assertTrue(sampling.filter(self.make_record("crapi")))
+
+    def test_rate_limit_filter(self):
+        """
+        logs more records than the burst of the logger
+        should drop the records below WARNING over the limit and count them
+        :return: None
+        """
+        rate_limit = RateLimitFilter(rate=0.001, burst=3)
+        passed = [rate_limit.filter(self.make_record()) for i in range(10)]
+        self.assertEqual(passed, [True] * 3 + [False] * 7)
+        self.assertTrue(rate_limit.filter(self.make_record("crapi", logging.ERROR)))
+        self.assertTrue(rate_limit.filter(self.make_record("other")))
+        rate_limit.buckets["crapi"] = (1, rate_limit.buckets["crapi"][1], 7)
+        record = self.make_record()
+        self.assertTrue(rate_limit.filter(record))
+        self.assertEqual(record.dropped_records, 7)
+
+    def test_queue_handler_does_not_block(self):
+        """
+        logs to a full queue
+        should drop the records instead of waiting for the listener
+        :return: None
+        """
+        handler = QueueHandler(console=False, maxsize=1)
+        handler.stop_listener()
+        for i in range(5):
+            handler.handle(self.make_record())
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(handler.dropped, 4)
+        handler.close()
+
+
+class RowSerializerTestCase(TestCase):
+    """
+    contains the test cases related to the row serializers
+    and the orjson renderer of the list endpoints
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        creates users, mechanics, vehicles, service requests with
+        and without comments, products and orders
+        :return: None
+        """
+        now = timezone.now()
+        users = [
+            User.objects.create(
+                email=f"user{i}@example.com",
+                number=None if i == 2 else f"98765{i:05d}",
+                password="password",
+                created_on=now,
+            )
+            for i in range(3)
+        ]
+        for i, user in enumerate(users):
+            UserDetails.objects.create(
+                user=user, name=f"Üser {i}", available_credit=i * 12.5
+            )
+        mechanics = [
+            Mechanic.objects.create(mechanic_code=f"TRAC_{i}", user=user)
+            for i, user in enumerate(users[:2])
+        ]
+        vehicle = create_vehicle(users[0], "VIN00000000000001")
+        for i in range(4):
+            service_request = ServiceRequest.objects.create(
+                mechanic=mechanics[i % 2],
+                vehicle=vehicle,
+                problem_details=f"Brakes \u2028 squeal {i} ✓",
+                status=ServiceRequest.STATUS_CHOICES.FIN if i else "pending",
+                created_on=now - timedelta(days=i),
+                updated_on=now if i % 2 else None,
+            )
+            for j in range(i):
+                ServiceComment.objects.create(
+                    service_request=service_request,
+                    comment=f"Comment {j}",
+                    created_on=now - timedelta(hours=j),
+                )
+        products = [
+            Product.objects.create(
+                name=f"Product {i}", price=Decimal("10.5") * i, image_url="seat.svg"
+            )
+            for i in range(3)
+        ]
+        for i, user in enumerate(users):
+            Order.objects.create(
+                user=user, product=products[i], quantity=i + 1, created_on=now
+            )
+
+    def assertSameOutput(self, serializer_class, row_serializer_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        rows = row_serializer_class.values(queryset)
+        with self.assertNumQueries(2 if "comments" in expected.decode() else 1):
+            actual = ORJSONRenderer().render(row_serializer_class(rows).data)
+        self.assertEqual(actual, expected)
+
+    def test_row_serializers(self):
+        """
+        serializes the lists with the row serializers and the orjson renderer
+        should get the same bytes as with the model serializers
+        :return: None
+        """
+        self.assertSameOutput(
+            ProductSerializer, ProductRowSerializer, Product.objects.order_by("-id")
+        )
+        self.assertSameOutput(
+            OrderSerializer, OrderRowSerializer, Order.objects.order_by("-id")
+        )
+        self.assertSameOutput(
+            MechanicSerializer, MechanicRowSerializer, Mechanic.objects.order_by("id")
+        )
+        self.assertSameOutput(
+            UserDetailsSerializer,
+            UserDetailsRowSerializer,
+            UserDetails.objects.order_by("id"),
+        )
+        self.assertSameOutput(
+            MechanicServiceRequestSerializer,
+            MechanicServiceRequestRowSerializer,
+            ServiceRequest.objects.order_by("-created_on"),
+        )
+        self.assertSameOutput(
+            UserServiceRequestSerializer,
+            UserServiceRequestRowSerializer,
+            ServiceRequest.objects.order_by("-created_on"),
+        )
+
+    def test_orjson_renderer(self):
+        """
+        renders values orjson writes differently from the json module
+        should get the same bytes as the json renderer
+        :return: None
+        """
+        values = [
+            {"price": Decimal("10.50"), "id": uuid.UUID(int=1), 1: None},
+            {"time": datetime(2024, 1, 1, 12, 0, 0, 5)},
+            {"time": timezone.now(), "date": timezone.now().date()},
+            {"floats": [0.1, 1e-05, 1e16, 2.5e-7, -1e300, 12.5]},
+            {"big": 2**70, "text": "line\u2028separator\u2029 ✓"},
+            [],
+            "",
+        ]
+        for value in values:
+            self.assertEqual(
+                ORJSONRenderer().render(value), JSONRenderer().render(value)
+            )
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+        self.assertEqual(
+            ORJSONRenderer().render({"a": [1]}, "application/json; indent=2"),
+            JSONRenderer().render({"a": [1]}, "application/json; indent=2"),
+        )
+
+
+class FieldsetTestCase(TestCase):
+    """
+    contains the test cases related to ?fields= and ?expand=
+    on the list endpoints
+    Attributes:
+        client: Client object used for testing
+        auth_headers: Auth headers for dummy user
+        product: Product ordered by the dummy user
+        order: Order of the dummy user
+    """
+
+    def setUp(self):
+        self.client = Client()
+        view_cache.get_cache().clear()
+        user = create_user("fieldset@example.com", "9000000050", User.ROLE_CHOICES.MECH)
+        UserDetails.objects.create(name="Fieldset", available_credit=100, user=user)
+        mechanic = Mechanic.objects.create(mechanic_code="TRAC_FS0", user=user)
+        vehicle = create_vehicle(user, "VIN00000000000050")
+        service_request = ServiceRequest.objects.create(
+            mechanic=mechanic,
+            vehicle=vehicle,
+            problem_details="Brakes squeal",
+            created_on=timezone.now(),
+        )
+        ServiceComment.objects.create(
+            service_request=service_request,
+            comment="Pads replaced",
+            created_on=timezone.now(),
+        )
+        self.product = Product.objects.create(
+            name="Seat", price="10.00", image_url="seat.svg"
+        )
+        self.order = Order.objects.create(
+            user=user, product=self.product, created_on=timezone.now()
+        )
+        self.auth_headers = {"HTTP_AUTHORIZATION": "Bearer fieldset@example.com"}
+
+    def get_orders(self, query=""):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                f"/workshop/api/shop/orders/all{query}", **self.auth_headers
+            )
+        self.assertEqual(res.status_code, 200)
+        orders = [q["sql"] for q in queries if 'FROM "order"' in q["sql"]]
+        return res.json()["orders"], orders[-1]
+
+    def test_fields(self):
+        """
+        lists the orders with ?fields= naming plain fields and a relation
+        should get only these fields, the relation as its primary key,
+        read without joining the other tables
+        :return: None
+        """
+        orders, sql = self.get_orders("?fields=id,status,product")
+        self.assertEqual(
+            orders,
+            [{"id": self.order.id, "product": self.product.id, "status": "delivered"}],
+        )
+        self.assertNotIn("JOIN", sql)
+
+    def test_nested_fields(self):
+        """
+        lists the orders with ?fields= naming a field of a relation
+        should get the relation with only this field
+        :return: None
+        """
+        orders, sql = self.get_orders("?fields=id,product.name")
+        self.assertEqual(orders, [{"id": self.order.id, "product": {"name": "Seat"}}])
+        self.assertIn('"product"', sql)
+        self.assertNotIn('"user"', sql)
+
+    def test_expand(self):
+        """
+        lists the orders with ?expand= alone and with ?fields=
+        should get the expanded relation in full and the other
+        relations as their primary key
+        :return: None
+        """
+        default, sql = self.get_orders()
+        orders, sql = self.get_orders("?expand=product")
+        self.assertEqual(orders[0]["product"], default[0]["product"])
+        self.assertEqual(orders[0]["user"], self.order.user_id)
+        self.assertEqual(orders[0]["quantity"], default[0]["quantity"])
+        self.assertNotIn('"user"', sql)
+        orders, sql = self.get_orders("?fields=id,product&expand=product")
+        self.assertEqual(
+            orders, [{"id": self.order.id, "product": default[0]["product"]}]
+        )
+
+    def test_service_requests(self):
+        """
+        lists the service requests of the mechanic without the comments
+        should not query the comments
+        :return: None
+        """
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                "/workshop/api/mechanic/service_requests?fields=id,status,vehicle.vin",
+                **self.auth_headers,
+            )
+        self.assertEqual(res.status_code, 200)
+        service_request = res.json()["service_requests"][0]
+        self.assertEqual(set(service_request), {"id", "status", "vehicle"})
+        self.assertEqual(service_request["vehicle"], {"vin": "VIN00000000000050"})
+        for query in queries:
+            self.assertNotIn("service_comment", query["sql"])
+        res = self.client.get(
+            "/workshop/api/mechanic/service_requests", **self.auth_headers
+        )
+        self.assertEqual(
+            res.json()["service_requests"][0]["comments"][0]["comment"],
+            "Pads replaced",
+        )
+
+    def test_unknown_fields(self):
+        """
+        lists the orders and the mechanics naming unknown fields and relations
+        should get 400 naming them
+        :return: None
+        """
+        res = self.client.get(
+            "/workshop/api/shop/orders/all?fields=id,user.password,secret",
+            **self.auth_headers,
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(
+            res.json()["message"],
+            messages.INVALID_FIELDS.format("secret, user.password"),
+        )
+        res = self.client.get("/workshop/api/mechanic/?expand=id", **self.auth_headers)
+        self.assertEqual(res.status_code, 400)
@@ -0,0 +1,129 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the per request timings collected by the RequestTimingMiddleware
+"""
+import heapq
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils import metrics
+
+_current_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Time spent by a request outside of the view code
+    Attributes:
+        queries: number of SQL queries
+        sql_time: seconds spent running SQL queries
+        top_queries: list of (seconds, sql) of the slowest queries
+        http_calls: number of outbound http calls
+        http_time: seconds spent on outbound http calls
+        render_time: seconds spent rendering the response body
+    """
+
+    def __init__(self, max_top_queries=5):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.top_queries = []
+        self.max_top_queries = max_top_queries
+        self.http_calls = 0
+        self.http_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        database execute wrapper timing every query
+        see django.db.backends.base.base.BaseDatabaseWrapper.execute_wrapper
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            if len(self.top_queries) < self.max_top_queries:
+                heapq.heappush(self.top_queries, (duration, sql))
+            elif duration > self.top_queries[0][0]:
+                heapq.heapreplace(self.top_queries, (duration, sql))
+
+    def server_timing(self, total):
+        """
+        :param total: seconds spent on the whole request
+        :return: value of the Server-Timing header
+        """
+        return ", ".join(
+            (
+                f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+                f'http;dur={self.http_time * 1000:.1f};desc="{self.http_calls} calls"',
+                f"render;dur={self.render_time * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            )
+        )
+
+
+def start_request_timings(timings):
+    """
+    :param timings: RequestTimings of the request being handled
+    :return: token to pass to stop_request_timings
+    """
+    return _current_timings.set(timings)
+
+
+def stop_request_timings(token):
+    _current_timings.reset(token)
+
+
+def current_timings():
+    """
+    :return: RequestTimings of the request being handled, None outside requests
+    """
+    return _current_timings.get()
+
+
+@contextmanager
+def outbound(upstream):
+    """
+    times an outbound http call of the current request
+    :param upstream: name of the called service
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        metrics.OUTBOUND_LATENCY.labels(upstream).observe(duration)
+        timings = current_timings()
+        if timings is not None:
+            timings.http_calls += 1
+            timings.http_time += duration
+
+
+@contextmanager
+def rendering():
+    """
+    times the rendering of the response body of the current request
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_timings()
+        if timings is not None:
+            timings.render_time += time.perf_counter() - started
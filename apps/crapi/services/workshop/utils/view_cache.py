@@ -0,0 +1,123 @@
+#
+# Licensed under the Apache License, Version 2.0 (the “License”);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an “AS IS” BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Contains the view cache of the read heavy endpoints
+An entry is stored with the tokens of the tags it depends on, a tag such as
+"product" or "service_request:12" gets a new token when a model signal
+invalidates it, so an entry is only served while none of its tags changed.
+Entries live in the "views" cache, local memory by default: the signals
+then only reach the cache of the process which saved the model and the
+other workers see the change after VIEW_CACHE_TTL seconds at the latest,
+a shared backend such as redis makes the invalidation immediate everywhere.
+Concurrent misses of the same entry are computed once per process, the
+other requests wait for that result instead of all querying the database
+"""
+import hashlib
+import json
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from crapi_site import settings
+from utils import metrics
+from utils.singleflight import SingleFlight
+
+CACHE_ALIAS = "views"
+KEY_PREFIX = "view-cache"
+_computations = SingleFlight("view_cache")
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def get_tag_key(tag):
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def build_key(view, params=None, scope=None):
+    """
+    :param view: name of the view
+    :param params: query params or url arguments the data depends on
+    :param scope: user or other scope the data is restricted to, None if
+        the data is the same for everyone
+    :return: cache key of the entry
+    """
+    params = params or {}
+    # a QueryDict may hold several values per name
+    items = sorted(params.lists() if hasattr(params, "lists") else params.items())
+    digest = hashlib.sha256(
+        json.dumps([view, items, scope], default=str).encode()
+    ).hexdigest()
+    return f"{KEY_PREFIX}:{view}:{digest}"
+
+
+def get_tokens(tags):
+    """
+    :param tags: tags of an entry
+    :return: dict mapping the tags to their current token
+    """
+    cache = get_cache()
+    keys = {get_tag_key(tag): tag for tag in tags}
+    tokens = cache.get_many(keys)
+    for key in keys.keys() - tokens.keys():
+        # an evicted tag gets a new token, the entries built on it are stale
+        cache.add(key, uuid.uuid4().hex, None)
+        tokens[key] = cache.get(key)
+    return {keys[key]: token for key, token in tokens.items()}
+
+
+def invalidate(*tags):
+    """
+    gives the tags a new token now and once the transaction commits,
+    entries computed from the data of before the commit are invalidated too
+    :param tags: tags whose entries are stale
+    :return: None
+    """
+
+    def bump():
+        get_cache().set_many({get_tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_or_compute(key, tags, compute, timeout=None):
+    """
+    :param key: key built with build_key
+    :param tags: tags the data depends on
+    :param compute: function without arguments returning the data
+    :param timeout: seconds the entry is kept, VIEW_CACHE_TTL by default
+    :return: data of a fresh entry or the data just computed
+    """
+    cache = get_cache()
+    view = key.split(":")[1]
+    entry = cache.get(key)
+    if entry is not None:
+        tokens, data = entry
+        if get_tokens(tags) == tokens:
+            metrics.VIEW_CACHE.labels(view, "hit").inc()
+            return data
+    metrics.VIEW_CACHE.labels(view, "miss").inc()
+
+    def compute_and_store():
+        # read before computing, an invalidation during compute wins
+        tokens = get_tokens(tags)
+        data = compute()
+        cache.set(key, (tokens, data), timeout or settings.VIEW_CACHE_TTL)
+        return data
+
+    return _computations.do(key, compute_and_store)